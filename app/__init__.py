@@ -1,8 +1,25 @@
 from flask import Flask
 
+
+class ProxyFlask(Flask):
+    """Flask application that runs async views on the worker's background event loop"""
+
+    def async_to_sync(self, func):
+        from app.utils.async_bridge import run_sync
+
+        def wrapper(*args, **kwargs):
+            return run_sync(func(*args, **kwargs))
+
+        return wrapper
+
+
 def create_app():
     """Create and configure the Flask application"""
-    app = Flask(__name__)
+    app = ProxyFlask(__name__)
+
+    # Build the combined CA bundle and the shared SSL context once, before serving requests
+    from app.utils.ssl import get_ssl_context
+    get_ssl_context()
 
     # Import and register blueprints
     from app.api.models import models_bp
@@ -10,15 +27,33 @@ def create_app():
     from app.api.embeddings import embeddings_bp
     from app.api.general import general_bp
     from app.api.health import health_bp
+    from app.api.metrics import metrics_bp
 
     app.register_blueprint(models_bp)
     app.register_blueprint(chat_bp)
     app.register_blueprint(embeddings_bp)
     app.register_blueprint(general_bp)
     app.register_blueprint(health_bp)
+    app.register_blueprint(metrics_bp)
 
     # Register error handlers
     from app.utils.error_handlers import register_error_handlers
     register_error_handlers(app)
 
+    # Tag requests with an id and journal them once their response is sent
+    from app.utils.audit import register_request_audit
+    register_request_audit(app)
+
+    # Deadlines of API requests, from the server/key policy and X-Request-Timeout
+    from app.utils.timeouts import register_request_deadlines
+    register_request_deadlines(app)
+
+    # Per-stage latency breakdown in Server-Timing headers
+    from app.utils.timing import register_server_timing
+    register_server_timing(app)
+
+    # Request counts and latencies for /metrics
+    from app.utils.metrics import register_request_metrics
+    register_request_metrics(app)
+
     return app
\ No newline at end of file
@@ -1,19 +1,31 @@
-from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask import Blueprint, request, jsonify, Response
 import json
 import traceback
 import requests
 import asyncio
-
-from app.config import logger
-from app.utils.openai_client import get_client
-from app.utils.helpers import generate_completion_id, get_current_timestamp
+import time
+
+from app.config import STREAM_KEEPALIVE_INTERVAL, STREAM_UPDATE_INTERVAL, logger
+from app.utils.openai_client import astream_with_auth_retry, call_with_auth_retry
+from app.utils.async_bridge import AsyncStreamBody
+from app.utils.response_cache import chat_cache, StreamTranscript, cache_control_directives
+from app.utils.semantic_cache import semantic_cache
+from app.utils.coalescer import request_coalescer
+from app.utils.sse import ChunkEncoder, FrameCoalescer, DONE_FRAME, KEEPALIVE_FRAME, error_frame
+from app.utils.log import payload_sampler, log_payload
+from app.utils.audit import record_usage
+from app.utils.rate_limit import rate_limited, estimate_chat_tokens
+from app.utils.metrics import track_stream, stream_ttft, stream_chunk_gap, upstream_duration
+from app.utils.stream_stats import stream_stats
+from app.utils.stream_settings import StreamSettings, resolve_stream_settings
+from app.utils.timing import current_timing, timed, finish_stream_timing
+from app.utils.timeouts import DeadlineExceeded, current_deadline, within_deadline, idle_timeouts
+from app.utils.helpers import generate_completion_id, get_current_timestamp, get_api_key
 from app.utils.mapping import (
     build_chat_params,
-    build_stream_chunk,
     build_non_stream_json,
     parse_chunk_fields,
     convert_function_call_to_tool_calls,
-    error_stream_chunk,
     error_response,
     convert_to_gigachat_messages,
     convert_to_gigachat_functions
@@ -25,13 +37,16 @@ chat_bp = Blueprint('chat', __name__)
 
 
 @chat_bp.route('/v1/chat/completions', methods=['POST'])
-def chat_completions():
+@rate_limited(estimate_chat_tokens)
+async def chat_completions():
     """
     Handle chat completions requests.
     This route supports both streaming and non-streaming responses.
     """
     try:
-        log_request_data()
+        # Full payloads are only logged for sampled requests
+        sampled = payload_sampler.sample()
+        log_payload(sampled, "Chat completion request", lambda: request.get_data(as_text=True))
         request_data = request.json
 
         # Validate request data
@@ -44,6 +59,7 @@ def chat_completions():
             )
 
         logger.info("Received chat completion request")
+        log_tool_parameters(request_data)
 
         # Check for required messages
         if 'messages' not in request_data or not request_data['messages']:
@@ -57,8 +73,88 @@ def chat_completions():
 
         # Check streaming preference
         stream = request_data.get('stream', False)
-        return stream_response(request_data) if stream else non_stream_response(request_data)
 
+        # Stream pacing: server defaults, then the API key's settings, then the request's stream_options
+        settings = None
+        if stream:
+            try:
+                settings = resolve_stream_settings(request_data, get_api_key(request.headers))
+            except ValueError as e:
+                return error_response(
+                    message=str(e),
+                    error_type="invalid_request_error",
+                    code="invalid_request_error",
+                    param="stream_options",
+                    status=400
+                )
+
+        directives = cache_control_directives(request.headers.get('Cache-Control'))
+        lookup = 'no-cache' not in directives and 'no-store' not in directives
+        cacheable = 'no-store' not in directives
+
+        # Deterministic requests may be answered from the response cache
+        cache_key = chat_cache.key_for(request_data)
+        cache_status = None
+        if cache_key is not None:
+            if not lookup:
+                chat_cache.bypass()
+                cache_status = 'BYPASS'
+            else:
+                with timed("cache"):
+                    cached = chat_cache.get(cache_key)
+                if cached is not None:
+                    response = cached_response(cached, stream)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+                cache_status = 'MISS'
+
+        # Near-duplicate prompts may be answered from the semantic cache
+        semantic = None
+        if lookup and semantic_cache.enabled:
+            with timed("semantic_cache"):
+                semantic = await semantic_cache.lookup(request_data)
+            if semantic is not None:
+                if semantic.result is not None:
+                    semantic_cache.maybe_verify(semantic, lambda: fetch_completion(request_data))
+                    response = cached_response(semantic.result, stream)
+                    response.headers['X-Cache'] = 'SEMANTIC'
+                    response.headers['X-Cache-Similarity'] = f"{semantic.similarity:.4f}"
+                    return response
+                cache_status = 'MISS'
+
+        def on_result(result):
+            if cache_key is not None:
+                chat_cache.put(cache_key, result)
+            if semantic is not None:
+                semantic_cache.store(semantic, result)
+
+        if not cacheable or (cache_key is None and semantic is None):
+            on_result = None
+
+        # Identical requests already in flight share their upstream call
+        coalesce_key = request_coalescer.key_for(request_data) if lookup else None
+
+        if stream:
+            if coalesce_key is not None:
+                # Only streams asking GigaChat for the same pacing can share its deltas
+                coalesce_key = (coalesce_key, settings.update_interval)
+            response = stream_response(request_data, on_result, coalesce_key, settings)
+        else:
+            response = await non_stream_response(request_data, on_result, coalesce_key)
+        if cache_status is not None:
+            response.headers['X-Cache'] = cache_status
+        if sampled and not stream:
+            log_payload(sampled, "Chat completion response", response.get_data(as_text=True))
+        return response
+
+    except DeadlineExceeded as e:
+        logger.warning(f"Chat completion abandoned: {str(e)}")
+        return error_response(
+            message=str(e),
+            error_type="timeout_error",
+            code="timeout",
+            status=504
+        )
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error: {str(e)}", exc_info=True)
         return error_response(
@@ -87,151 +183,260 @@ def chat_completions():
 
 DEBUG_STREAM_DELAY = 0.0
 
-def stream_response(request_data):
+def stream_response(request_data, on_result=None, coalesce_key=None, settings=None):
     """
     Handle streaming response.
     Returns a Response object that streams data (text/event-stream).
+    `settings` (StreamSettings) pace the upstream stream and the SSE frames.
+    Once upstream finishes, `on_result` gets the stream as a chat.completion body.
+    With a `coalesce_key`, the upstream deltas are shared with identical in-flight
+    requests; each request still frames them under its own completion id.
+    The stage breakdown is sent as an SSE comment before the final [DONE] frame.
+    A client going away cancels the generator, which closes the upstream stream.
+    Past the request's deadline the stream is ended with finish_reason "length".
     """
+    timing = current_timing()
+    deadline = current_deadline()
+    path = request.path
+    if settings is None:
+        settings = StreamSettings()
+
+    def upstream():
+        return stream_deltas(request_data, settings.update_interval, on_result)
 
-    def generate():
+    async def generate():
         try:
             completion_id = generate_completion_id()
             created_time = get_current_timestamp()
-
-            chat_params = build_chat_params(request_data, streaming=True)
-            chat = Chat(**chat_params)
+            deltas = request_coalescer.stream(coalesce_key, upstream) if coalesce_key is not None else upstream()
 
             # Send the first chunk with the 'assistant' role
-            first_chunk = {
-                "id": completion_id,
-                "object": "chat.completion.chunk",
-                "created": created_time,
-                "model": "GigaChat",
-                "choices": [
-                    {
-                        "index": 0,
-                        "delta": {"role": "assistant"},
-                        "finish_reason": None
-                    }
-                ]
-            }
-            yield f"data: {json.dumps(first_chunk)}\n\n"
-
-            # Create an event loop and process streaming
-            client = get_client()
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            # Create a queue to communicate between async and sync worlds
-            queue = asyncio.Queue()
-
-            async def process_stream():
-                try:
-                    async for chunk in client.astream(chat):
-                        logger.debug(f"[PROXY] Raw chunk from GigaChat: {chunk}")
-                        content, finish_reason, tool_calls = parse_chunk_fields(chunk)
-                        formatted_chunk = build_stream_chunk(
-                            completion_id,
-                            created_time,
-                            content,
-                            finish_reason,
-                            tool_calls
-                        )
-                        logger.debug(f"[PROXY] Formatted chunk: {formatted_chunk}")
-                        await queue.put(f"data: {json.dumps(formatted_chunk)}\n\n")
-                    # Signal that we're done
-                    await queue.put(None)
-                except Exception as e:
-                    logger.error(f"Error in async stream processing: {str(e)}", exc_info=True)
-                    await queue.put(error_stream_chunk(str(e)))
-                    await queue.put(None)
-                finally:
-                    await client.aclose()
-
-            # Start the async task
-            task = loop.create_task(process_stream())
-
-            # Process chunks as they arrive
-            import time
-            while True:
-                try:
-                    # Get the next chunk from the queue with a timeout
-                    chunk = loop.run_until_complete(asyncio.wait_for(queue.get(), timeout=30.0))
-                    if chunk is None:  # End of stream
-                        break
-                    yield chunk
-                    # Add a small delay between chunks if DEBUG_STREAM_DELAY is enabled
-                    if DEBUG_STREAM_DELAY > 0:
-                        time.sleep(DEBUG_STREAM_DELAY)
-                        logger.debug(f"Sent chunk with delay of {DEBUG_STREAM_DELAY}s")
-                except asyncio.TimeoutError:
-                    logger.warning("Timeout waiting for next chunk, ending stream")
-                    break
-                except Exception as e:
-                    logger.error(f"Error processing chunk: {str(e)}", exc_info=True)
-                    yield error_stream_chunk(str(e))
-                    break
+            encoder = ChunkEncoder(completion_id, created_time)
+            yield encoder.role_frame
+
+            coalescer = FrameCoalescer(encoder, settings.coalesce_window, settings.coalesce_max_bytes)
+            chunks = stream_chunks(deltas, coalescer, deadline, settings.update_interval, timing)
+            try:
+                async for sse_chunk in chunks:
+                    yield sse_chunk
+            finally:
+                await chunks.aclose()
 
-            # Clean up
-            if not task.done():
-                task.cancel()
-            loop.close()
+            # This request's own breakdown, even when it joined another's upstream stream
+            timing_frame = finish_stream_timing(timing, path) if timing is not None else None
+            if timing_frame is not None:
+                yield timing_frame
 
             # Send the final [DONE] message
-            yield "data: [DONE]\n\n"
+            yield DONE_FRAME
 
         except Exception as e:
             logger.error(f"Error in stream generation: {str(e)}", exc_info=True)
             logger.error(traceback.format_exc())
-            yield error_stream_chunk(str(e))
+            yield error_frame(str(e))
 
-    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+    return Response(AsyncStreamBody(track_stream(generate())), mimetype='text/event-stream')
 
 
-def non_stream_response(request_data):
+async def stream_deltas(request_data, update_interval=STREAM_UPDATE_INTERVAL, on_result=None):
     """
-    Handle non-streaming response.
-    Returns a standard JSON response.
+    Stream a chat completion from GigaChat as (content, finish_reason, tool_calls)
+    deltas. This is the part coalesced requests share: it records upstream latency,
+    hands the completed stream to `on_result` as a chat.completion body, and
+    counts a stream closed before upstream finished as cancelled.
     """
-    try:
-        chat_params = build_chat_params(request_data, streaming=False)
+    transcript = StreamTranscript()
+    with timed("convert"):
+        chat_params = build_chat_params(request_data, streaming=True, update_interval=update_interval)
         chat = Chat(**chat_params)
 
-        client = get_client()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    upstream = astream_with_auth_retry(chat)
+    last = time.perf_counter()
+    first = True
+    # Only streams at the default pacing feed the shared latency samples
+    sampled = update_interval == STREAM_UPDATE_INTERVAL
+    try:
+        async for chunk in upstream:
+            now = time.perf_counter()
+            gap = now - last
+            (stream_ttft if first else stream_chunk_gap).observe(gap)
+            if sampled:
+                idle_timeouts.observe("first" if first else "gap", gap)
+            last, first = now, False
+
+            logger.debug("[PROXY] Raw chunk from GigaChat: %s", chunk)
+            delta = parse_chunk_fields(chunk)
+            transcript.add(*delta)
+            yield delta
+    except (asyncio.CancelledError, GeneratorExit):
+        # Every client went away (or ran out of time) before upstream finished
+        if transcript.finish_reason is None:
+            saved = stream_stats.record_cancelled(transcript, request_data.get('max_tokens'))
+            logger.info(f"Stream cancelled before upstream finished, about {saved} completion tokens saved")
+        raise
+    finally:
+        await upstream.aclose()
+
+    result = transcript.result()
+    if result is not None:
+        stream_stats.record_completed(transcript)
+        if on_result is not None:
+            on_result(result)
+
 
-        async def get_response():
+async def stream_chunks(deltas, coalescer, deadline=None, update_interval=STREAM_UPDATE_INTERVAL, timing=None):
+    """
+    Turn the (content, finish_reason, tool_calls) `deltas` of a stream into
+    OpenAI-compatible SSE frames encoded by `coalescer`, which may merge consecutive
+    content deltas.
+    While upstream is silent, keep-alive comments are sent every STREAM_KEEPALIVE_INTERVAL;
+    the stream ends once the silence exceeds the adaptive idle timeout (never shorter than
+    the stream's `update_interval` allows), and is cut short
+    with finish_reason "length" when `deadline` passes.
+    Framing time is added to `timing`, the ServerTiming of the request being answered.
+    """
+    last = last_sent = time.perf_counter()
+    first = True
+    next_delta = None
+    try:
+        while True:
+            if next_delta is None:
+                next_delta = asyncio.ensure_future(deltas.__anext__())
+            # Wait for the next delta, waking up for whichever timer comes first
+            idle_at = last + idle_timeouts.timeout("first" if first else "gap", update_interval)
+            wake_at = idle_at
+            if deadline is not None:
+                wake_at = min(wake_at, deadline.expires)
+            if coalescer.deadline is not None:
+                wake_at = min(wake_at, coalescer.deadline)
+            if STREAM_KEEPALIVE_INTERVAL > 0:
+                wake_at = min(wake_at, last_sent + STREAM_KEEPALIVE_INTERVAL)
+            done, _ = await asyncio.wait((next_delta,), timeout=max(0.0, wake_at - time.perf_counter()))
+
+            now = time.perf_counter()
+            if not done:
+                if deadline is not None and now >= deadline.expires:
+                    logger.warning(f"Request deadline of {deadline.seconds:g}s passed, cutting the stream short")
+                    yield coalescer.frame(None, "length", None, now)
+                    return
+                if now >= idle_at:
+                    logger.warning(f"No chunk from GigaChat for {now - last:.1f}s, ending stream")
+                    break
+                frame = coalescer.flush() if coalescer.deadline is not None and now >= coalescer.deadline else None
+                yield frame if frame is not None else KEEPALIVE_FRAME
+                last_sent = now
+                continue
+            received, next_delta = next_delta, None
             try:
-                return await client.achat(chat)
-            finally:
-                await client.aclose()
+                content, finish_reason, tool_calls = received.result()
+            except StopAsyncIteration:
+                break
+            last, first = now, False
+
+            frame = coalescer.frame(content, finish_reason, tool_calls, now)
+            if timing is not None:
+                timing.add("serialize", time.perf_counter() - now)
+            if frame is None:
+                continue
+            logger.debug("[PROXY] Formatted chunk: %s", frame)
+            yield frame
+            last_sent = now
+
+            # Add a small delay between chunks if DEBUG_STREAM_DELAY is enabled
+            if DEBUG_STREAM_DELAY > 0:
+                await asyncio.sleep(DEBUG_STREAM_DELAY)
+                logger.debug(f"Sent chunk with delay of {DEBUG_STREAM_DELAY}s")
+
+        held = coalescer.flush()
+        if held is not None:
+            yield held
+    except Exception as e:
+        logger.error(f"Error in async stream processing: {str(e)}", exc_info=True)
+        yield error_frame(str(e))
+    finally:
+        if next_delta is not None:
+            next_delta.cancel()
+            await asyncio.gather(next_delta, return_exceptions=True)
+        await deltas.aclose()
+
 
-        response = loop.run_until_complete(get_response())
-        loop.close()
+async def non_stream_response(request_data, on_result=None, coalesce_key=None):
+    """
+    Handle non-streaming response.
+    Returns a standard JSON response.
+    `on_result` gets the chat.completion body before it is sent.
+    With a `coalesce_key`, the upstream call is shared with identical in-flight requests.
+    Raises DeadlineExceeded if the request's deadline passes first.
+    """
+    deadline = current_deadline()
 
-        return jsonify(build_non_stream_json(response))
+    async def complete():
+        result = await fetch_completion(request_data)
+        if on_result is not None:
+            on_result(result)
+        return result
 
+    try:
+        if coalesce_key is None:
+            result = await within_deadline(complete(), deadline)
+        else:
+            result, shared = await within_deadline(request_coalescer.run(coalesce_key, complete), deadline)
+            if shared:
+                result = dict(result, id=generate_completion_id())
+        record_usage(result.get("usage"))
+        with timed("serialize"):
+            return jsonify(result)
+
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error in non-stream response: {str(e)}", exc_info=True)
         logger.error(traceback.format_exc())
         raise
 
 
-def log_request_data():
+async def fetch_completion(request_data):
     """
-    Log the raw request data for debugging.
+    Get a non-streaming completion from GigaChat as a chat.completion body.
     """
-    raw_request = request.get_data(as_text=True)
-    try:
-        parsed_request = json.loads(raw_request)
-        pretty_request = json.dumps(parsed_request, indent=2)
-        logger.debug(f"Raw request:\n{pretty_request}")
+    with timed("convert"):
+        chat_params = build_chat_params(request_data, streaming=False)
+        chat = Chat(**chat_params)
+
+    with upstream_duration.labels("chat").time():
+        response = await call_with_auth_retry(lambda client: client.achat(chat))
 
-        if "tools" in parsed_request:
-            logger.warning("[PROXY] Received request with 'tools' parameter")
-        if "tool_choice" in parsed_request:
-            logger.warning("[PROXY] Received request with 'tool_choice' parameter")
+    with timed("serialize"):
+        return build_non_stream_json(response)
 
-    except json.JSONDecodeError:
-        logger.debug(f"Raw request: {raw_request}")
+
+def cached_response(result, stream):
+    """
+    Answer from a cached chat.completion result, under a fresh id. Stream
+    requests get the cached message replayed as a complete SSE body.
+    """
+    completion_id = generate_completion_id()
+    created_time = get_current_timestamp()
+    record_usage(result.get("usage"))
+    if not stream:
+        return jsonify(dict(result, id=completion_id, created=created_time))
+
+    choice = result["choices"][0]
+    message = choice["message"]
+    encoder = ChunkEncoder(completion_id, created_time)
+    body = b"".join((
+        encoder.role_frame,
+        encoder.frame(message.get("content"), choice["finish_reason"], message.get("tool_calls")),
+        DONE_FRAME
+    ))
+    return Response(body, mimetype='text/event-stream')
+
+
+def log_tool_parameters(request_data):
+    """
+    Note tool-related parameters, which GigaChat only partially supports.
+    """
+    if "tools" in request_data:
+        logger.debug("[PROXY] Received request with 'tools' parameter")
+    if "tool_choice" in request_data:
+        logger.debug("[PROXY] Received request with 'tool_choice' parameter")
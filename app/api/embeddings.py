@@ -2,123 +2,139 @@ from flask import Blueprint, request, jsonify
 import json
 import traceback
 from app.config import logger
-from app.utils.openai_client import get_client
+from app.utils.embedding_batcher import embed_texts
+from app.utils.embedding_format import ENCODING_FORMATS, encode_embedding
+from app.utils.log import payload_sampler, log_payload
+from app.utils.mapping import error_response
+from app.utils.audit import record_usage
+from app.utils.rate_limit import rate_limited, estimate_embedding_tokens
+from app.utils.timeouts import DeadlineExceeded, current_deadline, within_deadline
 
 # Create a blueprint for the embeddings API
 embeddings_bp = Blueprint('embeddings', __name__)
 
 @embeddings_bp.route('/v1/embeddings', methods=['POST'])
-def embeddings():
+@rate_limited(estimate_embedding_tokens)
+async def embeddings():
     """Handle embeddings request"""
     try:
-        # Log the raw request for debugging
-        raw_request = request.get_data(as_text=True)
-        logger.debug(f"Raw embeddings request: {raw_request}")
+        # Full payloads are only logged for sampled requests
+        log_payload(payload_sampler.sample(), "Embeddings request", lambda: request.get_data(as_text=True))
 
         request_data = request.json
         if not request_data:
-            return jsonify({
-                "error": {
-                    "message": "Invalid JSON in request body",
-                    "type": "invalid_request_error",
-                    "param": None,
-                    "code": "invalid_request_error"
-                }
-            }), 400
+            return error_response(
+                message="Invalid JSON in request body",
+                error_type="invalid_request_error",
+                code="invalid_request_error",
+                status=400
+            )
 
-        logger.info(f"Received embeddings request")
+        logger.info("Received embeddings request")
 
         # Check if input is present
         if 'input' not in request_data or not request_data['input']:
-            return jsonify({
-                "error": {
-                    "message": "Input is required",
-                    "type": "invalid_request_error",
-                    "param": "input",
-                    "code": "invalid_request_error"
-                }
-            }), 400
+            return error_response(
+                message="Input is required",
+                error_type="invalid_request_error",
+                code="invalid_request_error",
+                status=400,
+                param="input"
+            )
 
         # Extract input text(s)
         input_texts = request_data['input']
         if isinstance(input_texts, str):
             input_texts = [input_texts]  # Convert single string to list
+        if not isinstance(input_texts, list) or not all(isinstance(text, str) for text in input_texts):
+            # Token arrays aren't supported by GigaChat
+            return error_response(
+                message="input must be a string or an array of strings",
+                error_type="invalid_request_error",
+                code="invalid_request_error",
+                status=400,
+                param="input"
+            )
 
         # Extract model name (default to GigaChat-Embeddings)
         model = request_data.get('model', 'GigaChat-Embeddings')
 
-        # Prepare parameters for GigaChat API
-        params = {
-            "model": model,
-            "input": input_texts
-        }
+        encoding_format = request_data.get('encoding_format') or 'float'
+        if encoding_format not in ENCODING_FORMATS:
+            return error_response(
+                message=f"encoding_format must be one of: {', '.join(ENCODING_FORMATS)}",
+                error_type="invalid_request_error",
+                code="invalid_request_error",
+                status=400,
+                param="encoding_format"
+            )
 
         try:
-            # Get a fresh client
-            client = get_client()
-
-            # Call GigaChat API for embeddings
-            response = client.embeddings.create(**params)
+            cached, missing = await within_deadline(embed_texts(model, input_texts), current_deadline())
+
+            # Reassemble the response in input order, in the OpenAI API format
+            data = []
+            prompt_tokens = 0
+            for i, (vector, tokens) in enumerate(cached):
+                embedding, extra = encode_embedding(vector, encoding_format)
+                data.append({
+                    "object": "embedding",
+                    "embedding": embedding,
+                    "index": i,
+                    "usage": {"prompt_tokens": tokens},
+                    **extra
+                })
+                prompt_tokens += tokens
 
-            # Get the raw response data
-            response_data = response.model_dump()
-            logger.debug(f"Raw GigaChat embeddings response: {json.dumps(response_data)}")
-
-            # Format the response to match OpenAI API format
             formatted_response = {
                 "object": "list",
-                "data": [],
+                "data": data,
                 "model": model,
                 "usage": {
-                    "prompt_tokens": response_data.get("usage", {}).get("prompt_tokens", 0),
-                    "total_tokens": response_data.get("usage", {}).get("total_tokens", 0)
+                    "prompt_tokens": prompt_tokens,
+                    "total_tokens": prompt_tokens
                 }
             }
 
-            # Extract embeddings from the response
-            if "data" in response_data:
-                formatted_response["data"] = response_data["data"]
-            else:
-                # Fallback if the response structure is different
-                for i, embedding in enumerate(response_data.get("embeddings", [])):
-                    formatted_response["data"].append({
-                        "object": "embedding",
-                        "embedding": embedding,
-                        "index": i
-                    })
-
-            logger.debug(f"Formatted embeddings response: {json.dumps(formatted_response)}")
-            return jsonify(formatted_response)
-
+            record_usage(formatted_response["usage"])
+
+            hit_ratio = 1 - missing / len(input_texts)
+            logger.debug("Embeddings cache hit ratio: %.2f (%d inputs)", hit_ratio, len(input_texts))
+            response = jsonify(formatted_response)
+            response.headers['X-Embedding-Cache-Hit-Ratio'] = f"{hit_ratio:.4f}"
+            return response
+
+        except DeadlineExceeded as e:
+            logger.warning(f"Embeddings request abandoned: {str(e)}")
+            return error_response(
+                message=str(e),
+                error_type="timeout_error",
+                code="timeout",
+                status=504
+            )
         except Exception as e:
             logger.error(f"Error calling GigaChat embeddings API: {str(e)}", exc_info=True)
-            return jsonify({
-                "error": {
-                    "message": f"Error calling GigaChat embeddings API: {str(e)}",
-                    "type": "api_error",
-                    "param": None,
-                    "code": "api_error"
-                }
-            }), 502
+            return error_response(
+                message=f"Error calling GigaChat embeddings API: {str(e)}",
+                error_type="api_error",
+                code="api_error",
+                status=502
+            )
 
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error in embeddings: {str(e)}", exc_info=True)
-        return jsonify({
-            "error": {
-                "message": f"Invalid JSON: {str(e)}",
-                "type": "invalid_request_error",
-                "param": None,
-                "code": "invalid_request_error"
-            }
-        }), 400
+        return error_response(
+            message=f"Invalid JSON: {str(e)}",
+            error_type="invalid_request_error",
+            code="invalid_request_error",
+            status=400
+        )
     except Exception as e:
         logger.error(f"Unexpected error in embeddings: {str(e)}", exc_info=True)
         logger.error(traceback.format_exc())
-        return jsonify({
-            "error": {
-                "message": f"Internal server error: {str(e)}",
-                "type": "server_error",
-                "param": None,
-                "code": "server_error"
-            }
-        }), 500
\ No newline at end of file
+        return error_response(
+            message=f"Internal server error: {str(e)}",
+            error_type="server_error",
+            code="server_error",
+            status=500
+        )
\ No newline at end of file
@@ -1,13 +1,24 @@
 from flask import Blueprint, jsonify
 import platform
 import datetime
-from app.config import logger
+from app.config import logger, log_queue_stats
+from app.utils.openai_client import client_pool
+from app.utils.models_cache import models_cache
+from app.utils.embedding_cache import embedding_cache
+from app.utils.embedding_batcher import embedding_batcher
+from app.utils.response_cache import chat_cache
+from app.utils.semantic_cache import semantic_cache
+from app.utils.coalescer import request_coalescer
+from app.utils.audit import audit_journal
+from app.utils.stream_stats import stream_stats
+from app.utils.timeouts import idle_timeouts
+from app.utils.rate_limit import rate_limiter
 
 # Create a blueprint for the health API
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/health', methods=['GET'])
-def health_check():
+async def health_check():
     """Health check endpoint to verify the service is running"""
     try:
         logger.info("Received health check request")
@@ -19,7 +30,19 @@ def health_check():
             "service": "GigaChat API Proxy",
             "python_version": platform.python_version(),
             "system": platform.system(),
-            "version": "1.0.0"  # You may want to store this in a config file
+            "version": "1.0.0",  # You may want to store this in a config file
+            "client_pool": client_pool.stats(),
+            "models_cache": models_cache.stats(),
+            "embedding_cache": embedding_cache.stats(),
+            "embedding_batcher": embedding_batcher.stats(),
+            "chat_cache": chat_cache.stats(),
+            "semantic_cache": semantic_cache.stats(),
+            "coalescer": request_coalescer.stats(),
+            "streams": stream_stats.stats(),
+            "stream_idle_timeouts": idle_timeouts.stats(),
+            "rate_limiter": rate_limiter.stats(),
+            "logging": log_queue_stats(),
+            "audit_journal": audit_journal.stats()
         }
 
         return jsonify(health_data)
@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.utils.metrics import render_metrics
+
+# Create a blueprint for the metrics API
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint, covering every worker when multiprocess mode is on"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
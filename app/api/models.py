@@ -1,31 +1,20 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify, Response
 import httpx
-from app.config import GIGACHAT_API_V1_URL, logger
-from app.auth.token_manager import token_manager
-from app.utils.ssl import create_http_client
+from app.config import logger
+from app.utils.models_cache import models_cache
 
 # Create a blueprint for the models API
 models_bp = Blueprint('models', __name__)
 
 @models_bp.route('/v1/models', methods=['GET'])
-def list_models():
-    """List available models from GigaChat API"""
+async def list_models():
+    """List available models from GigaChat API (served from the in-process cache)"""
     try:
         logger.info("Received request to list models")
 
-        # Create HTTP client with proper SSL verification
-        http_client = create_http_client()
-
-        # Make a request to GigaChat API to get available models
+        # Get the model list, fetching it from GigaChat API only when nothing is cached
         try:
-            response = http_client.get(
-                f"{GIGACHAT_API_V1_URL}/models",
-                headers={"Authorization": f"Bearer {token_manager.get_valid_token()}"}
-            )
-            response.raise_for_status()
-            models_data = response.json()
-            logger.info(f"Successfully fetched models from GigaChat API")
-            return jsonify(models_data)
+            entry = await models_cache.get()
         except httpx.HTTPError as e:
             logger.error(f"Error fetching models from GigaChat API: {str(e)}", exc_info=True)
             return jsonify({
@@ -37,6 +26,15 @@ def list_models():
                 }
             }), 502
 
+        # Let clients revalidate with If-None-Match
+        if request.if_none_match.contains(entry.etag):
+            response = Response(status=304)
+        else:
+            response = Response(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        response.headers['Cache-Control'] = f"max-age={models_cache.max_age(entry)}"
+        return response
+
     except Exception as e:
         logger.error(f"Error listing models: {str(e)}", exc_info=True)
         return jsonify({
@@ -46,4 +44,4 @@ def list_models():
                 "param": None,
                 "code": "server_error"
             }
-        }), 500
\ No newline at end of file
+        }), 500
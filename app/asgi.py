@@ -0,0 +1,220 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import io
+import sys
+
+from flask import request
+
+from app.config import logger
+
+
+class AsgiApp:
+    """
+    Serve a Flask application natively under an ASGI server (uvicorn).
+
+    Coroutine views (chat, embeddings, models, health) are awaited directly on
+    the worker's event loop, so a streaming chat completion costs a task rather
+    than a whole worker. Plain sync views are run in the default executor.
+    The Flask request context lives in contextvars, which are per-task in
+    asyncio, so `request`, `jsonify` and error handlers work as they do under
+    WSGI. While an async body streams, the connection is watched for
+    `http.disconnect` so the generator (and its upstream request) is
+    cancelled as soon as the client goes away.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = await self._read_body(receive)
+        environ = self._build_environ(scope, body)
+        response = await self._dispatch(environ)
+        await self._send_response(response, send, receive)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                logger.info("ASGI application startup")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                logger.info("ASGI application shutdown")
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    def _build_environ(self, scope, body):
+        """Build a WSGI environ from an ASGI HTTP scope"""
+        script_name = scope.get("root_path", "")
+        path_info = scope["path"]
+        if script_name and path_info.startswith(script_name):
+            path_info = path_info[len(script_name):]
+
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": script_name,
+            "PATH_INFO": path_info.encode("utf8").decode("latin1"),
+            "QUERY_STRING": scope["query_string"].decode("ascii"),
+            "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+            "CONTENT_LENGTH": str(len(body)),
+        }
+
+        server = scope.get("server") or ("localhost", 80)
+        environ["SERVER_NAME"] = server[0]
+        environ["SERVER_PORT"] = str(server[1] or 0)
+        client = scope.get("client")
+        if client:
+            environ["REMOTE_ADDR"] = client[0]
+            environ["REMOTE_PORT"] = str(client[1])
+
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin1")
+            value = value.decode("latin1")
+            if name == "content-length":
+                continue
+            if name == "content-type":
+                environ["CONTENT_TYPE"] = value
+                continue
+            key = "HTTP_" + name.upper().replace("-", "_")
+            if key in environ:
+                value = environ[key] + "," + value
+            environ[key] = value
+
+        return environ
+
+    async def _dispatch(self, environ):
+        """Mirror Flask.wsgi_app/full_dispatch_request, awaiting coroutine views"""
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await self._dispatch_view()
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                return app.finalize_request(rv)
+            except Exception as e:
+                return app.handle_exception(e)
+
+    async def _dispatch_view(self):
+        app = self.flask_app
+        req = request._get_current_object()
+        if req.routing_exception is not None:
+            app.raise_routing_exception(req)
+        rule = req.url_rule
+        if getattr(rule, "provide_automatic_options", False) and req.method == "OPTIONS":
+            return app.make_default_options_response()
+
+        view = app.view_functions[rule.endpoint]
+        if inspect.iscoroutinefunction(view):
+            return await view(**req.view_args)
+
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, view, **req.view_args)
+        return await asyncio.get_running_loop().run_in_executor(None, call)
+
+    async def _stream_async_body(self, body, send, receive):
+        """
+        Send an async body while watching for the client to disconnect.
+        Returns False if the client went away before the body was exhausted.
+        """
+        async def send_chunks():
+            async for chunk in body:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+        async def wait_for_disconnect():
+            # The request body has been read, so the next message is the disconnect
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        sender = asyncio.ensure_future(send_chunks())
+        watcher = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await asyncio.wait((sender, watcher), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            watcher.cancel()
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+            raise
+        watcher.cancel()
+        if not sender.done():
+            # Cancelling raises into the generator, whose finally blocks close the upstream stream
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+            logger.info("Client disconnected, cancelled the response stream")
+            return False
+        sender.result()
+        return True
+
+    async def _send_response(self, response, send, receive):
+        headers = [
+            (name.lower().encode("latin1"), value.encode("latin1"))
+            for name, value in response.headers.items()
+        ]
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": headers,
+        })
+
+        body = response.response
+        try:
+            if hasattr(body, "__aiter__"):
+                if not await self._stream_async_body(body, send, receive):
+                    return
+            elif response.is_streamed:
+                loop = asyncio.get_running_loop()
+                iterator = response.iter_encoded()
+                sentinel = object()
+                while True:
+                    chunk = await loop.run_in_executor(None, next, iterator, sentinel)
+                    if chunk is sentinel:
+                        break
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": response.get_data(), "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        except OSError as e:
+            # The client went away mid-response
+            logger.warning(f"Error sending ASGI response body: {str(e)}")
+        finally:
+            if hasattr(body, "aclose"):
+                await body.aclose()
+            # Runs the response's call_on_close callbacks (request audit)
+            response.close()
+
+
+def create_asgi_app(flask_app=None):
+    """Wrap the Flask application for serving under an ASGI server"""
+    if flask_app is None:
+        from app import create_app
+        flask_app = create_app()
+    return AsgiApp(flask_app)
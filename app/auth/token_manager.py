@@ -1,30 +1,172 @@
+import asyncio
+import random
+import threading
 import time
 import uuid
-from app.config import MASTER_TOKEN, GIGACHAT_OAUTH_URL, logger
+from app.config import (
+    MASTER_TOKEN, GIGACHAT_OAUTH_URL, TOKEN_REFRESH_MARGIN, TOKEN_REFRESH_JITTER, TOKEN_STORE_PATH, logger
+)
+from app.auth.token_store import create_token_store
 from app.utils.ssl import create_http_client
+from app.utils.metrics import token_refreshes, token_refresh_duration
+
+# Minimum delay between background refresh attempts after a failure
+BACKGROUND_RETRY_INTERVAL = 5.0
 
 class TokenManager:
     """Manages authentication tokens for the GigaChat API"""
 
-    def __init__(self, master_token=None):
+    def __init__(self, master_token=None, refresh_margin=TOKEN_REFRESH_MARGIN,
+                 refresh_jitter=TOKEN_REFRESH_JITTER, token_store_path=TOKEN_STORE_PATH):
         """Initialize the token manager with a master token"""
         self.master_token = master_token or MASTER_TOKEN
+        self.refresh_margin = refresh_margin
+        self.refresh_jitter = refresh_jitter
+        # The margin applied to the current token, capped below its lifetime
+        self._margin = refresh_margin
         self.access_token = None
         self.expires_at = None
         self.http_client = create_http_client()
+        # Token shared with the other workers; None when disabled
+        self.store = create_token_store(token_store_path, self.master_token)
+        self._rejected_token = None
+        # Collapses concurrent refreshes (request threads, coroutines, background timer) into one
+        self._refresh_lock = threading.Lock()
+        # Guards the background-refresh bookkeeping; never held across an HTTP call
+        self._state_lock = threading.Lock()
+        self._background_refreshing = False
+        self._next_background_attempt = 0.0
+        self._timer = None
+
+        # A worker started after a restart picks up the token its predecessors obtained
+        if self.store is not None:
+            self._adopt_stored_token()
+
+    def _seconds_left(self):
+        """Seconds until the current token expires (expires_at is in milliseconds)"""
+        if not self.access_token or not self.expires_at:
+            return 0.0
+        return self.expires_at / 1000 - time.time()
+
+    def _needs_refresh(self):
+        return self._seconds_left() <= 0
+
+    def _in_refresh_margin(self):
+        return self._seconds_left() <= self._margin
 
     def get_valid_token(self):
         """Get a valid token, refreshing if necessary"""
-        if self.access_token:
-            token_preview = self.access_token[:5] + "..."
-            logger.info(f"Getting valid token, access_token: {token_preview}, expires_at: {self.expires_at}")
-        else:
-            logger.info(f"Getting valid token, access_token: None")
-        if not self.access_token or not self.expires_at or time.time() * 1000 >= self.expires_at:
-            logger.info("Token expired or not set, refreshing...")
-            self.refresh_token()
+        if not self._in_refresh_margin():
+            return self.access_token
+
+        if not self._needs_refresh():
+            # Still valid: renew in the background and serve the current token
+            self._start_background_refresh()
+            return self.access_token
+
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._needs_refresh():
+                logger.info("Token expired or not set, refreshing...")
+                self._refresh()
         return self.access_token
 
+    async def aget_valid_token(self):
+        """Async variant of get_valid_token that never blocks the event loop"""
+        if not self._needs_refresh():
+            if self._in_refresh_margin():
+                self._start_background_refresh()
+            return self.access_token
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_valid_token)
+
+    def invalidate(self, token):
+        """Drop `token` after the upstream rejected it, so the next call refreshes"""
+        with self._state_lock:
+            if self.access_token == token:
+                logger.warning("Access token rejected by GigaChat, invalidating it")
+                self._rejected_token = token
+                self.expires_at = 0
+
+    def _start_background_refresh(self):
+        """Start a background refresh unless one is running or recently failed"""
+        with self._state_lock:
+            if self._background_refreshing or time.time() < self._next_background_attempt:
+                return
+            self._background_refreshing = True
+        threading.Thread(target=self._background_refresh, name="token-refresh", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            with self._refresh_lock:
+                if self._in_refresh_margin():
+                    logger.info("Token close to expiry, refreshing in the background")
+                    self._refresh()
+        except Exception:
+            # The current token stays in use until it actually expires
+            self._next_background_attempt = time.time() + BACKGROUND_RETRY_INTERVAL
+        finally:
+            self._background_refreshing = False
+
+    def _refresh(self):
+        """
+        Refresh the token. With a shared store, this holds the cross-process
+        lock and adopts a token another worker renewed meanwhile instead of
+        calling the OAuth endpoint again. If the lock can't be taken in time
+        the token is refreshed for this worker only.
+        """
+        if self.store is None:
+            return self.refresh_token()
+
+        with self.store.locked() as held:
+            if not held:
+                # Better an extra OAuth call than a request stuck behind a wedged worker
+                return self.refresh_token()
+            if self._adopt_stored_token():
+                return self.access_token
+            self.refresh_token()
+            self.store.save(self.access_token, self.expires_at)
+            return self.access_token
+
+    def _adopt_stored_token(self):
+        """Use the stored token if it is not ours, not rejected and outside the refresh margin"""
+        stored = self.store.load()
+        if stored is None:
+            return False
+        access_token, expires_at = stored
+        if access_token == self._rejected_token:
+            return False
+        if expires_at / 1000 - time.time() <= self._margin:
+            return False
+        if access_token != self.access_token:
+            self.access_token = access_token
+            self.expires_at = expires_at
+            logger.info("Using access token shared by another worker")
+            self._schedule_proactive_refresh()
+        return True
+
+    def _schedule_proactive_refresh(self):
+        """
+        Arm a timer that renews the token `refresh_margin` seconds before it
+        expires, plus a random jitter (capped at half the margin) so workers
+        don't all wake up together. A margin as long as the token's lifetime
+        would renew it right after every refresh, so it is then cut to half
+        the lifetime, and renewals are never less than
+        BACKGROUND_RETRY_INTERVAL apart.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+        seconds_left = self._seconds_left()
+        self._margin = self.refresh_margin
+        if self._margin >= seconds_left:
+            self._margin = seconds_left / 2
+            logger.warning(f"TOKEN_REFRESH_MARGIN of {self.refresh_margin:g}s is not shorter than the access "
+                           f"token's lifetime of {seconds_left:.0f}s, renewing it at half its lifetime instead")
+        jitter = random.uniform(0, min(self.refresh_jitter, self._margin / 2))
+        delay = max(seconds_left - self._margin + jitter, BACKGROUND_RETRY_INTERVAL)
+        self._timer = threading.Timer(delay, self._start_background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
     def refresh_token(self):
         """Get new access token from Sberbank OAuth endpoint"""
         try:
@@ -48,11 +190,12 @@ class TokenManager:
             }
 
             # Make request to OAuth endpoint using our configured http_client with proper SSL verification
-            response = self.http_client.post(
-                GIGACHAT_OAUTH_URL,
-                headers=headers,
-                data=data
-            )
+            with token_refresh_duration.time():
+                response = self.http_client.post(
+                    GIGACHAT_OAUTH_URL,
+                    headers=headers,
+                    data=data
+                )
             response.raise_for_status()
 
             # Parse response
@@ -60,11 +203,14 @@ class TokenManager:
             self.access_token = token_data['access_token']
             self.expires_at = token_data['expires_at']
             logger.info("Successfully obtained new access token")
+            token_refreshes.labels("success").inc()
+            self._schedule_proactive_refresh()
             return self.access_token
 
         except Exception as e:
+            token_refreshes.labels("error").inc()
             logger.error(f"Error getting access token: {str(e)}", exc_info=True)
             raise
 
 # Create a singleton instance of the token manager
-token_manager = TokenManager()
\ No newline at end of file
+token_manager = TokenManager()
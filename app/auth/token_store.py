@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from app.config import TOKEN_STORE_LOCK_TIMEOUT, logger
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+
+class FileTokenStore:
+    """
+    Access token shared by all workers of a container, and across restarts,
+    through a small JSON file guarded by an flock.
+
+    Workers read the file before calling the OAuth endpoint and adopt a token
+    another worker already obtained. Refreshes happen under an exclusive lock,
+    so only one process talks to the OAuth endpoint at a time. Entries are
+    keyed by a hash of the master token, so different credentials never share
+    a token.
+
+    A worker waits at most `lock_timeout` seconds for the lock; past that, or
+    if the lock file can't be opened (say, it is a symlink), it refreshes on
+    its own rather than hang.
+    """
+
+    def __init__(self, path, master_token, lock_timeout=TOKEN_STORE_LOCK_TIMEOUT):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.lock_timeout = lock_timeout
+        self.key = hashlib.sha256(master_token.encode("utf-8")).hexdigest()[:16]
+
+    @contextmanager
+    def locked(self):
+        """Hold the cross-process refresh lock; yields False if it couldn't be taken in time"""
+        try:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        except OSError as e:
+            logger.warning(f"Cannot open token store lock {self.lock_path}: {str(e)}")
+            yield False
+            return
+        try:
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning(f"Token store lock {self.lock_path} still held after {self.lock_timeout:g}s")
+                        yield False
+                        return
+                    time.sleep(0.05)
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def load(self):
+        """Return (access_token, expires_at) stored for our master token, or None"""
+        try:
+            with open(self.path, "r") as f:
+                entry = json.load(f).get(self.key)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable token store {self.path}: {str(e)}")
+            return None
+        if not entry:
+            return None
+        return entry["access_token"], entry["expires_at"]
+
+    def save(self, access_token, expires_at):
+        """Store the token atomically (write a fresh private temp file, then rename)"""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[self.key] = {"access_token": access_token, "expires_at": expires_at}
+
+        directory, name = os.path.split(self.path)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory or None)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def create_token_store(path, master_token):
+    """Create the shared token store, or return None when it is disabled or unsupported"""
+    if not path:
+        return None
+    if fcntl is None:
+        logger.warning("Shared token store needs fcntl (POSIX only), each worker will fetch its own token")
+        return None
+    return FileTokenStore(path, master_token)
@@ -1,5 +1,8 @@
 import os
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -37,13 +40,42 @@ class ColorFormatter(logging.Formatter):
 
         return result
 
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded queue drained by a background listener thread.
+    When the queue is full (the log sink cannot keep up), the record is
+    dropped and counted instead of blocking the request that logged it.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue, so queued records are flushed"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
 # Configure logging - first remove any existing handlers to avoid duplicates
 logging.root.handlers = []
 
 # Get logging configuration from environment variables
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
 USE_COLOR = os.getenv('LOG_USE_COLOR', 'true').lower() == 'true'
 LOG_FORMAT = os.getenv('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Log the full request/response payloads of 1 request in N (0 disables payload logs)
+LOG_PAYLOAD_SAMPLE_RATE = int(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0'))
+# Records buffered for the background log writer; beyond that they are dropped (0 logs synchronously)
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
 
 # Create and configure the handler
 handler = logging.StreamHandler()
@@ -55,9 +87,44 @@ else:
     handler.setFormatter(logging.Formatter(fmt=LOG_FORMAT))
 
 # Configure root logger with level from environment
-log_level_value = getattr(logging, LOG_LEVEL, logging.DEBUG)
+log_level_value = getattr(logging, LOG_LEVEL, logging.INFO)
 logging.root.setLevel(log_level_value)
-logging.root.addHandler(handler)
+
+# Write log records from a background thread, so a slow stdout never stalls a request
+log_queue_handler = None
+log_listener = None
+if LOG_QUEUE_SIZE > 0:
+    log_queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    log_listener = DrainingQueueListener(log_queue_handler.queue, handler)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    logging.root.addHandler(log_queue_handler)
+else:
+    logging.root.addHandler(handler)
+
+
+def _restart_log_listener():
+    """The listener thread does not survive fork(): give the child a fresh queue and thread"""
+    log_queue_handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    log_listener.queue = log_queue_handler.queue
+    log_listener._thread = None
+    log_listener.start()
+
+
+if log_listener is not None and hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_log_listener)
+
+
+def log_queue_stats():
+    """Backlog and drop counters of the background log writer"""
+    if log_queue_handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "queued": log_queue_handler.queue.qsize(),
+        "capacity": LOG_QUEUE_SIZE,
+        "dropped": log_queue_handler.dropped
+    }
 
 # Get our module's logger
 logger = logging.getLogger(__name__)
@@ -71,16 +138,121 @@ MASTER_TOKEN = os.getenv('MASTER_TOKEN')
 if not MASTER_TOKEN:
     raise ValueError("MASTER_TOKEN environment variable is not set")
 
-# API configuration
-GIGACHAT_BASE_URL = "https://gigachat.devices.sberbank.ru"
+# API configuration (overridable to point the proxy at a stand-in, e.g. benchmarks/mock_gigachat.py)
+GIGACHAT_BASE_URL = os.getenv('GIGACHAT_BASE_URL', "https://gigachat.devices.sberbank.ru")
 GIGACHAT_API_V1_URL = f"{GIGACHAT_BASE_URL}/api/v1"
-GIGACHAT_OAUTH_URL = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
+GIGACHAT_OAUTH_URL = os.getenv('GIGACHAT_OAUTH_URL', "https://ngw.devices.sberbank.ru:9443/api/v2/oauth")
+
+# Renew the access token this many seconds before it expires, in the background
+TOKEN_REFRESH_MARGIN = float(os.getenv('TOKEN_REFRESH_MARGIN', '60'))
+# Random jitter (seconds, capped at half the margin) spreading the workers' proactive renewals
+TOKEN_REFRESH_JITTER = float(os.getenv('TOKEN_REFRESH_JITTER', '30'))
+
+# File shared by all workers (and restarts) holding the current access token; empty (the default) disables it.
+# Put it in a directory only the proxy's user can write, never a shared one like /tmp
+TOKEN_STORE_PATH = os.getenv('TOKEN_STORE_PATH', '')
+# Seconds a worker waits for another worker's refresh before fetching a token of its own
+TOKEN_STORE_LOCK_TIMEOUT = float(os.getenv('TOKEN_STORE_LOCK_TIMEOUT', '10'))
+
+# Maximum number of long-lived GigaChat clients kept per worker
+CLIENT_POOL_MAX_SIZE = int(os.getenv('CLIENT_POOL_MAX_SIZE', '8'))
+
+# Seconds the /v1/models list is served from memory before it is revalidated upstream
+MODELS_CACHE_TTL = float(os.getenv('MODELS_CACHE_TTL', '300'))
+
+# Memory budget (bytes) of the per-worker embedding cache; 0 disables the in-memory tier
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv('EMBEDDING_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Optional sqlite file persisting cached embeddings across workers and restarts; empty disables it
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', '')
+
+# Seconds concurrent embedding inputs are collected into one upstream call; 0 disables batching
+EMBEDDING_BATCH_WINDOW = float(os.getenv('EMBEDDING_BATCH_WINDOW', '0.005'))
+# Most distinct texts per upstream embeddings call; larger inputs are split into sub-batches
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '64'))
+# Upstream embeddings calls in flight at once per worker
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', '4'))
+
+# Seconds deterministic (temperature 0) chat completions are served from the response cache; 0 disables it
+CHAT_CACHE_TTL = float(os.getenv('CHAT_CACHE_TTL', '0'))
+# Most chat completions kept in the response cache per worker
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv('CHAT_CACHE_MAX_ENTRIES', '1024'))
+
+# Collapse identical in-flight chat requests onto one upstream call
+CHAT_COALESCE = os.getenv('CHAT_COALESCE', 'true').lower() == 'true'
+
+# Seconds GigaChat collects generated tokens into one stream chunk
+STREAM_UPDATE_INTERVAL = float(os.getenv('STREAM_UPDATE_INTERVAL', '0.1'))
+# Merge content deltas for up to this many seconds, or this many bytes, into one SSE frame; 0 disables each limit
+STREAM_COALESCE_WINDOW = float(os.getenv('STREAM_COALESCE_WINDOW', '0'))
+STREAM_COALESCE_MAX_BYTES = int(os.getenv('STREAM_COALESCE_MAX_BYTES', '0'))
+# Largest stream settings a client API key or request may ask for; update_interval must also
+# stay below STREAM_IDLE_TIMEOUT_MIN, or a stream would be ended as idle between two chunks
+STREAM_UPDATE_INTERVAL_MAX = float(os.getenv('STREAM_UPDATE_INTERVAL_MAX', '5'))
+STREAM_COALESCE_WINDOW_MAX = float(os.getenv('STREAM_COALESCE_WINDOW_MAX', '2'))
+STREAM_COALESCE_MAX_BYTES_MAX = int(os.getenv('STREAM_COALESCE_MAX_BYTES_MAX', '65536'))
+# JSON object mapping client API keys to their own stream settings, e.g.
+# {"sk-batch": {"update_interval": 1.0, "coalesce_window": 0.5}}
+STREAM_KEY_SETTINGS = os.getenv('STREAM_KEY_SETTINGS', '')
+
+# Seconds an API request may take, upstream calls included; 0 means no deadline.
+# Clients may ask for a shorter one with an X-Request-Timeout header.
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '0'))
+# JSON object mapping client API keys to their own deadline in seconds, e.g. {"sk-interactive": 60}
+REQUEST_TIMEOUT_BY_KEY = os.getenv('REQUEST_TIMEOUT_BY_KEY', '')
+# Seconds of silence after which a stream gets an SSE comment, so intermediaries keep it open; 0 disables it
+STREAM_KEEPALIVE_INTERVAL = float(os.getenv('STREAM_KEEPALIVE_INTERVAL', '15'))
+# A stream is ended when upstream stays silent for this multiple of the recent p99 time to first
+# chunk (or gap between chunks), kept between the minimum and maximum seconds
+STREAM_IDLE_TIMEOUT_MULTIPLIER = float(os.getenv('STREAM_IDLE_TIMEOUT_MULTIPLIER', '4'))
+STREAM_IDLE_TIMEOUT_MIN = float(os.getenv('STREAM_IDLE_TIMEOUT_MIN', '10'))
+STREAM_IDLE_TIMEOUT_MAX = float(os.getenv('STREAM_IDLE_TIMEOUT_MAX', '120'))
+
+# Per-API-key rate limits of the chat and embeddings endpoints: requests per second (with a burst
+# allowance) and estimated tokens per minute; 0 disables a limit
+RATE_LIMIT_RPS = float(os.getenv('RATE_LIMIT_RPS', '0'))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', '0'))
+RATE_LIMIT_TPM = float(os.getenv('RATE_LIMIT_TPM', '0'))
+# JSON object mapping client API keys to their own limits, e.g. {"sk-batch": {"rps": 2, "tpm": 20000}}
+RATE_LIMIT_BY_KEY = os.getenv('RATE_LIMIT_BY_KEY', '')
+# Seconds a request over the limit may wait for capacity, and how many may wait per key, before 429
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '2'))
+RATE_LIMIT_QUEUE_SIZE = int(os.getenv('RATE_LIMIT_QUEUE_SIZE', '16'))
+# Optional sqlite file holding the buckets, so all workers share the limits; empty keeps them per worker
+RATE_LIMIT_STORE_PATH = os.getenv('RATE_LIMIT_STORE_PATH', '')
+
+# Prompts kept in the semantic chat cache per worker; 0 disables it
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '0'))
+# Cosine similarity of the last user turn above which a cached completion is reused
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.95'))
+# Embeddings model used to compare prompts
+SEMANTIC_CACHE_EMBEDDING_MODEL = os.getenv('SEMANTIC_CACHE_EMBEDDING_MODEL', 'Embeddings')
+# Fraction of semantic hits re-asked upstream in the background to count false hits
+SEMANTIC_CACHE_VERIFY_RATE = float(os.getenv('SEMANTIC_CACHE_VERIFY_RATE', '0.05'))
+
+# Send a Server-Timing header (an SSE comment for streams) with the per-stage breakdown of each request
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+# Log the stage breakdown of requests slower than this many seconds; 0 disables it
+SLOW_REQUEST_THRESHOLD = float(os.getenv('SLOW_REQUEST_THRESHOLD', '0'))
+
+# JSONL journal of every API request (id, model, token usage, latency, status); empty disables it
+AUDIT_LOG_PATH = os.getenv('AUDIT_LOG_PATH', '')
+# Size at which the audit journal is rotated, and how many rotated files are kept
+AUDIT_LOG_MAX_BYTES = int(os.getenv('AUDIT_LOG_MAX_BYTES', str(64 * 1024 * 1024)))
+AUDIT_LOG_BACKUP_COUNT = int(os.getenv('AUDIT_LOG_BACKUP_COUNT', '5'))
+# Seconds audit records are buffered before being written in one batch
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', '1.0'))
+
+# Run the per-worker background event loop on uvloop (requires the uvloop package)
+EVENT_LOOP_UVLOOP = os.getenv('EVENT_LOOP_UVLOOP', 'false').lower() == 'true'
+# Stream chunks buffered between the event loop and a WSGI request thread; a slower client pauses upstream reads
+STREAM_BUFFER_SIZE = int(os.getenv('STREAM_BUFFER_SIZE', '32'))
 
 # Get the current directory for certificate paths
 current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 CUSTOM_CERT_PATH = os.path.join(current_dir, "russian_trusted_root_ca.cer")
 PROXYMAN_CERT_PATH = os.path.join(current_dir, "proxyman.pem")
-COMBINED_CERT_PATH = os.path.join(current_dir, "combined_certs.pem")
+# Directory for the content-addressed combined bundle (combined_certs-<hash>.pem)
+CERT_BUNDLE_DIR = os.getenv('CERT_BUNDLE_DIR', current_dir)
 
 # Check if the custom certificate files exist
 if not os.path.exists(CUSTOM_CERT_PATH):
@@ -0,0 +1,191 @@
+import asyncio
+import collections
+import contextvars
+import os
+import threading
+from app.config import EVENT_LOOP_UVLOOP, STREAM_BUFFER_SIZE, logger
+
+
+class BackgroundLoop:
+    """
+    One long-lived event loop per worker process, running in a daemon thread.
+
+    Sync WSGI request threads hand coroutines to this loop instead of creating
+    and closing a loop per request, so async clients and their connection
+    pools live across requests. The loop is (re)created lazily per process, so
+    it is safe with gunicorn's --preload forking.
+    """
+
+    def __init__(self, use_uvloop=False):
+        self.use_uvloop = use_uvloop
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_loop(self):
+        """Return the running background loop, starting it on first use"""
+        loop = self._loop
+        if loop is not None and self._pid == os.getpid():
+            return loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = self._start()
+                self._pid = os.getpid()
+            return self._loop
+
+    def _new_loop(self):
+        if self.use_uvloop:
+            try:
+                import uvloop
+                return uvloop.new_event_loop()
+            except ImportError:
+                logger.warning("EVENT_LOOP_UVLOOP is set but uvloop is not installed, using asyncio")
+        return asyncio.new_event_loop()
+
+    def _start(self):
+        loop = self._new_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, name="async-bridge-loop", daemon=True)
+        thread.start()
+        started.wait()
+        logger.info(f"Started background event loop ({type(loop).__module__}) in worker {os.getpid()}")
+        return loop
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the loop from another thread.
+        The caller's contextvars (e.g. the Flask request context) are carried over.
+        Returns a concurrent.futures.Future.
+        """
+        ctx = contextvars.copy_context()
+
+        async def run_in_context():
+            # The task copies the context current at creation, i.e. the caller's
+            return await ctx.run(asyncio.ensure_future, coro)
+
+        return asyncio.run_coroutine_threadsafe(run_in_context(), self.get_loop())
+
+
+background_loop = BackgroundLoop(use_uvloop=EVENT_LOOP_UVLOOP)
+
+
+def run_sync(coro):
+    """Run a coroutine on the background loop and block until it completes"""
+    return background_loop.submit(coro).result()
+
+
+_END = object()
+
+
+class _Failure:
+    __slots__ = ("exc",)
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _ChunkBuffer:
+    """
+    Bounded handoff of stream chunks from a task on the background loop to a
+    request thread. The task awaits room while `maxsize` chunks are waiting
+    (0 means unbounded), so a slow client stops upstream reads instead of
+    growing the buffer; the end and failure markers are always accepted.
+    """
+
+    def __init__(self, loop, maxsize):
+        self._loop = loop
+        self._maxsize = maxsize
+        self._items = collections.deque()
+        self._ready = threading.Condition()
+        # Future the producer awaits while the buffer is full
+        self._room = None
+
+    async def put(self, item):
+        while True:
+            with self._ready:
+                if self._maxsize <= 0 or len(self._items) < self._maxsize:
+                    self._items.append(item)
+                    self._ready.notify()
+                    return
+                room = self._room = self._loop.create_future()
+            await room
+
+    def put_final(self, item):
+        with self._ready:
+            self._items.append(item)
+            self._ready.notify()
+
+    def get(self):
+        """Block the calling thread until the next item"""
+        with self._ready:
+            while not self._items:
+                self._ready.wait()
+            item = self._items.popleft()
+            room, self._room = self._room, None
+        if room is not None:
+            self._loop.call_soon_threadsafe(_wake, room)
+        return item
+
+
+class AsyncStreamBody:
+    """
+    Response body wrapping an async generator.
+
+    Under the ASGI server the generator is consumed natively through
+    `__aiter__`. Under a WSGI server (gunicorn sync workers, `python run.py`)
+    Werkzeug iterates the body synchronously: a pump task on the background
+    loop drives the generator and hands chunks to the request thread through
+    a bounded buffer of `buffer_size` chunks.
+    """
+
+    def __init__(self, agen, buffer_size=STREAM_BUFFER_SIZE):
+        self.agen = agen
+        self.buffer_size = buffer_size
+        self._pump_future = None
+
+    def __aiter__(self):
+        return self.agen.__aiter__()
+
+    async def _pump(self, chunks):
+        try:
+            async for chunk in self.agen:
+                await chunks.put(chunk)
+            chunks.put_final(_END)
+        except asyncio.CancelledError:
+            chunks.put_final(_END)
+            raise
+        except Exception as e:
+            chunks.put_final(_Failure(e))
+        finally:
+            await self.agen.aclose()
+
+    def __iter__(self):
+        chunks = _ChunkBuffer(background_loop.get_loop(), self.buffer_size)
+        self._pump_future = background_loop.submit(self._pump(chunks))
+        while True:
+            item = chunks.get()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+
+    async def aclose(self):
+        """Close the generator from the event loop it ran on (called by the ASGI server)"""
+        await self.agen.aclose()
+
+    def close(self):
+        """Stop the pump task if the WSGI server closes the body early"""
+        if self._pump_future is not None and not self._pump_future.done():
+            self._pump_future.cancel()
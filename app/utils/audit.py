@@ -0,0 +1,204 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+
+import orjson
+from flask import g, request
+
+from app.config import (
+    logger,
+    AUDIT_LOG_PATH,
+    AUDIT_LOG_MAX_BYTES,
+    AUDIT_LOG_BACKUP_COUNT,
+    AUDIT_LOG_FLUSH_INTERVAL
+)
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+
+class AuditJournal:
+    """
+    Append-only JSONL journal of API requests, one compact record per line.
+
+    record() only serializes the record and appends it to an in-memory
+    buffer; a background thread writes the buffer in one os.write() every
+    `flush_interval` seconds. Workers share the file: appends go through
+    O_APPEND, and the file is rotated (path -> path.1 -> ... path.N) under an
+    flock once it reaches `max_bytes`. If the disk cannot keep up, records
+    beyond `max_pending` are dropped and counted rather than buffered forever.
+    """
+
+    def __init__(self, path, max_bytes, backup_count, flush_interval, max_pending=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = max(1, backup_count)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._fd = None
+        self._pid = None
+        self.records = 0
+        self.batches = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def record(self, entry):
+        """Queue one record (a JSON-serializable dict) for the next batch"""
+        if not self.path:
+            return
+        line = orjson.dumps(entry) + b"\n"
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(line)
+            self.records += 1
+
+    def _start(self):
+        """Start the writer thread (again, in a forked worker)"""
+        self._pid = os.getpid()
+        self._fd = None
+        self._pending = []
+        threading.Thread(target=self._run, name="audit-journal", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write all buffered records in one batch"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with self._write_lock:
+            try:
+                self._write(b"".join(pending))
+                self.batches += 1
+            except OSError as e:
+                self.errors += 1
+                logger.warning("Could not write %d audit records to %s: %s", len(pending), self.path, e)
+
+    def _write(self, data):
+        fd = self._open()
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        if os.fstat(fd).st_size >= self.max_bytes:
+            self._rotate()
+
+    def _open(self):
+        """Return our descriptor, reopening it if another worker rotated the file away"""
+        if self._fd is not None:
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self._fd).st_ino:
+                    return self._fd
+            except FileNotFoundError:
+                pass
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        return self._fd
+
+    def _rotate(self):
+        lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            # Another worker may have rotated while we waited for the lock
+            if os.stat(self.path).st_ino == os.fstat(self._fd).st_ino:
+                for i in range(self.backup_count - 1, 0, -1):
+                    source = f"{self.path}.{i}"
+                    if os.path.exists(source):
+                        os.replace(source, f"{self.path}.{i + 1}")
+                os.replace(self.path, f"{self.path}.1")
+                self.rotations += 1
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+        os.close(self._fd)
+        self._fd = None
+
+    def stats(self):
+        """Journal counters for the health endpoint"""
+        return {
+            "enabled": self.enabled,
+            "records": self.records,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "errors": self.errors
+        }
+
+
+def record_usage(usage):
+    """Attach the token usage of the current request to its audit record"""
+    g.audit_usage = usage
+
+
+def register_request_audit(app, journal=None):
+    """
+    Tag every request with an X-Request-Id (the client's, or a new one) and,
+    when the journal is enabled, record each /v1 request once its response
+    has been fully sent, so streamed responses are timed to their last byte.
+    """
+    journal = journal or audit_journal
+
+    @app.before_request
+    def start_request_audit():
+        g.request_started = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-Id') or uuid.uuid4().hex
+
+    @app.after_request
+    def finish_request_audit(response):
+        request_id = g.get('request_id')
+        if request_id is None:
+            return response
+        response.headers['X-Request-Id'] = request_id
+        if not journal.enabled or not request.path.startswith('/v1/'):
+            return response
+
+        body = request.get_json(silent=True) if request.is_json else None
+        entry = {
+            "ts": round(time.time(), 3),
+            "id": request_id,
+            "method": request.method,
+            "path": request.path,
+            "model": body.get('model') if isinstance(body, dict) else None,
+            "stream": bool(body.get('stream')) if isinstance(body, dict) else False,
+            "status": response.status_code,
+            "usage": g.get('audit_usage'),
+            "cache": response.headers.get('X-Cache')
+        }
+        started = g.request_started
+
+        def write_record():
+            entry["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            journal.record(entry)
+
+        response.call_on_close(write_record)
+        return response
+
+
+# Create a singleton instance of the audit journal
+audit_journal = AuditJournal(AUDIT_LOG_PATH, AUDIT_LOG_MAX_BYTES, AUDIT_LOG_BACKUP_COUNT, AUDIT_LOG_FLUSH_INTERVAL)
+atexit.register(audit_journal.flush)
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from app.config import logger
+
+
+class _PoolEntry:
+    """A pooled client, the event loop its connections belong to and its lease count"""
+    __slots__ = ("client", "loop", "leases", "retired")
+
+    def __init__(self, client, loop):
+        self.client = client
+        self.loop = loop
+        self.leases = 0
+        self.retired = False
+
+
+class GigaChatClientPool:
+    """
+    Long-lived GigaChat clients shared by all requests of a worker.
+
+    Clients are keyed by access token and base URL so their keep-alive
+    connections (and TLS sessions) are reused across requests. httpx binds
+    connections to the event loop they were opened on, so the running loop is
+    part of the key as well. When the access token changes, clients holding
+    the old token for the same base URL are retired and closed once their
+    last lease is released.
+    """
+
+    def __init__(self, factory, max_size=8):
+        self.factory = factory
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+        self.evictions = 0
+
+    def acquire(self, token, base_url):
+        """Lease a client for `token` and `base_url`; must be called on the event loop that will use it"""
+        loop = asyncio.get_running_loop()
+        key = (token, base_url, loop)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                entry = _PoolEntry(self.factory(token, base_url), loop)
+                self._entries[key] = entry
+                self._retire_stale(key)
+            entry.leases += 1
+        return entry
+
+    async def release(self, entry):
+        """Return a leased client; closes it if it was retired meanwhile"""
+        with self._lock:
+            entry.leases -= 1
+            should_close = entry.retired and entry.leases == 0
+        if should_close:
+            await self._close(entry)
+
+    def _retire_stale(self, current_key):
+        """Retire clients superseded by a new token, bound to closed loops, or over the size limit"""
+        token, base_url, loop = current_key
+        stale = []
+        for key, entry in self._entries.items():
+            if key == current_key:
+                continue
+            if key[2].is_closed():
+                stale.append(key)
+            elif key[1] == base_url and key[2] is loop and key[0] != token:
+                self.rotations += 1
+                logger.info("Access token changed, rotating pooled GigaChat client")
+                stale.append(key)
+
+        overflow = len(self._entries) - len(stale) - self.max_size
+        for key in self._entries:
+            if overflow <= 0:
+                break
+            if key != current_key and key not in stale:
+                self.evictions += 1
+                stale.append(key)
+                overflow -= 1
+
+        for key in stale:
+            entry = self._entries.pop(key)
+            entry.retired = True
+            if entry.leases == 0:
+                self._schedule_close(entry)
+
+    def _schedule_close(self, entry):
+        """Close a client on the loop that owns its connections"""
+        if entry.loop.is_closed():
+            # Its connections died with the loop
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if entry.loop is running:
+            running.create_task(self._close(entry))
+        else:
+            asyncio.run_coroutine_threadsafe(self._close(entry), entry.loop)
+
+    async def _close(self, entry):
+        try:
+            await entry.client.aclose()
+        except Exception as e:
+            logger.error(f"Error closing pooled GigaChat client: {str(e)}", exc_info=True)
+
+    def stats(self):
+        """Return pool counters"""
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rotations": self.rotations,
+            "evictions": self.evictions,
+        }
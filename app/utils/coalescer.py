@@ -0,0 +1,164 @@
+import asyncio
+from app.config import CHAT_COALESCE, logger
+from app.utils.response_cache import chat_request_key, is_deterministic
+
+
+class _StreamFlight:
+    """One upstream stream shared by every subscriber of an identical request"""
+
+    def __init__(self, loop):
+        self.chunks = []
+        self.done = False
+        # Raised to every subscriber once it has been sent the chunks before it
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._loop = loop
+        self.waiter = loop.create_future()
+
+    def publish(self):
+        """Wake the subscribers waiting for new chunks"""
+        waiter, self.waiter = self.waiter, self._loop.create_future()
+        waiter.set_result(None)
+
+
+class RequestCoalescer:
+    """
+    Collapses identical in-flight chat requests onto one upstream call.
+
+    Requests are identical when the fields build_chat_params uses match.
+    Like the response cache, only deterministic requests (temperature 0) are
+    coalesced: clients sampling at a higher temperature each expect their own
+    completion. A non-stream request joining an in-flight one waits for its
+    result. A stream request joining an in-flight stream first gets the
+    chunks already sent, then the live ones, and an upstream error once it
+    has had the chunks before it. Streams share upstream deltas rather than
+    encoded frames, so each subscriber frames them under its own id, pacing
+    and deadline. The upstream stream runs in its own task, so it outlives
+    any single subscriber, and is cancelled once every subscriber has gone
+    away; likewise a non-stream call is cancelled once every caller has given
+    up on it (e.g. past its deadline). Flights end with their upstream call;
+    later requests start a new one.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        # (key, event loop) -> future / _StreamFlight
+        self._calls = {}
+        self._streams = {}
+        # future -> callers still awaiting it
+        self._waiters = {}
+        self.leaders = 0
+        self.followers = 0
+        self.stream_leaders = 0
+        self.stream_followers = 0
+        self.cancelled_streams = 0
+        self.cancelled_calls = 0
+
+    def key_for(self, request_data):
+        """Return the coalescing key for `request_data`, or None if it must get its own call"""
+        if not self.enabled or not is_deterministic(request_data):
+            return None
+        return chat_request_key(request_data)
+
+    async def run(self, key, call):
+        """
+        Await `call()` once for all concurrent callers with `key`. Returns
+        (result, shared) where `shared` is True for the callers that joined.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (key, loop)
+        future = self._calls.get(flight_key)
+        shared = future is not None
+        if shared:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            future = self._calls[flight_key] = asyncio.ensure_future(call())
+            future.add_done_callback(lambda _: self._forget(self._calls, flight_key, future))
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # Shielded so the call keeps running for the others when one caller goes away
+            return await asyncio.shield(future), shared
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                if not future.done():
+                    self.cancelled_calls += 1
+                    self._forget(self._calls, flight_key, future)
+                    future.cancel()
+
+    def stream(self, key, generate):
+        """
+        Return an async iterator over the chunks of the in-flight stream for
+        `key`, starting one from `generate()` when there is none.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (key, loop)
+        flight = self._streams.get(flight_key)
+        if flight is None:
+            self.stream_leaders += 1
+            flight = self._streams[flight_key] = _StreamFlight(loop)
+            flight.task = asyncio.ensure_future(self._pump(flight_key, flight, generate()))
+        else:
+            self.stream_followers += 1
+            logger.debug("Joining in-flight stream with %d chunks to replay", len(flight.chunks))
+        flight.subscribers += 1
+        return self._subscribe(flight_key, flight)
+
+    async def _pump(self, flight_key, flight, source):
+        try:
+            async for chunk in source:
+                flight.chunks.append(chunk)
+                flight.publish()
+        except Exception as e:
+            flight.error = e
+        finally:
+            await source.aclose()
+            flight.done = True
+            flight.publish()
+            self._forget(self._streams, flight_key, flight)
+
+    async def _subscribe(self, flight_key, flight):
+        sent = 0
+        try:
+            while True:
+                while sent < len(flight.chunks):
+                    yield flight.chunks[sent]
+                    sent += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                # Shielded: a subscriber going away must not cancel the others' wake-up
+                await asyncio.shield(flight.waiter)
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                self.cancelled_streams += 1
+                # Requests arriving from now on start a fresh stream
+                self._forget(self._streams, flight_key, flight)
+                flight.task.cancel()
+
+    @staticmethod
+    def _forget(flights, flight_key, flight):
+        if flights.get(flight_key) is flight:
+            del flights[flight_key]
+
+    def stats(self):
+        """Return coalescing counters"""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "stream_leaders": self.stream_leaders,
+            "stream_followers": self.stream_followers,
+            "cancelled_streams": self.cancelled_streams,
+            "cancelled_calls": self.cancelled_calls,
+        }
+
+
+# Create a singleton instance of the request coalescer
+request_coalescer = RequestCoalescer(enabled=CHAT_COALESCE)
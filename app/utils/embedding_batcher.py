@@ -0,0 +1,218 @@
+import asyncio
+import time
+import weakref
+from app.config import EMBEDDING_BATCH_WINDOW, EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_MAX_CONCURRENCY, logger
+from app.utils.openai_client import call_with_auth_retry
+from app.utils.embedding_cache import embedding_cache
+from app.utils.metrics import upstream_duration
+
+
+class _Batch:
+    """Texts collected for one upstream call, each with the future its callers wait on"""
+    __slots__ = ("model", "futures", "callers", "opened_at", "timer")
+
+    def __init__(self, model):
+        self.model = model
+        self.futures = {}
+        # Caller -> its texts in this batch
+        self.callers = {}
+        self.opened_at = time.monotonic()
+        self.timer = None
+
+
+async def embed_upstream(model, texts):
+    """Embed `texts` with one upstream call, returning (embedding, prompt_tokens) in input order"""
+    with upstream_duration.labels("embeddings").time():
+        response = await call_with_auth_retry(lambda client: client.aembeddings(texts=texts, model=model))
+    items = sorted(response.data, key=lambda item: item.index)
+    if len(items) != len(texts):
+        raise ValueError(f"expected {len(texts)} embeddings, got {len(items)}")
+    return [(item.embedding, item.usage.prompt_tokens) for item in items]
+
+
+class EmbeddingBatcher:
+    """
+    Merges the embedding inputs of concurrent requests into shared upstream calls.
+
+    The first text of a batch opens a `window` (seconds); texts arriving
+    meanwhile for the same model join the batch, and identical texts share
+    one slot. The batch is sent when the window closes or once it holds
+    `max_batch_size` texts, and each caller gets back its own results. With
+    a window of 0 every call goes upstream on its own, still split into
+    batches of at most `max_batch_size` texts.
+
+    At most `max_concurrency` upstream calls are in flight per event loop, so
+    a large input list is sent as concurrent sub-batches without flooding
+    the upstream.
+
+    If a batch merging several callers' texts fails, each caller's texts are
+    sent again on their own, so an input only one request sent (say, one
+    upstream rejects) fails that request alone.
+    """
+
+    def __init__(self, send, window, max_batch_size, max_concurrency):
+        self.send = send
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        # (model, event loop) -> _Batch being filled
+        self._pending = {}
+        # Event loop -> semaphore bounding its upstream calls
+        self._semaphores = weakref.WeakKeyDictionary()
+        self.batches = 0
+        self.requested = 0
+        self.sent = 0
+        self.total_wait = 0.0
+        self.split_batches = 0
+
+    async def embed(self, model, texts):
+        """Return (embedding, prompt_tokens) for each of `texts`, in order"""
+        if self.window <= 0:
+            chunks = [texts[i:i + self.max_batch_size] for i in range(0, len(texts), self.max_batch_size)]
+            self.batches += len(chunks)
+            self.requested += len(texts)
+            self.sent += len(texts)
+            results = await asyncio.gather(*(self._send(model, chunk) for chunk in chunks))
+            return [result for chunk_results in results for result in chunk_results]
+
+        loop = asyncio.get_running_loop()
+        key = (model, loop)
+        caller = object()
+        futures = []
+        for text in texts:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _Batch(model)
+                batch.timer = loop.call_later(self.window, self._flush, key, batch)
+            future = batch.futures.get(text)
+            if future is None:
+                future = batch.futures[text] = loop.create_future()
+            futures.append(future)
+            batch.callers.setdefault(caller, []).append(text)
+            if len(batch.futures) >= self.max_batch_size:
+                self._flush(key, batch)
+        self.requested += len(texts)
+
+        # Shielded so a caller going away does not cancel results shared with other callers
+        results = await asyncio.shield(asyncio.gather(*futures, return_exceptions=True))
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def _flush(self, key, batch):
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        batch.timer.cancel()
+        self.batches += 1
+        self.sent += len(batch.futures)
+        self.total_wait += time.monotonic() - batch.opened_at
+        asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        texts = list(batch.futures)
+        logger.debug("Sending a batch of %d embedding inputs upstream", len(texts))
+        try:
+            try:
+                results = await self._send(batch.model, texts)
+            except Exception as e:
+                if len(batch.callers) < 2:
+                    raise
+                logger.warning(f"Batch of {len(texts)} embedding inputs from {len(batch.callers)} requests "
+                               f"failed ({str(e)}), retrying each request's inputs on their own")
+                self.split_batches += 1
+                await self._dispatch_per_caller(batch)
+                return
+        except asyncio.CancelledError:
+            for future in batch.futures.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self._resolve(batch, texts, results)
+
+    async def _dispatch_per_caller(self, batch):
+        groups = [list(dict.fromkeys(texts)) for texts in batch.callers.values()]
+        outcomes = await asyncio.gather(*(self._send(batch.model, texts) for texts in groups),
+                                        return_exceptions=True)
+        # Successes first: a text shared with a failing caller still reaches the others
+        for texts, outcome in zip(groups, outcomes):
+            if not isinstance(outcome, BaseException):
+                self._resolve(batch, texts, outcome)
+        for texts, outcome in zip(groups, outcomes):
+            if isinstance(outcome, BaseException):
+                for text in texts:
+                    future = batch.futures[text]
+                    if not future.done():
+                        future.set_exception(outcome)
+
+    @staticmethod
+    def _resolve(batch, texts, results):
+        for text, result in zip(texts, results):
+            future = batch.futures[text]
+            if not future.done():
+                future.set_result(result)
+
+    async def _send(self, model, texts):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        async with semaphore:
+            return await self.send(model, texts)
+
+    def stats(self):
+        """Return batching counters"""
+        return {
+            "window_ms": round(self.window * 1000, 3),
+            "max_batch_size": self.max_batch_size,
+            "max_concurrency": self.max_concurrency,
+            "batches": self.batches,
+            "split_batches": self.split_batches,
+            "inputs": self.requested,
+            "deduplicated": self.requested - self.sent,
+            "avg_batch_size": round(self.sent / self.batches, 2) if self.batches else None,
+            "avg_fill_ratio": round(self.sent / (self.batches * self.max_batch_size), 4) if self.batches else None,
+            "avg_wait_ms": round(self.total_wait / self.batches * 1000, 3) if self.batches else None,
+        }
+
+
+# Create a singleton instance of the embedding batcher
+embedding_batcher = EmbeddingBatcher(
+    embed_upstream,
+    window=EMBEDDING_BATCH_WINDOW,
+    max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+    max_concurrency=EMBEDDING_MAX_CONCURRENCY
+)
+
+
+async def embed_texts(model, texts):
+    """
+    Embed `texts` through the embedding cache and the batcher. Returns the
+    (float32 vector, prompt_tokens) entries in input order and the number of
+    inputs the cache missed (a text repeated in `texts` counts each time,
+    though it goes upstream once).
+    """
+    # Serve what we can from the cache, only the misses go upstream
+    entries = await embedding_cache.aget_many(model, texts)
+    missed = sum(1 for entry in entries if entry is None)
+    missing_texts = list(dict.fromkeys(
+        text for text, entry in zip(texts, entries) if entry is None
+    ))
+
+    if missing_texts:
+        # Merged with the inputs of concurrent requests into shared upstream calls
+        results = await embedding_batcher.embed(model, missing_texts)
+        fetched = dict(zip(missing_texts, await embedding_cache.aput_many(
+            model,
+            missing_texts,
+            [embedding for embedding, _ in results],
+            [tokens for _, tokens in results]
+        )))
+        entries = [entry if entry is not None else fetched[text] for text, entry in zip(texts, entries)]
+
+    return entries, missed
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.config import EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_CACHE_PATH, logger
+
+# Rough per-entry overhead (key, tuple, OrderedDict node) counted against the byte budget
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embedding vectors.
+
+    Entries are keyed by model plus a SHA-256 of the input text. Vectors are
+    kept as float32 NumPy arrays in an LRU bounded by `max_bytes`. An
+    optional sqlite file acts as a second, persistent tier: it is read on
+    memory misses and written through on every insert. Its connection is
+    opened lazily per process, so workers forked after import don't share
+    one, and the async variants run its queries in the default executor.
+    """
+
+    def __init__(self, max_bytes, disk_path=None):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path or None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Serializes use of the sqlite connection, apart from the LRU's lock
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._pid = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model, text):
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, model, texts):
+        """Return a list aligned with `texts` of (vector, prompt_tokens) or None for misses"""
+        keys, results, missing = self._lookup(model, texts)
+        if missing and self.disk_path is not None:
+            missing = self._lookup_disk(keys, results, missing)
+        with self._lock:
+            self.misses += len(missing)
+        return results
+
+    async def aget_many(self, model, texts):
+        """Async variant of get_many that reads the disk tier off the event loop"""
+        keys, results, missing = self._lookup(model, texts)
+        if missing and self.disk_path is not None:
+            missing = await asyncio.get_running_loop().run_in_executor(
+                None, self._lookup_disk, keys, results, missing)
+        with self._lock:
+            self.misses += len(missing)
+        return results
+
+    def put_many(self, model, texts, vectors, tokens):
+        """Cache embeddings for `texts` and return their (vector, prompt_tokens) entries"""
+        entries, rows = self._insert(model, texts, vectors, tokens)
+        if rows and self.disk_path is not None:
+            self._save_to_disk(rows)
+        return entries
+
+    async def aput_many(self, model, texts, vectors, tokens):
+        """Async variant of put_many that writes the disk tier off the event loop"""
+        entries, rows = self._insert(model, texts, vectors, tokens)
+        if rows and self.disk_path is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._save_to_disk, rows)
+        return entries
+
+    def _lookup(self, model, texts):
+        """Memory lookup: returns the keys, the results so far and the indexes missed"""
+        keys = [self.key(model, text) for text in texts]
+        results = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = entry
+                    self.hits += 1
+                else:
+                    missing.append(i)
+        return keys, results, missing
+
+    def _lookup_disk(self, keys, results, missing):
+        """Fill `results` at the `missing` indexes from disk; returns the indexes still missing"""
+        found = self._load_from_disk([keys[i] for i in missing])
+        still_missing = []
+        for i in missing:
+            entry = found.get(keys[i])
+            if entry is None:
+                still_missing.append(i)
+                continue
+            results[i] = entry
+            self._remember(keys[i], entry)
+        with self._lock:
+            self.disk_hits += len(missing) - len(still_missing)
+        return still_missing
+
+    def _insert(self, model, texts, vectors, tokens):
+        """Remember embeddings in memory; returns their entries and the rows for the disk tier"""
+        entries = []
+        rows = []
+        for text, vector, prompt_tokens in zip(texts, vectors, tokens):
+            key = self.key(model, text)
+            entry = (np.asarray(vector, dtype=np.float32), int(prompt_tokens))
+            self._remember(key, entry)
+            entries.append(entry)
+            rows.append((key, entry[1], entry[0].tobytes()))
+        return entries, rows
+
+    def _remember(self, key, entry):
+        size = entry[0].nbytes + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0].nbytes + ENTRY_OVERHEAD_BYTES
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[0].nbytes + ENTRY_OVERHEAD_BYTES
+                self.evictions += 1
+
+    def _connection(self):
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key BLOB PRIMARY KEY, tokens INTEGER NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._db
+
+    def _load_from_disk(self, keys):
+        placeholders = ",".join("?" * len(keys))
+        try:
+            with self._db_lock:
+                rows = self._connection().execute(
+                    f"SELECT key, tokens, vector FROM embeddings WHERE key IN ({placeholders})", keys
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading embeddings from the disk cache: {str(e)}")
+            return {}
+        return {bytes(key): (np.frombuffer(vector, dtype=np.float32), tokens) for key, tokens, vector in rows}
+
+    def _save_to_disk(self, rows):
+        try:
+            with self._db_lock:
+                self._connection().executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing embeddings to the disk cache: {str(e)}")
+
+    def stats(self):
+        """Return cache counters"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+            }
+
+
+# Create a singleton instance of the embedding cache
+embedding_cache = EmbeddingCache(max_bytes=EMBEDDING_CACHE_MAX_BYTES, disk_path=EMBEDDING_CACHE_PATH)
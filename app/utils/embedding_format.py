@@ -0,0 +1,33 @@
+import base64
+import numpy as np
+
+# encoding_format values accepted by /v1/embeddings. "float" and "base64"
+# (little-endian float32) match the OpenAI API; the others are compact
+# extensions, base64 as well.
+ENCODING_FORMATS = ("float", "base64", "base64_float16", "base64_int8")
+
+
+def encode_embedding(vector, encoding_format="float"):
+    """
+    Encode a float32 vector for the response. Returns the `embedding` value
+    and a dict of extra fields for the item: int8 vectors are scaled to the
+    vector's largest magnitude, which is returned as `scale` (the original
+    values are approximately int8_values * scale / 127).
+    """
+    if encoding_format == "float":
+        return vector.tolist(), {}
+    if encoding_format == "base64":
+        return _b64(vector.astype("<f4", copy=False)), {}
+    if encoding_format == "base64_float16":
+        return _b64(vector.astype("<f2")), {}
+    if encoding_format == "base64_int8":
+        scale = float(np.abs(vector).max()) if vector.size else 0.0
+        if scale == 0.0:
+            return _b64(np.zeros(vector.shape, dtype=np.int8)), {"scale": 0.0}
+        quantized = np.rint(vector * (127 / scale)).astype(np.int8)
+        return _b64(quantized), {"scale": scale}
+    raise ValueError(f"Unsupported encoding_format: {encoding_format}")
+
+
+def _b64(array):
+    return base64.b64encode(array.tobytes()).decode("ascii")
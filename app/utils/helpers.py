@@ -45,4 +45,11 @@ def generate_completion_id():
 
 def get_current_timestamp():
     """Get the current timestamp in seconds"""
-    return int(time.time())
\ No newline at end of file
+    return int(time.time())
+
+def get_api_key(headers):
+    """Return the bearer token the client sent in its Authorization header, or None"""
+    auth = headers.get("Authorization", "")
+    if auth[:7].lower() == "bearer ":
+        return auth[7:].strip() or None
+    return None
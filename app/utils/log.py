@@ -0,0 +1,57 @@
+import itertools
+import json
+import logging
+from app.config import LOG_PAYLOAD_SAMPLE_RATE
+
+# Full request/response payloads go to their own logger, so they can be routed or silenced separately
+payload_logger = logging.getLogger("app.payloads")
+
+
+class LazyJSON:
+    """
+    Defers json.dumps to the moment a log record is actually formatted:
+    logger.debug("chunk: %s", LazyJSON(chunk)) costs nothing when DEBUG is off.
+    """
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        try:
+            return json.dumps(self.obj, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            return repr(self.obj)
+
+
+class PayloadSampler:
+    """
+    Picks 1 request in `rate` whose full payloads are logged (0 logs none,
+    1 logs every request). The decision is a counter increment, so requests
+    that are not sampled pay nothing for payload logging.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._counter = itertools.count()
+
+    def sample(self):
+        """Return True if the current request's payloads should be logged"""
+        if self.rate <= 0:
+            return False
+        return next(self._counter) % self.rate == 0
+
+
+def log_payload(sampled, label, payload):
+    """
+    Log a request or response payload if the request was sampled. `payload`
+    may be a callable returning it, so unsampled requests never produce it.
+    """
+    if sampled and payload_logger.isEnabledFor(logging.INFO):
+        if callable(payload):
+            payload = payload()
+        payload_logger.info("%s: %s", label, payload if isinstance(payload, str) else LazyJSON(payload))
+
+
+# Create a singleton instance of the payload sampler
+payload_sampler = PayloadSampler(LOG_PAYLOAD_SAMPLE_RATE)
@@ -1,6 +1,7 @@
 import json
 from flask import jsonify
-from app.config import logger
+from app.config import STREAM_UPDATE_INTERVAL, logger
+from app.utils.log import LazyJSON
 from app.utils.helpers import generate_completion_id, get_current_timestamp
 from gigachat.models import Messages, MessagesRole, Function, FunctionParameters
 
@@ -16,7 +17,7 @@ def validate_finish_reason(finish_reason):
     """
     expected_values = ["stop", "length", "tool_calls", "content_filter", None]
     if finish_reason not in expected_values:
-        logger.warning(f"[PROXY] Unexpected finish_reason value: '{finish_reason}'. Expected one of: {expected_values}")
+        logger.warning("[PROXY] Unexpected finish_reason value: '%s'. Expected one of: %s", finish_reason, expected_values)
         # Special case for blacklist finish reason
         if finish_reason == "blacklist":
             logger.info("[PROXY] Converting 'blacklist' finish_reason to 'content_filter'")
@@ -60,15 +61,14 @@ def convert_to_gigachat_messages(openai_messages):
                 # Set content to empty string when there's a function call
                 gigachat_message.content = ""
 
-                logger.debug(f"Converting tool_call to function_call: {function_data}")
-                logger.warning(f"Note: Multiple tool calls were present but only using the first one as GigaChat only supports one function call at a time")
+                logger.debug("Converting tool_call to function_call: %s", function_data)
 
                 # Get arguments and parse them if they're a JSON string
                 arguments = function_data.get('arguments', '{}')
                 if isinstance(arguments, str):
                     try:
                         arguments = json.loads(arguments)
-                        logger.debug(f"Parsed arguments from JSON string: {arguments}")
+                        logger.debug("Parsed arguments from JSON string: %s", arguments)
                     except json.JSONDecodeError as e:
                         logger.error(f"Failed to parse arguments as JSON: {e}. Using empty dict.")
                         arguments = {}
@@ -80,9 +80,10 @@ def convert_to_gigachat_messages(openai_messages):
                     arguments=arguments
                 )
 
-                logger.debug(f"Converted tool_call to function_call: {gigachat_message.function_call}")
+                logger.debug("Converted tool_call to function_call: %s", gigachat_message.function_call)
                 if len(msg['tool_calls']) > 1:
-                    logger.warning(f"Ignored {len(msg['tool_calls']) - 1} additional tool calls as GigaChat only supports one function call")
+                    logger.warning("Ignored %d additional tool calls as GigaChat only supports one function call",
+                                   len(msg['tool_calls']) - 1)
 
         if role == MessagesRole.FUNCTION:
             gigachat_message.content = json.dumps({"result": msg.get('content')}, ensure_ascii=False)
@@ -138,14 +139,14 @@ def convert_function_call_to_tool_calls(function_call):
     arguments = getattr(function_call, 'arguments', "{}")
 
     # Log the original arguments for debugging
-    logger.debug(f"Original function call arguments: {arguments} (type: {type(arguments)})")
+    logger.debug("Original function call arguments: %s (type: %s)", arguments, type(arguments))
 
     # If arguments is already a string, use it directly
     # If it's a dict or other object, convert it to a JSON string
     if not isinstance(arguments, str):
         try:
             arguments = json.dumps(arguments)
-            logger.debug(f"Converted arguments to JSON string: {arguments}")
+            logger.debug("Converted arguments to JSON string: %s", arguments)
         except Exception as e:
             logger.error(f"Error converting function call arguments to JSON: {str(e)}")
             arguments = "{}"
@@ -158,9 +159,9 @@ def convert_function_call_to_tool_calls(function_call):
             parsed = json.loads(arguments)
             # Then re-encode it to ensure proper escaping
             arguments = json.dumps(parsed)
-            logger.debug(f"Re-encoded arguments for proper escaping: {arguments}")
+            logger.debug("Re-encoded arguments for proper escaping: %s", arguments)
         except json.JSONDecodeError as e:
-            logger.warning(f"Arguments string is not valid JSON, using as is: {str(e)}")
+            logger.warning("Arguments string is not valid JSON, using as is: %s", e)
 
     tool_call = {
         "id": call_id,
@@ -171,13 +172,14 @@ def convert_function_call_to_tool_calls(function_call):
         }
     }
 
-    logger.debug(f"Final tool call: {json.dumps(tool_call)}")
+    logger.debug("Final tool call: %s", LazyJSON(tool_call))
     return [tool_call]
 
 
-def build_chat_params(request_data, streaming=False):
+def build_chat_params(request_data, streaming=False, update_interval=STREAM_UPDATE_INTERVAL):
     """
     Build and return a dict of parameters suitable for instantiating a Chat object.
+    Streams ask GigaChat for a chunk every `update_interval` seconds.
     """
     gigachat_messages = convert_to_gigachat_messages(request_data['messages'])
     functions = None
@@ -191,7 +193,7 @@ def build_chat_params(request_data, streaming=False):
 
     # If streaming, set update_interval
     if streaming:
-        chat_params["update_interval"] = 0.1
+        chat_params["update_interval"] = update_interval
 
     # Add optional parameters
     if "temperature" in request_data:
@@ -234,7 +236,7 @@ def build_stream_chunk(completion_id, created_time, content, finish_reason, tool
     # We should include empty strings in the response
     if content is not None:
         chunk["choices"][0]["delta"]["content"] = content
-        logger.debug(f"[PROXY] Adding content to chunk: '{content}'")
+        logger.debug("[PROXY] Adding content to chunk: '%s'", content)
     else:
         logger.debug("[PROXY] Content is None, not adding to chunk")
 
@@ -245,7 +247,7 @@ def build_stream_chunk(completion_id, created_time, content, finish_reason, tool
         chunk["choices"][0]["delta"]["content"] = None
         logger.debug("[PROXY] Adding tool_calls to chunk and setting content to null")
 
-    logger.debug(f"[PROXY] Final chunk structure: {json.dumps(chunk)}")
+    logger.debug("[PROXY] Final chunk structure: %s", LazyJSON(chunk))
     return chunk
 
 
@@ -271,7 +273,7 @@ def build_non_stream_json(response):
             if hasattr(message, 'function_call'):
                 tool_calls = convert_function_call_to_tool_calls(message.function_call)
                 if tool_calls:
-                    logger.warning(f"[PROXY] Received function call in response: {json.dumps(tool_calls)}")
+                    logger.info("[PROXY] Received function call in response: %s", LazyJSON(tool_calls))
                     finish_reason = "tool_calls"  # Set finish_reason to tool_calls when tool_calls are present
                     assistant_content = None  # Set content to null when tool_calls are present
 
@@ -308,7 +310,7 @@ def build_non_stream_json(response):
     if tool_calls:
         result["choices"][0]["message"]["tool_calls"] = tool_calls
 
-    logger.debug(f"Formatted response: {json.dumps(result)}")
+    logger.debug("Formatted response: %s", LazyJSON(result))
     return result
 
 
@@ -326,12 +328,12 @@ def parse_chunk_fields(chunk):
                 if hasattr(choice.delta, 'content'):
                     # Even if content is empty string, we should capture it
                     content = choice.delta.content
-                    logger.warning(f"[PROXY] Received content in streaming chunk: {content}")
+                    logger.debug("[PROXY] Received content in streaming chunk: %s", content)
 
                 # Handle function calls separately - don't overwrite content unless necessary
                 if hasattr(choice.delta, 'function_call'):
                     tool_calls = convert_function_call_to_tool_calls(choice.delta.function_call)
-                    logger.warning(f"[PROXY] Received function call in streaming chunk: {json.dumps(tool_calls)}")
+                    logger.debug("[PROXY] Received function call in streaming chunk: %s", LazyJSON(tool_calls))
                     # Only set finish_reason for tool_calls, but don't reset content to None
                     # unless there's actually a tool call
                     if tool_calls:
@@ -339,7 +341,7 @@ def parse_chunk_fields(chunk):
                         content = None  # Only set content to null if we have actual tool calls
 
             if hasattr(choice, 'finish_reason'):
-                logger.warning(f"[PROXY] Received finish_reason in streaming chunk: {choice.finish_reason}")
+                logger.debug("[PROXY] Received finish_reason in streaming chunk: %s", choice.finish_reason)
                 # Only use the choice's finish_reason if we don't have tool_calls
                 if not tool_calls:
                     finish_reason = choice.finish_reason
@@ -347,7 +349,8 @@ def parse_chunk_fields(chunk):
     # Validate finish_reason
     finish_reason = validate_finish_reason(finish_reason)
 
-    logger.debug(f"[PROXY] Extracted from chunk - content: {content}, finish_reason: {finish_reason}, tool_calls: {tool_calls}")
+    logger.debug("[PROXY] Extracted from chunk - content: %s, finish_reason: %s, tool_calls: %s",
+                 content, finish_reason, tool_calls)
     return content, finish_reason, tool_calls
 
 
@@ -0,0 +1,106 @@
+import os
+import time
+
+from flask import g, request
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest
+)
+from prometheus_client import multiprocess
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py), every worker writes
+# its samples to mmap-backed files in that directory and a scrape of any worker
+# aggregates all of them, so /metrics shows the whole container.
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR', '')
+
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 30)
+CHUNK_GAP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+http_requests = Counter(
+    'gigachat_proxy_http_requests_total', 'HTTP requests served',
+    ['route', 'method', 'status'])
+http_request_duration = Histogram(
+    'gigachat_proxy_http_request_duration_seconds', 'Time from request start to the last byte sent',
+    ['route'], buckets=REQUEST_BUCKETS)
+stream_ttft = Histogram(
+    'gigachat_proxy_stream_time_to_first_token_seconds', 'Time from the upstream stream start to its first chunk',
+    buckets=TTFT_BUCKETS)
+stream_chunk_gap = Histogram(
+    'gigachat_proxy_stream_inter_chunk_seconds', 'Gap between consecutive upstream stream chunks',
+    buckets=CHUNK_GAP_BUCKETS)
+streams_in_flight = Gauge(
+    'gigachat_proxy_streams_in_flight', 'Streaming responses currently being sent',
+    multiprocess_mode='livesum')
+streams_cancelled = Counter(
+    'gigachat_proxy_streams_cancelled_total', 'Streams cancelled upstream because the client went away')
+stream_tokens_saved = Counter(
+    'gigachat_proxy_stream_tokens_saved_total', 'Estimated completion tokens not generated thanks to cancelled streams')
+rate_limited_requests = Counter(
+    'gigachat_proxy_rate_limited_requests_total', 'Requests rejected with 429 by the rate limiter',
+    ['reason'])
+upstream_duration = Histogram(
+    'gigachat_proxy_upstream_request_duration_seconds', 'Latency of GigaChat API calls',
+    ['operation'], buckets=REQUEST_BUCKETS)
+token_refreshes = Counter(
+    'gigachat_proxy_token_refreshes_total', 'Access token requests to the OAuth endpoint',
+    ['result'])
+token_refresh_duration = Histogram(
+    'gigachat_proxy_token_refresh_duration_seconds', 'Latency of access token requests')
+tokens_used = Counter(
+    'gigachat_proxy_tokens_total', 'Tokens reported by GigaChat usage',
+    ['route', 'kind'])
+
+
+def render_metrics():
+    """Return the exposition text, aggregated across workers when multiprocess mode is on"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+async def track_stream(body):
+    """Count a streaming response as in flight until its body is exhausted or closed"""
+    streams_in_flight.inc()
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        streams_in_flight.dec()
+        await body.aclose()
+
+
+def register_request_metrics(app):
+    """Count every request and time it to its last byte (streams included)"""
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        # The rule, not the path, so unknown paths don't explode the label set
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        method = request.method
+        status = str(response.status_code)
+        usage = g.get('audit_usage')
+
+        def observe():
+            http_requests.labels(route, method, status).inc()
+            http_request_duration.labels(route).observe(time.perf_counter() - started)
+            if usage:
+                for kind in ('prompt_tokens', 'completion_tokens'):
+                    if usage.get(kind):
+                        tokens_used.labels(route, kind).inc(usage[kind])
+
+        response.call_on_close(observe)
+        return response
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import time
+from app.config import GIGACHAT_API_V1_URL, MODELS_CACHE_TTL, logger
+from app.auth.token_manager import token_manager
+from app.utils.ssl import create_async_http_client
+from app.utils.metrics import upstream_duration
+
+
+class ModelsEntry:
+    """A cached upstream /models response body and its validators"""
+    __slots__ = ("body", "etag", "upstream_etag", "fetched_at")
+
+    def __init__(self, body, upstream_etag):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.upstream_etag = upstream_etag
+        self.fetched_at = time.monotonic()
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+class ModelsCache:
+    """
+    In-process cache of the upstream model list.
+
+    Within the TTL the list is served from memory. Once it is stale, the
+    last known list is still served while a single background task
+    revalidates it upstream (with If-None-Match when GigaChat sent an ETag).
+    If the upstream fails, the last known list keeps being served.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entry = None
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.refresh_failures = 0
+
+    async def get(self):
+        """Return the cached ModelsEntry, fetching it inline only when nothing is cached yet"""
+        entry = self._entry
+        if entry is None:
+            self.misses += 1
+            return await asyncio.shield(self._refresh_task())
+        self.hits += 1
+        if entry.age() >= self.ttl:
+            self._refresh_task()
+        return entry
+
+    def max_age(self, entry):
+        """Seconds the client may reuse `entry` without revalidating"""
+        return max(int(self.ttl - entry.age()), 0)
+
+    def _refresh_task(self):
+        """Return the in-flight refresh, starting one if needed (single-flight)"""
+        task = self._task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._task = asyncio.ensure_future(self._fetch())
+            task.add_done_callback(self._on_refresh_done)
+        return task
+
+    def _on_refresh_done(self, task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.refresh_failures += 1
+            if self._entry is not None:
+                logger.warning(f"Failed to refresh models list, serving the last known one: {str(error)}")
+
+    async def _fetch(self):
+        async with create_async_http_client() as http_client:
+            token, response = await self._get_models(http_client)
+            if response.status_code == 401:
+                # The token was rejected: refresh it and retry once
+                token_manager.invalidate(token)
+                token, response = await self._get_models(http_client)
+
+        entry = self._entry
+        if response.status_code == 304 and entry is not None:
+            entry.fetched_at = time.monotonic()
+            logger.debug("Models list not modified upstream")
+            return entry
+
+        response.raise_for_status()
+        # Validate that the upstream sent JSON before caching it
+        response.json()
+        self._entry = ModelsEntry(response.content, response.headers.get("etag"))
+        logger.info("Successfully fetched models from GigaChat API")
+        return self._entry
+
+    async def _get_models(self, http_client):
+        token = await token_manager.aget_valid_token()
+        headers = {"Authorization": f"Bearer {token}"}
+        if self._entry is not None and self._entry.upstream_etag:
+            headers["If-None-Match"] = self._entry.upstream_etag
+        with upstream_duration.labels("models").time():
+            return token, await http_client.get(f"{GIGACHAT_API_V1_URL}/models", headers=headers)
+
+    def stats(self):
+        """Return cache counters"""
+        entry = self._entry
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refresh_failures": self.refresh_failures,
+            "age": round(entry.age(), 1) if entry is not None else None,
+        }
+
+
+# Create a singleton instance of the models cache
+models_cache = ModelsCache(ttl=MODELS_CACHE_TTL)
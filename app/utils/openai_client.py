@@ -1,14 +1,47 @@
+from contextlib import asynccontextmanager
+from functools import cached_property
+import time
+import httpx
 from gigachat import GigaChat
+from gigachat.exceptions import AuthenticationError
 from app.auth.token_manager import token_manager
-from app.utils.ssl import create_combined_cert_bundle
-from app.config import GIGACHAT_API_V1_URL, logger
+from app.utils.ssl import create_combined_cert_bundle, get_ssl_context
+from app.utils.client_pool import GigaChatClientPool
+from app.utils.timing import current_timing, timed
+from app.config import GIGACHAT_API_V1_URL, CLIENT_POOL_MAX_SIZE, logger
 import os
 
-def create_gigachat_client():
+class SharedSSLGigaChat(GigaChat):
+    """
+    GigaChat client whose HTTP transports verify with the worker's shared
+    SSL context, instead of parsing the CA bundle again for every transport.
+    """
+
+    def _http_kwargs(self):
+        return {"verify": get_ssl_context(), "timeout": httpx.Timeout(self._settings.timeout)}
+
+    @cached_property
+    def _client(self):
+        return httpx.Client(base_url=self._settings.base_url, **self._http_kwargs())
+
+    @cached_property
+    def _auth_client(self):
+        return httpx.Client(**self._http_kwargs())
+
+    @cached_property
+    def _aclient(self):
+        return httpx.AsyncClient(base_url=self._settings.base_url, **self._http_kwargs())
+
+    @cached_property
+    def _auth_aclient(self):
+        return httpx.AsyncClient(**self._http_kwargs())
+
+def create_gigachat_client(token=None, base_url=GIGACHAT_API_V1_URL):
     """Create a GigaChat client"""
     try:
         # Get a valid token
-        token = token_manager.get_valid_token()
+        if token is None:
+            token = token_manager.get_valid_token()
 
         # key = os.getenv("MASTER_TOKEN")
 
@@ -16,11 +49,11 @@ def create_gigachat_client():
         cert_path = create_combined_cert_bundle()
 
         # Initialize GigaChat client
-        client = GigaChat(
+        client = SharedSSLGigaChat(
             # credentials=key,
             access_token=token,
             ca_bundle_file=cert_path,
-            base_url=GIGACHAT_API_V1_URL,
+            base_url=base_url,
             verify_ssl_certs=False  # Disable SSL verification for compatibility
         )
 
@@ -34,4 +67,70 @@ def create_gigachat_client():
 # Create a function to get a client with a fresh token
 def get_client():
     """Get a GigaChat client with a fresh token"""
-    return create_gigachat_client()
\ No newline at end of file
+    return create_gigachat_client()
+
+# Long-lived clients shared by the requests of this worker
+client_pool = GigaChatClientPool(create_gigachat_client, max_size=CLIENT_POOL_MAX_SIZE)
+
+@asynccontextmanager
+async def lease_client(token=None):
+    """Lease a pooled GigaChat client for the given (or current) access token"""
+    if token is None:
+        with timed("token"):
+            token = await token_manager.aget_valid_token()
+    with timed("client"):
+        entry = client_pool.acquire(token, GIGACHAT_API_V1_URL)
+    try:
+        yield entry.client
+    finally:
+        await client_pool.release(entry)
+
+async def call_with_auth_retry(call):
+    """
+    Run `call(client)` on a pooled client. If GigaChat rejects the access
+    token (401), invalidate it and retry once with a fresh one.
+    """
+    with timed("token"):
+        token = await token_manager.aget_valid_token()
+    try:
+        async with lease_client(token) as client:
+            with timed("upstream"):
+                return await call(client)
+    except AuthenticationError:
+        logger.warning("GigaChat returned 401, refreshing the access token and retrying once")
+        token_manager.invalidate(token)
+
+    async with lease_client() as client:
+        with timed("upstream"):
+            return await call(client)
+
+async def astream_with_auth_retry(chat):
+    """
+    Stream a chat on a pooled client. A 401 is raised before the first chunk,
+    so it is retried once with a fresh token just like call_with_auth_retry.
+    The time to the first chunk is recorded as the request's upstream stage.
+    """
+    timing = current_timing()
+    with timed("token"):
+        token = await token_manager.aget_valid_token()
+    for attempt in range(2):
+        async with lease_client(token) as client:
+            upstream = client.astream(chat)
+            emitted = False
+            started = time.perf_counter()
+            try:
+                async for chunk in upstream:
+                    if not emitted and timing is not None:
+                        timing.add("upstream", time.perf_counter() - started)
+                    emitted = True
+                    yield chunk
+                return
+            except AuthenticationError:
+                if emitted or attempt:
+                    raise
+                logger.warning("GigaChat returned 401, refreshing the access token and retrying once")
+                token_manager.invalidate(token)
+            finally:
+                await upstream.aclose()
+        with timed("token"):
+            token = await token_manager.aget_valid_token()
@@ -0,0 +1,315 @@
+import asyncio
+import functools
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import orjson
+from flask import request
+
+from app.config import (
+    RATE_LIMIT_RPS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_TPM,
+    RATE_LIMIT_BY_KEY,
+    RATE_LIMIT_MAX_WAIT,
+    RATE_LIMIT_QUEUE_SIZE,
+    RATE_LIMIT_STORE_PATH,
+    logger
+)
+from app.utils.helpers import get_api_key
+from app.utils.mapping import error_response
+from app.utils.metrics import rate_limited_requests
+from app.utils.stream_stats import CHARS_PER_TOKEN
+from app.utils.timeouts import current_deadline
+
+# Completion tokens assumed for a chat request without max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+# Reservations between sweeps of buckets that have refilled completely
+PRUNE_EVERY = 1024
+
+
+class Limits:
+    """Request and token rates of one API key; 0 disables a limit"""
+    __slots__ = ("rps", "burst", "tpm")
+
+    def __init__(self, rps=0.0, burst=0.0, tpm=0.0):
+        self.rps = float(rps)
+        self.burst = float(burst)
+        self.tpm = float(tpm)
+
+    @property
+    def enabled(self):
+        return self.rps > 0 or self.tpm > 0
+
+    def buckets(self, tokens):
+        """(name, refill per second, capacity, cost) of the buckets a request of `tokens` draws from"""
+        buckets = []
+        if self.rps > 0:
+            buckets.append(("requests", self.rps, self.burst or max(1.0, self.rps), 1.0))
+        if self.tpm > 0:
+            # A request larger than a minute's worth only has to wait for a full bucket
+            buckets.append(("tokens", self.tpm / 60, self.tpm, min(float(tokens), self.tpm)))
+        return buckets
+
+
+def reserve(state, buckets, now, max_wait):
+    """
+    Token bucket step shared by the stores. `state` maps bucket names to
+    (level, updated). Returns (wait, limiting bucket, new state), the new
+    state being None when the wait exceeds `max_wait` and nothing is taken.
+
+    A request admitted with a wait takes its cost at once, leaving the level
+    negative: it has reserved the capacity that refills while it waits, so
+    later requests queue behind it in order.
+    """
+    wait, limiting = 0.0, None
+    levels = {}
+    full_at = now
+    for name, rate, capacity, cost in buckets:
+        level, updated = state.get(name, (capacity, now))
+        level = min(capacity, level + rate * max(0.0, now - updated))
+        needed = (cost - level) / rate
+        if needed > wait:
+            wait, limiting = needed, name
+        levels[name] = level - cost
+        full_at = max(full_at, now + (capacity - levels[name]) / rate)
+    if wait > max_wait:
+        return wait, limiting, None
+    return wait, limiting, ({name: (level, now) for name, level in levels.items()}, full_at)
+
+
+class MemoryBucketStore:
+    """Buckets of this worker only"""
+    name = "memory"
+    blocking = False
+
+    def __init__(self):
+        # key -> (state, time by which every bucket is full again)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._reservations = 0
+
+    def reserve(self, key, buckets, now, max_wait):
+        with self._lock:
+            entry = self._buckets.get(key)
+            wait, limiting, taken = reserve(entry[0] if entry else {}, buckets, now, max_wait)
+            if taken is not None:
+                self._buckets[key] = taken
+                self._reservations += 1
+                if self._reservations % PRUNE_EVERY == 0:
+                    # A full bucket is the same as no bucket
+                    self._buckets = {k: v for k, v in self._buckets.items() if v[1] > now}
+        return wait, limiting
+
+
+class SqliteBucketStore:
+    """
+    Buckets in a sqlite file shared by every worker of the container. Each
+    reservation is one IMMEDIATE transaction, so workers never both take the
+    same capacity. The connection is opened lazily per process. Reservations
+    may wait on other workers' transactions, so the limiter runs them in the
+    default executor rather than on the event loop.
+    """
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._reservations = 0
+
+    def _connection(self):
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, state TEXT NOT NULL, full_at REAL NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._db
+
+    def reserve(self, key, buckets, now, max_wait):
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT state FROM buckets WHERE key = ?", (key,)).fetchone()
+                state = {name: tuple(value) for name, value in json.loads(row[0]).items()} if row else {}
+                wait, limiting, taken = reserve(state, buckets, now, max_wait)
+                if taken is not None:
+                    db.execute("INSERT OR REPLACE INTO buckets (key, state, full_at) VALUES (?, ?, ?)",
+                               (key, json.dumps(taken[0]), taken[1]))
+                    self._reservations += 1
+                    if self._reservations % PRUNE_EVERY == 0:
+                        db.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return wait, limiting
+
+
+def parse_limits_by_key(raw):
+    """Parse RATE_LIMIT_BY_KEY into {api key: Limits}"""
+    if not raw:
+        return {}
+    mapping = json.loads(raw)
+    if not isinstance(mapping, dict):
+        raise ValueError("RATE_LIMIT_BY_KEY must be a JSON object")
+    return {key: Limits(**limits) for key, limits in mapping.items()}
+
+
+class RateLimiter:
+    """
+    Per-API-key rate limiter of the chat and embeddings endpoints.
+
+    Callers are told apart by the bearer token of their Authorization
+    header (requests without one share a bucket). Each key has a request
+    bucket (`rps`, `burst`) and an estimated-token bucket (`tpm`, holding a
+    minute's worth). A request over the limit waits for capacity if it can
+    get it within `max_wait` seconds and fewer than `queue_size` requests of
+    the key are already waiting in this worker; otherwise it is rejected
+    with the exact time until the capacity it needs is back.
+    """
+
+    def __init__(self, default_limits, limits_by_key=None, max_wait=2.0, queue_size=16, store=None):
+        self.default_limits = default_limits
+        self.limits_by_key = limits_by_key or {}
+        self.max_wait = max_wait
+        self.queue_size = queue_size
+        self.store = store if store is not None else MemoryBucketStore()
+        self._waiting = {}
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self):
+        return self.default_limits.enabled or any(limits.enabled for limits in self.limits_by_key.values())
+
+    async def acquire(self, api_key, tokens, max_wait=None):
+        """
+        Wait until a request of `tokens` estimated tokens may proceed. Returns
+        None once it may, or (seconds to retry after, limiting bucket) if it is rejected.
+        """
+        limits = self.limits_by_key.get(api_key, self.default_limits)
+        if not limits.enabled:
+            return None
+        # Secrets never reach the shared store
+        key = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:32]
+        queue_full = self._waiting.get(key, 0) >= self.queue_size
+        allowed_wait = 0.0 if queue_full else self.max_wait
+        if max_wait is not None:
+            allowed_wait = min(allowed_wait, max_wait)
+
+        buckets = limits.buckets(tokens)
+        if self.store.blocking:
+            wait, limiting = await asyncio.get_running_loop().run_in_executor(
+                None, self.store.reserve, key, buckets, time.time(), allowed_wait)
+        else:
+            wait, limiting = self.store.reserve(key, buckets, time.time(), allowed_wait)
+        if wait > allowed_wait:
+            self.rejected += 1
+            rate_limited_requests.labels("queue" if queue_full else limiting).inc()
+            return wait, limiting
+
+        self.admitted += 1
+        if wait > 0:
+            self.delayed += 1
+            self._waiting[key] = self._waiting.get(key, 0) + 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waiting[key] -= 1
+                if not self._waiting[key]:
+                    del self._waiting[key]
+        return None
+
+    def stats(self):
+        """Return limiter counters"""
+        return {
+            "enabled": self.enabled,
+            "store": self.store.name,
+            "admitted": self.admitted,
+            "delayed": self.delayed,
+            "rejected": self.rejected,
+            "waiting": sum(self._waiting.values()),
+        }
+
+
+def estimate_chat_tokens(request_data):
+    """Rough token cost of a chat request: its prompt plus the completion it may generate"""
+    try:
+        chars = sum(len(str(message.get("content") or "")) for message in request_data.get("messages") or [])
+        if request_data.get("tools"):
+            chars += len(orjson.dumps(request_data["tools"]))
+        completion = int(request_data.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+    except (AttributeError, TypeError, ValueError):
+        return 1
+    return math.ceil(chars / CHARS_PER_TOKEN) + completion
+
+
+def estimate_embedding_tokens(request_data):
+    """Rough token cost of an embeddings request"""
+    texts = request_data.get("input") or []
+    if isinstance(texts, str):
+        texts = [texts]
+    try:
+        return max(1, math.ceil(sum(len(str(text)) for text in texts) / CHARS_PER_TOKEN))
+    except TypeError:
+        return 1
+
+
+def rate_limit_response(retry_after, limiting):
+    """OpenAI-style 429 telling the client when to retry"""
+    response, status = error_response(
+        message=f"Rate limit reached for {limiting}, please retry after {retry_after:.1f}s",
+        error_type=limiting,
+        code="rate_limit_exceeded",
+        status=429
+    )
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    # Honored by the OpenAI SDKs in preference to Retry-After
+    response.headers['Retry-After-Ms'] = str(max(1, math.ceil(retry_after * 1000)))
+    return response, status
+
+
+def rate_limited(estimate_tokens):
+    """
+    Put an async API view behind the rate limiter. `estimate_tokens(request_data)`
+    sizes each request for the token bucket. Waiting never outlasts the
+    request's deadline.
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        async def limited_view(*args, **kwargs):
+            if rate_limiter.enabled:
+                deadline = current_deadline()
+                request_data = request.get_json(silent=True)
+                tokens = estimate_tokens(request_data) if isinstance(request_data, dict) else 1
+                rejection = await rate_limiter.acquire(get_api_key(request.headers), tokens,
+                                                       deadline.remaining() if deadline is not None else None)
+                if rejection is not None:
+                    logger.warning(f"Rate limit reached for {rejection[1]}, retry after {rejection[0]:.2f}s")
+                    return rate_limit_response(*rejection)
+            return await view(*args, **kwargs)
+        return limited_view
+    return decorate
+
+
+# Create a singleton instance of the rate limiter
+rate_limiter = RateLimiter(
+    Limits(RATE_LIMIT_RPS, RATE_LIMIT_BURST, RATE_LIMIT_TPM),
+    limits_by_key=parse_limits_by_key(RATE_LIMIT_BY_KEY),
+    max_wait=RATE_LIMIT_MAX_WAIT,
+    queue_size=RATE_LIMIT_QUEUE_SIZE,
+    store=SqliteBucketStore(RATE_LIMIT_STORE_PATH) if RATE_LIMIT_STORE_PATH else None
+)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from app.config import CHAT_CACHE_TTL, CHAT_CACHE_MAX_ENTRIES, logger
+
+# Request fields build_chat_params turns into the upstream Chat, with the same coercions
+CACHE_KEY_FIELDS = {
+    "messages": None,
+    "tools": None,
+    "temperature": float,
+    "max_tokens": int,
+    "top_p": float,
+}
+
+
+def chat_request_key(request_data):
+    """
+    Return a canonical SHA-256 of the fields build_chat_params uses, or None
+    for a malformed request (the normal path then reports the error).
+    """
+    try:
+        canonical = {}
+        for field, coerce in CACHE_KEY_FIELDS.items():
+            if field in request_data:
+                value = request_data[field]
+                canonical[field] = coerce(value) if coerce is not None else value
+        payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(request_data):
+    """Whether `request_data` samples at temperature 0 (GigaChat's default is not 0)"""
+    try:
+        return float(request_data.get("temperature", 1)) == 0
+    except (TypeError, ValueError):
+        return False
+
+
+class ChatResponseCache:
+    """
+    Exact-match cache of chat completion results.
+
+    Only deterministic requests (temperature 0) are cached, keyed on a
+    canonical hash of the fields build_chat_params uses, so the stream and
+    non-stream forms of a request share an entry. Entries expire after `ttl`
+    seconds and the least recently used are evicted past `max_entries`. A
+    `ttl` of 0 disables the cache.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    def key_for(self, request_data):
+        """Return the cache key for `request_data`, or None if it must not be cached"""
+        if self.ttl <= 0 or not is_deterministic(request_data):
+            return None
+        return chat_request_key(request_data)
+
+    def get(self, key):
+        """Return the cached result for `key`, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, result):
+        """Cache a chat.completion result body"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        logger.debug("Cached chat completion %.12s", key)
+
+    def bypass(self):
+        """Count a request that skipped the lookup because of Cache-Control"""
+        with self._lock:
+            self.bypasses += 1
+
+    def stats(self):
+        """Return cache counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions,
+            }
+
+
+class StreamTranscript:
+    """Accumulates a streamed completion so it can be cached once upstream finishes"""
+
+    def __init__(self):
+        self.content = []
+        self.tool_calls = None
+        self.finish_reason = None
+
+    def add(self, content, finish_reason, tool_calls):
+        if content:
+            self.content.append(content)
+        if tool_calls:
+            self.tool_calls = tool_calls
+        if finish_reason:
+            self.finish_reason = finish_reason
+
+    def result(self):
+        """Return the transcript as a chat.completion body, or None if the stream did not finish"""
+        if self.finish_reason is None:
+            return None
+        message = {
+            "role": "assistant",
+            "content": None if self.tool_calls else "".join(self.content)
+        }
+        if self.tool_calls:
+            message["tool_calls"] = self.tool_calls
+        return {
+            "object": "chat.completion",
+            "model": "GigaChat",
+            "choices": [{"index": 0, "message": message, "finish_reason": self.finish_reason}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+
+
+def cache_control_directives(header):
+    """Parse a Cache-Control header value into a set of lowercase directive names"""
+    if not header:
+        return frozenset()
+    return frozenset(part.split("=", 1)[0].strip().lower() for part in header.split(","))
+
+
+# Create a singleton instance of the chat response cache
+chat_cache = ChatResponseCache(ttl=CHAT_CACHE_TTL, max_entries=CHAT_CACHE_MAX_ENTRIES)
@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app.config import (
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_EMBEDDING_MODEL,
+    SEMANTIC_CACHE_VERIFY_RATE, logger
+)
+from app.utils.embedding_batcher import embed_texts
+
+# Lower bounds of the similarity histogram buckets
+SIMILARITY_BUCKETS = (0.0, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99)
+
+
+def _bucket(similarity):
+    label = SIMILARITY_BUCKETS[0]
+    for bound in SIMILARITY_BUCKETS:
+        if similarity >= bound:
+            label = bound
+    return str(label)
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Namespace:
+    """Unit vectors of cached prompts sharing a model and conversation context, with their results"""
+
+    def __init__(self, dim):
+        self.vectors = np.empty((8, dim), dtype=np.float32)
+        self.last_used = np.empty(8, dtype=np.float64)
+        self.results = []
+
+    def __len__(self):
+        return len(self.results)
+
+    def search(self, query):
+        """Return (row, cosine similarity) of the closest cached prompt"""
+        size = len(self.results)
+        similarities = self.vectors[:size] @ query
+        row = int(np.argmax(similarities))
+        return row, float(similarities[row])
+
+    def add(self, query, result):
+        size = len(self.results)
+        if size == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+            self.last_used = np.concatenate([self.last_used, np.empty_like(self.last_used)])
+        self.vectors[size] = query
+        self.last_used[size] = time.monotonic()
+        self.results.append(result)
+
+    def evict_lru(self):
+        """Drop the least recently used row (the last row is moved into its slot)"""
+        size = len(self.results)
+        row = int(np.argmin(self.last_used[:size]))
+        last = size - 1
+        self.vectors[row] = self.vectors[last]
+        self.last_used[row] = self.last_used[last]
+        self.results[row] = self.results[last]
+        self.results.pop()
+
+
+class SemanticLookup:
+    """The embedded prompt of a request, used to store its result after a miss"""
+    __slots__ = ("namespace", "prompt", "vector", "result", "similarity")
+
+    def __init__(self, namespace, prompt, vector):
+        self.namespace = namespace
+        self.prompt = prompt
+        self.vector = vector
+        self.result = None
+        self.similarity = None
+
+
+class SemanticChatCache:
+    """
+    Cache of chat completions matched on the meaning of the last user turn.
+
+    The last user message is embedded through the embeddings path (cache and
+    batcher) and compared with earlier prompts by cosine similarity. Prompts
+    are only compared within a namespace: the requested model plus a hash of
+    everything else that shapes the answer (earlier messages, tools,
+    sampling parameters). Above `threshold` the cached completion is
+    returned. The least recently used prompts are evicted past
+    `max_entries`.
+
+    A `verify_rate` fraction of hits is checked in the background against a
+    fresh upstream answer; a hit whose answers are less similar than
+    `threshold` counts as a false hit. Similarity histograms of all lookups
+    and of false hits are reported in stats() to help tune the threshold.
+    """
+
+    def __init__(self, threshold, max_entries, embedding_model, verify_rate=0.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embedding_model = embedding_model
+        self.verify_rate = verify_rate
+        self._namespaces = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+        self.verified = 0
+        self.false_hits = 0
+        self.similarity_histogram = {}
+        self.false_hit_histogram = {}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def split(self, request_data):
+        """Return (namespace, prompt) for a request, or None if it is not eligible"""
+        messages = request_data.get("messages") or []
+        if not self.enabled or "tools" in request_data or not messages:
+            return None
+        last = messages[-1]
+        if not isinstance(last, dict) or last.get("role") != "user" or not isinstance(last.get("content"), str):
+            return None
+        context = {
+            "model": request_data.get("model"),
+            "messages": messages[:-1],
+            "temperature": request_data.get("temperature"),
+            "max_tokens": request_data.get("max_tokens"),
+            "top_p": request_data.get("top_p"),
+        }
+        try:
+            payload = json.dumps(context, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest(), last["content"]
+
+    async def lookup(self, request_data):
+        """
+        Return a SemanticLookup whose `result` is set on a hit, or None when the
+        request is not eligible or its prompt could not be embedded.
+        """
+        split = self.split(request_data)
+        if split is None:
+            return None
+        namespace, prompt = split
+        try:
+            (entry,), _ = await embed_texts(self.embedding_model, [prompt])
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning(f"Semantic cache skipped, could not embed the prompt: {str(e)}")
+            return None
+
+        probe = SemanticLookup(namespace, prompt, _normalize(entry[0]))
+        with self._lock:
+            index = self._namespaces.get(namespace)
+            if index is None or len(index) == 0 or index.vectors.shape[1] != len(probe.vector):
+                self.misses += 1
+                return probe
+            self._namespaces.move_to_end(namespace)
+            row, similarity = index.search(probe.vector)
+            bucket = _bucket(similarity)
+            self.similarity_histogram[bucket] = self.similarity_histogram.get(bucket, 0) + 1
+            if similarity < self.threshold:
+                self.misses += 1
+                return probe
+            index.last_used[row] = time.monotonic()
+            self.hits += 1
+            probe.result = index.results[row]
+            probe.similarity = similarity
+        return probe
+
+    def store(self, probe, result):
+        """Cache `result` under the prompt embedded by a missed lookup"""
+        with self._lock:
+            index = self._namespaces.get(probe.namespace)
+            if index is None or index.vectors.shape[1] != len(probe.vector):
+                if index is not None:
+                    self._size -= len(index)
+                index = self._namespaces[probe.namespace] = _Namespace(len(probe.vector))
+            self._namespaces.move_to_end(probe.namespace)
+            index.add(probe.vector, result)
+            self._size += 1
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_entries:
+            namespace, index = next(iter(self._namespaces.items()))
+            if len(index) <= 1:
+                del self._namespaces[namespace]
+            else:
+                index.evict_lru()
+            self._size -= 1
+            self.evictions += 1
+
+    def maybe_verify(self, probe, fetch):
+        """
+        Sample a hit for verification: `fetch` is an async callable returning a
+        fresh chat.completion body for the request.
+        """
+        if self.verify_rate <= 0 or random.random() >= self.verify_rate:
+            return
+        task = asyncio.ensure_future(self._verify(probe, fetch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _verify(self, probe, fetch):
+        try:
+            fresh = await fetch()
+            answers = [_message_text(probe.result), _message_text(fresh)]
+            entries, _ = await embed_texts(self.embedding_model, answers)
+        except Exception as e:
+            logger.warning(f"Semantic cache verification failed: {str(e)}")
+            return
+        agreement = float(_normalize(entries[0][0]) @ _normalize(entries[1][0]))
+        with self._lock:
+            self.verified += 1
+            if agreement < self.threshold:
+                self.false_hits += 1
+                bucket = _bucket(probe.similarity)
+                self.false_hit_histogram[bucket] = self.false_hit_histogram.get(bucket, 0) + 1
+                logger.info(
+                    f"Semantic cache false hit (prompt similarity {probe.similarity:.3f}, "
+                    f"answer similarity {agreement:.3f})"
+                )
+
+    def stats(self):
+        """Return cache counters"""
+        with self._lock:
+            return {
+                "entries": self._size,
+                "namespaces": len(self._namespaces),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "evictions": self.evictions,
+                "verified": self.verified,
+                "false_hits": self.false_hits,
+                "similarity_histogram": dict(self.similarity_histogram),
+                "false_hit_histogram": dict(self.false_hit_histogram),
+            }
+
+
+def _message_text(result):
+    message = result["choices"][0]["message"]
+    return message.get("content") or json.dumps(message.get("tool_calls"))
+
+
+# Create a singleton instance of the semantic chat cache
+semantic_cache = SemanticChatCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    embedding_model=SEMANTIC_CACHE_EMBEDDING_MODEL,
+    verify_rate=SEMANTIC_CACHE_VERIFY_RATE
+)
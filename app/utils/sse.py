@@ -0,0 +1,121 @@
+import orjson
+from app.utils.mapping import validate_finish_reason
+
+# Pre-encoded end-of-stream frame
+DONE_FRAME = b"data: [DONE]\n\n"
+# SSE comment sent on an idle stream; clients ignore it
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+_ROLE_CHOICE = b'{"index":0,"delta":{"role":"assistant"},"finish_reason":null}'
+_FRAME_SUFFIX = b"]}\n\n"
+
+
+class ChunkEncoder:
+    """
+    Encodes the chat.completion.chunk SSE frames of one completion.
+
+    The parts shared by every chunk (id, object, created, model) are encoded
+    once into a byte prefix; each chunk only serializes its choice with
+    orjson. Frames are bytes, ready to be written to the client. The output
+    matches mapping.build_stream_chunk.
+    """
+    __slots__ = ("_prefix", "role_frame")
+
+    def __init__(self, completion_id, created_time, model="GigaChat"):
+        header = orjson.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created_time,
+            "model": model,
+        })
+        self._prefix = b"data: " + header[:-1] + b',"choices":['
+        self.role_frame = self._prefix + _ROLE_CHOICE + _FRAME_SUFFIX
+
+    def frame(self, content, finish_reason, tool_calls):
+        """Return the SSE frame for one delta"""
+        delta = {}
+        if content is not None:
+            delta["content"] = content
+        if tool_calls:
+            delta["tool_calls"] = tool_calls
+            delta["content"] = None
+        choice = {"index": 0, "delta": delta, "finish_reason": validate_finish_reason(finish_reason)}
+        return self._prefix + orjson.dumps(choice) + _FRAME_SUFFIX
+
+
+class FrameCoalescer:
+    """
+    Merges consecutive content deltas of one stream into fewer SSE frames,
+    for consumers that don't need token-by-token updates.
+
+    Content is held until `window` seconds have passed since the first held
+    delta or `max_bytes` bytes of it are held (0 disables a limit; with both
+    0 every delta is framed at once). The first content delta is never held,
+    so time to first token is unchanged; a finish reason or tool calls flush
+    what is held along with them.
+    """
+    __slots__ = ("encoder", "window", "max_bytes", "deadline", "_held", "_held_bytes", "_started")
+
+    def __init__(self, encoder, window=0.0, max_bytes=0):
+        self.encoder = encoder
+        self.window = window
+        self.max_bytes = max_bytes
+        # perf_counter time by which held content must be flushed, None when nothing is held
+        self.deadline = None
+        self._held = []
+        self._held_bytes = 0
+        self._started = False
+
+    @property
+    def enabled(self):
+        return self.window > 0 or self.max_bytes > 0
+
+    def frame(self, content, finish_reason, tool_calls, now):
+        """Return the frame(s) to send for one delta, or None while it is held"""
+        if not self.enabled:
+            return self.encoder.frame(content, finish_reason, tool_calls)
+        if self._started and content and finish_reason is None and not tool_calls:
+            self._held.append(content)
+            self._held_bytes += len(content.encode("utf-8"))
+            if self.deadline is None and self.window > 0:
+                self.deadline = now + self.window
+            if (self.max_bytes > 0 and self._held_bytes >= self.max_bytes) or \
+                    (self.deadline is not None and now >= self.deadline):
+                return self.flush()
+            return None
+        if content:
+            self._started = True
+        if tool_calls:
+            held = self.flush() or b""
+            return held + self.encoder.frame(content, finish_reason, tool_calls)
+        if self._held:
+            content = self._take() + (content or "")
+        if not content and finish_reason is None:
+            return None
+        return self.encoder.frame(content, finish_reason, tool_calls)
+
+    def flush(self):
+        """Return a frame with the held content, or None if nothing is held"""
+        if not self._held:
+            return None
+        return self.encoder.frame(self._take(), None, None)
+
+    def _take(self):
+        content = "".join(self._held)
+        self._held = []
+        self._held_bytes = 0
+        self.deadline = None
+        return content
+
+
+def error_frame(message):
+    """Return an error SSE frame followed by the [DONE] frame"""
+    error = {
+        "error": {
+            "message": f"Error: {message}",
+            "type": "server_error",
+            "param": None,
+            "code": "server_error"
+        }
+    }
+    return b"data: " + orjson.dumps(error) + b"\n\n" + DONE_FRAME
@@ -1,50 +1,80 @@
 import os
+import hashlib
+import threading
 import certifi
 import httpx
-from app.config import CUSTOM_CERT_PATH, PROXYMAN_CERT_PATH, COMBINED_CERT_PATH, logger
+from app.config import CUSTOM_CERT_PATH, PROXYMAN_CERT_PATH, CERT_BUNDLE_DIR, logger
+
+# The bundle path and SSL context are built once per process and shared by every client
+_bundle_path = None
+_ssl_context = None
+_bundle_lock = threading.Lock()
 
 def create_combined_cert_bundle():
     """
     Create a custom certificate bundle by combining system certs with custom certs.
     This approach is more secure than disabling SSL verification entirely.
+
+    The bundle is named after a hash of its contents, so workers building it
+    concurrently write identical files, and it is written only when missing.
+    Later calls return the cached path without touching the filesystem.
     """
-    try:
-        # Get the system certificate bundle
-        custom_ca_bundle = certifi.where()
-        with open(custom_ca_bundle, 'rb') as ca_bundle:
-            ca_bundle_content = ca_bundle.read()
+    global _bundle_path
+    if _bundle_path is not None:
+        return _bundle_path
 
-        # Read custom certificates
-        with open(CUSTOM_CERT_PATH, 'rb') as custom_cert:
-            custom_cert_content = custom_cert.read()
+    with _bundle_lock:
+        if _bundle_path is not None:
+            return _bundle_path
+        try:
+            # Get the system certificate bundle
+            with open(certifi.where(), 'rb') as ca_bundle:
+                ca_bundle_content = ca_bundle.read()
 
-        with open(PROXYMAN_CERT_PATH, 'rb') as proxyman_cert:
-            proxyman_cert_content = proxyman_cert.read()
+            # Read custom certificates
+            with open(CUSTOM_CERT_PATH, 'rb') as custom_cert:
+                custom_cert_content = custom_cert.read()
 
-        # Create a temporary combined cert file
-        with open(COMBINED_CERT_PATH, 'wb') as combined_cert:
-            combined_cert.write(ca_bundle_content)
-            combined_cert.write(b'\n')
-            combined_cert.write(custom_cert_content)
-            combined_cert.write(b'\n')
-            combined_cert.write(proxyman_cert_content)
+            with open(PROXYMAN_CERT_PATH, 'rb') as proxyman_cert:
+                proxyman_cert_content = proxyman_cert.read()
 
-        logger.info(f"Created combined certificate bundle at {COMBINED_CERT_PATH}")
-        return COMBINED_CERT_PATH
+            content = b'\n'.join([ca_bundle_content, custom_cert_content, proxyman_cert_content])
+            digest = hashlib.sha256(content).hexdigest()[:16]
+            bundle_path = os.path.join(CERT_BUNDLE_DIR, f"combined_certs-{digest}.pem")
 
-    except Exception as e:
-        logger.error(f"Error creating combined certificate bundle: {str(e)}", exc_info=True)
-        raise
+            if not os.path.exists(bundle_path):
+                # Write to a private temp file and rename, so no reader sees a partial bundle
+                tmp_path = f"{bundle_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as combined_cert:
+                    combined_cert.write(content)
+                os.replace(tmp_path, bundle_path)
+                logger.info(f"Created combined certificate bundle at {bundle_path}")
+
+            _bundle_path = bundle_path
+            return _bundle_path
+
+        except Exception as e:
+            logger.error(f"Error creating combined certificate bundle: {str(e)}", exc_info=True)
+            raise
+
+def get_ssl_context():
+    """Return the process-wide SSL context verifying against the combined bundle"""
+    global _ssl_context
+    if _ssl_context is not None:
+        return _ssl_context
+
+    cert_path = create_combined_cert_bundle()
+    with _bundle_lock:
+        if _ssl_context is None:
+            _ssl_context = httpx.create_ssl_context(verify=cert_path)
+            logger.info("Created shared SSL context from the combined certificate bundle")
+        return _ssl_context
 
 def create_http_client():
     """Create an HTTP client with proper SSL verification"""
     try:
-        # Create the combined certificate bundle
-        cert_path = create_combined_cert_bundle()
-
         # Create and return the HTTP client
-        ssl_context = httpx.create_ssl_context(verify=cert_path)
-        http_client = httpx.Client(verify=cert_path)
+        http_client = httpx.Client(verify=get_ssl_context())
 
         logger.info("Created HTTP client with custom SSL verification")
         return http_client
@@ -53,11 +83,26 @@ def create_http_client():
         logger.error(f"Error creating HTTP client: {str(e)}", exc_info=True)
         raise
 
+def create_async_http_client():
+    """Create an async HTTP client with proper SSL verification"""
+    try:
+        # Create and return the async HTTP client
+        http_client = httpx.AsyncClient(verify=get_ssl_context())
+
+        logger.info("Created async HTTP client with custom SSL verification")
+        return http_client
+
+    except Exception as e:
+        logger.error(f"Error creating async HTTP client: {str(e)}", exc_info=True)
+        raise
+
 def cleanup_cert_bundle():
-    """Clean up the temporary combined certificate file"""
-    if os.path.exists(COMBINED_CERT_PATH):
+    """Clean up the combined certificate file"""
+    global _bundle_path
+    if _bundle_path and os.path.exists(_bundle_path):
         try:
-            os.remove(COMBINED_CERT_PATH)
-            logger.info(f"Removed temporary certificate file: {COMBINED_CERT_PATH}")
+            os.remove(_bundle_path)
+            logger.info(f"Removed certificate file: {_bundle_path}")
         except Exception as e:
-            logger.error(f"Failed to remove temporary certificate file: {str(e)}")
\ No newline at end of file
+            logger.error(f"Failed to remove certificate file: {str(e)}")
+    _bundle_path = None
@@ -0,0 +1,94 @@
+import json
+
+from app.config import (
+    STREAM_UPDATE_INTERVAL,
+    STREAM_COALESCE_WINDOW,
+    STREAM_COALESCE_MAX_BYTES,
+    STREAM_UPDATE_INTERVAL_MAX,
+    STREAM_COALESCE_WINDOW_MAX,
+    STREAM_COALESCE_MAX_BYTES_MAX,
+    STREAM_KEY_SETTINGS,
+    STREAM_IDLE_TIMEOUT_MIN
+)
+
+# Setting name -> type; the same names are accepted in a request's `stream_options`
+SETTING_TYPES = {
+    "update_interval": float,
+    "coalesce_window": float,
+    "coalesce_max_bytes": int,
+}
+# Setting name -> largest value a key or request may ask for
+SETTING_MAXIMUMS = {
+    "update_interval": STREAM_UPDATE_INTERVAL_MAX,
+    "coalesce_window": STREAM_COALESCE_WINDOW_MAX,
+    "coalesce_max_bytes": STREAM_COALESCE_MAX_BYTES_MAX,
+}
+
+
+class StreamSettings:
+    """
+    How a chat stream is paced: GigaChat's `update_interval` (seconds of
+    generation per upstream chunk) and the proxy-side window merging content
+    deltas into fewer SSE frames (`coalesce_window` seconds, `coalesce_max_bytes`;
+    0 disables a limit).
+    """
+    __slots__ = tuple(SETTING_TYPES)
+
+    def __init__(self, update_interval=STREAM_UPDATE_INTERVAL, coalesce_window=STREAM_COALESCE_WINDOW,
+                 coalesce_max_bytes=STREAM_COALESCE_MAX_BYTES):
+        self.update_interval = update_interval
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_bytes = coalesce_max_bytes
+
+    def updated(self, overrides, source):
+        """Return a copy with `overrides` applied; raises ValueError naming `source` on a bad value"""
+        if not isinstance(overrides, dict):
+            raise ValueError(f"{source} must be an object")
+        values = {name: getattr(self, name) for name in SETTING_TYPES}
+        for name, coerce in SETTING_TYPES.items():
+            if name not in overrides:
+                continue
+            try:
+                value = coerce(overrides[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"{source}.{name} must be a number")
+            maximum = SETTING_MAXIMUMS[name]
+            if not 0 <= value <= maximum:
+                raise ValueError(f"{source}.{name} must be between 0 and {maximum:g}")
+            if name == "update_interval" and value >= STREAM_IDLE_TIMEOUT_MIN:
+                # Otherwise the stream would be ended as idle between two chunks
+                raise ValueError(f"{source}.{name} must be below {STREAM_IDLE_TIMEOUT_MIN:g}")
+            values[name] = value
+        return StreamSettings(**values)
+
+    def key(self):
+        """Hashable form, telling streams paced differently apart"""
+        return tuple(getattr(self, name) for name in SETTING_TYPES)
+
+
+def parse_key_settings(raw):
+    """Parse STREAM_KEY_SETTINGS into {api key: StreamSettings}"""
+    if not raw:
+        return {}
+    mapping = json.loads(raw)
+    if not isinstance(mapping, dict):
+        raise ValueError("STREAM_KEY_SETTINGS must be a JSON object")
+    return {key: StreamSettings().updated(overrides, f"STREAM_KEY_SETTINGS[{key[:4]}...]")
+            for key, overrides in mapping.items()}
+
+
+_defaults = StreamSettings()
+_key_settings = parse_key_settings(STREAM_KEY_SETTINGS)
+
+
+def resolve_stream_settings(request_data, api_key=None):
+    """
+    Settings of one stream: the server defaults, overridden by those of the
+    client's API key, overridden by the request's `stream_options`.
+    Raises ValueError for invalid request options.
+    """
+    settings = _key_settings.get(api_key, _defaults) if api_key is not None else _defaults
+    options = request_data.get("stream_options")
+    if options is None:
+        return settings
+    return settings.updated(options, "stream_options")
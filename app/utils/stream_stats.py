@@ -0,0 +1,57 @@
+import math
+
+from app.utils.metrics import streams_cancelled, stream_tokens_saved
+
+# GigaChat streams carry no usage, so completion tokens are estimated from text length
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(transcript):
+    """Rough completion token count of a (possibly partial) stream transcript"""
+    return math.ceil(sum(len(part) for part in transcript.content) / CHARS_PER_TOKEN)
+
+
+class StreamStats:
+    """
+    Counts streams cut short because the client went away, and estimates the
+    completion tokens that stopping upstream generation saved: the expected
+    length of the reply (the request's max_tokens, or else the mean length of
+    the streams that completed in this worker) minus what had been generated.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.completed_tokens = 0
+        self.cancelled = 0
+        self.tokens_saved = 0
+
+    def record_completed(self, transcript):
+        self.completed += 1
+        self.completed_tokens += estimate_tokens(transcript)
+
+    def record_cancelled(self, transcript, max_tokens=None):
+        """Count a stream cancelled before upstream finished; returns the tokens saved"""
+        if max_tokens:
+            expected = max_tokens
+        elif self.completed:
+            expected = self.completed_tokens / self.completed
+        else:
+            expected = 0
+        saved = max(0, round(expected - estimate_tokens(transcript)))
+        self.cancelled += 1
+        self.tokens_saved += saved
+        streams_cancelled.inc()
+        stream_tokens_saved.inc(saved)
+        return saved
+
+    def stats(self):
+        """Return stream counters"""
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "tokens_saved_estimate": self.tokens_saved,
+        }
+
+
+# Create a singleton instance of the stream statistics
+stream_stats = StreamStats()
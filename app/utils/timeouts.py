@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import json
+import math
+import time
+from collections import deque
+
+from flask import request
+
+from app.config import (
+    REQUEST_TIMEOUT,
+    REQUEST_TIMEOUT_BY_KEY,
+    STREAM_IDLE_TIMEOUT_MULTIPLIER,
+    STREAM_IDLE_TIMEOUT_MIN,
+    STREAM_IDLE_TIMEOUT_MAX
+)
+from app.utils.helpers import get_api_key
+from app.utils.mapping import error_response
+
+# The deadline of the request being served, like the Server-Timing breakdown
+_current_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before upstream answered"""
+
+    def __init__(self, deadline):
+        super().__init__(f"Request deadline of {deadline.seconds:g}s exceeded")
+        self.deadline = deadline
+
+
+class Deadline:
+    """Point in time (perf_counter) by which a request must be answered"""
+    __slots__ = ("seconds", "expires")
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.perf_counter() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.perf_counter())
+
+    def expired(self):
+        return time.perf_counter() >= self.expires
+
+
+def current_deadline():
+    """Return the deadline of the current request, or None if it has none"""
+    return _current_deadline.get()
+
+
+async def within_deadline(awaitable, deadline):
+    """Await `awaitable`, cancelling it and raising DeadlineExceeded once `deadline` passes"""
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(deadline)
+
+
+def parse_timeouts_by_key(raw):
+    """Parse REQUEST_TIMEOUT_BY_KEY into {api key: seconds}"""
+    if not raw:
+        return {}
+    mapping = json.loads(raw)
+    if not isinstance(mapping, dict):
+        raise ValueError("REQUEST_TIMEOUT_BY_KEY must be a JSON object")
+    return {key: float(seconds) for key, seconds in mapping.items()}
+
+
+_timeouts_by_key = parse_timeouts_by_key(REQUEST_TIMEOUT_BY_KEY)
+
+
+def request_timeout(headers):
+    """
+    Seconds the current request may take, or None: the shortest of the
+    server default, the API key's policy and the client's X-Request-Timeout.
+    Raises ValueError for an invalid header.
+    """
+    limits = []
+    policy = _timeouts_by_key.get(get_api_key(headers), REQUEST_TIMEOUT)
+    if policy > 0:
+        limits.append(policy)
+    header = headers.get('X-Request-Timeout')
+    if header is not None:
+        try:
+            seconds = float(header)
+        except ValueError:
+            raise ValueError("X-Request-Timeout must be a number of seconds")
+        if not seconds > 0 or math.isinf(seconds):
+            raise ValueError("X-Request-Timeout must be a positive number of seconds")
+        limits.append(seconds)
+    return min(limits) if limits else None
+
+
+def register_request_deadlines(app):
+    """Give every API request the deadline of its policy and X-Request-Timeout header"""
+
+    @app.before_request
+    def start_request_deadline():
+        _current_deadline.set(None)
+        if not request.path.startswith('/v1/'):
+            return None
+        try:
+            seconds = request_timeout(request.headers)
+        except ValueError as e:
+            return error_response(
+                message=str(e),
+                error_type="invalid_request_error",
+                code="invalid_request_error",
+                status=400
+            )
+        if seconds is not None:
+            _current_deadline.set(Deadline(seconds))
+        return None
+
+
+class IdleTimeouts:
+    """
+    How long a stream may wait for upstream, adapted to recent latency.
+
+    The wait for the first chunk is cut off at `multiplier` times the p99 of
+    the last `window` observed times to first chunk, and the wait for any
+    later chunk at `multiplier` times the p99 gap between chunks, each kept
+    between `minimum` and `maximum` seconds. Until `min_samples` are observed
+    the maximum applies. Percentiles are recomputed every `refresh`
+    observations rather than on every wait.
+
+    Only streams at the server's default pacing are sampled, so a stream
+    asking GigaChat for rare chunks doesn't stretch everyone's timeout; such
+    a stream waits at least its `update_interval` plus `minimum` instead.
+    """
+
+    def __init__(self, minimum, maximum, multiplier, window=512, min_samples=20, refresh=32):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self._samples = {"first": deque(maxlen=window), "gap": deque(maxlen=window)}
+        self._pending = {"first": 0, "gap": 0}
+        self._timeouts = {"first": maximum, "gap": maximum}
+
+    def observe(self, kind, seconds):
+        """Record a time to first chunk ("first") or a gap between chunks ("gap")"""
+        samples = self._samples[kind]
+        samples.append(seconds)
+        self._pending[kind] += 1
+        if self._pending[kind] >= self.refresh and len(samples) >= self.min_samples:
+            self._pending[kind] = 0
+            ordered = sorted(samples)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            self._timeouts[kind] = min(self.maximum, max(self.minimum, p99 * self.multiplier))
+
+    def timeout(self, kind, update_interval=0.0):
+        """Seconds to wait for the next chunk of `kind` of a stream paced at `update_interval`"""
+        return max(self._timeouts[kind], update_interval + self.minimum)
+
+    def stats(self):
+        """Return the current timeouts"""
+        return {
+            "first_chunk": self._timeouts["first"],
+            "between_chunks": self._timeouts["gap"],
+            "samples": {kind: len(samples) for kind, samples in self._samples.items()},
+        }
+
+
+# Create a singleton instance of the stream idle timeouts
+idle_timeouts = IdleTimeouts(STREAM_IDLE_TIMEOUT_MIN, STREAM_IDLE_TIMEOUT_MAX, STREAM_IDLE_TIMEOUT_MULTIPLIER)
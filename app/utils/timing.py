@@ -0,0 +1,92 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from flask import request
+
+from app.config import SERVER_TIMING, SLOW_REQUEST_THRESHOLD, logger
+
+# The timing of the request being served. Coroutines handed to the background
+# loop and stream pumps copy the request's context, so stages measured deep in
+# the client layer land on the right request.
+_current_timing = contextvars.ContextVar("server_timing", default=None)
+
+
+class ServerTiming:
+    """Per-request stage durations, rendered as a Server-Timing header value"""
+    __slots__ = ("started", "stages")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        """Add `seconds` to `stage` (stages measured more than once accumulate)"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def header_value(self):
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current_timing():
+    """Return the timing of the current request, or None outside of one"""
+    return _current_timing.get()
+
+
+@contextmanager
+def timed(stage):
+    """Measure the enclosed block as `stage` of the current request"""
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(stage, time.perf_counter() - started)
+
+
+def finish_stream_timing(timing, path):
+    """
+    Close the timing of a stream: log it if slow, and return the SSE comment
+    carrying its breakdown (sent before the [DONE] frame), or None.
+    """
+    log_if_slow(timing, path)
+    if not SERVER_TIMING:
+        return None
+    return f": server-timing {timing.header_value()}\n\n".encode("utf-8")
+
+
+def log_if_slow(timing, path):
+    """Log the breakdown of a request that took longer than SLOW_REQUEST_THRESHOLD"""
+    if SLOW_REQUEST_THRESHOLD > 0 and timing.total() >= SLOW_REQUEST_THRESHOLD:
+        logger.warning("Slow request %s: %s", path, timing.header_value())
+
+
+def register_server_timing(app):
+    """
+    Time every request. Buffered responses get a Server-Timing header;
+    streams report their breakdown in a trailing SSE comment instead.
+    """
+    if not SERVER_TIMING and SLOW_REQUEST_THRESHOLD <= 0:
+        return
+
+    @app.before_request
+    def start_server_timing():
+        _current_timing.set(ServerTiming())
+
+    @app.after_request
+    def add_server_timing(response):
+        timing = _current_timing.get()
+        if timing is None or response.is_streamed:
+            return response
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = timing.header_value()
+        log_if_slow(timing, request.path)
+        return response
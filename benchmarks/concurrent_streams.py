@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Concurrent-stream capacity benchmark: sync gunicorn workers vs ASGI workers.
+
+Starts the proxy under gunicorn in each serving mode with GigaChat replaced by
+an in-process fake that streams chunks at a fixed pace, then opens N
+concurrent /v1/chat/completions streams and reports how many of them the
+server actually served concurrently.
+
+Runs fully offline:
+
+    python benchmarks/concurrent_streams.py --streams 200 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("MASTER_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+CHUNKS = int(os.getenv("BENCH_CHUNKS", "20"))
+CHUNK_DELAY = float(os.getenv("BENCH_CHUNK_DELAY", "0.05"))
+
+
+class FakeGigaChat:
+    """Stands in for gigachat.GigaChat, streaming CHUNKS chunks CHUNK_DELAY apart"""
+
+    async def astream(self, chat):
+        from gigachat.models import ChatCompletionChunk
+        for i in range(CHUNKS):
+            await asyncio.sleep(CHUNK_DELAY)
+            yield ChatCompletionChunk.parse_obj({
+                "choices": [{
+                    "delta": {"content": f"token{i} "},
+                    "index": 0,
+                    "finish_reason": "stop" if i == CHUNKS - 1 else None,
+                }],
+                "created": int(time.time()),
+                "model": "GigaChat",
+                "object": "chat.completion",
+            })
+
+    async def aclose(self):
+        pass
+
+
+def _build_apps():
+    from app import create_app
+    from app.asgi import create_asgi_app
+    from app.auth.token_manager import token_manager
+    from app.utils.openai_client import client_pool
+
+    token_manager.access_token = "benchmark"
+    token_manager.expires_at = float("inf")
+    client_pool.factory = lambda token, base_url: FakeGigaChat()
+    flask_app = create_app()
+    return flask_app, create_asgi_app(flask_app)
+
+
+# Gunicorn entry points
+wsgi_app, asgi_app = _build_apps()
+
+
+async def _one_stream(client, url, state, results):
+    payload = {"stream": True, "messages": [{"role": "user", "content": "hi"}]}
+    started = time.perf_counter()
+    first_byte = None
+    async with client.stream("POST", url, json=payload) as response:
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+                state["open"] += 1
+                state["peak"] = max(state["peak"], state["open"])
+    state["open"] -= 1
+    results.append((first_byte, time.perf_counter() - started))
+
+
+async def _run_load(port, streams):
+    import httpx
+
+    url = f"http://127.0.0.1:{port}/v1/chat/completions"
+    state = {"open": 0, "peak": 0}
+    results = []
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=0)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(_one_stream(client, url, state, results) for _ in range(streams)))
+        wall = time.perf_counter() - started
+    return wall, state["peak"], results
+
+
+def _wait_for_server(port, timeout=30.0):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_mode(mode, port, workers, streams):
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers),
+        "--pythonpath", project_root,
+        "--log-level", "warning",
+        "--timeout", "600",
+    ]
+    if mode == "asgi":
+        cmd += ["--worker-class", "uvicorn.workers.UvicornWorker", "benchmarks.concurrent_streams:asgi_app"]
+    else:
+        cmd += ["benchmarks.concurrent_streams:wsgi_app"]
+
+    server = subprocess.Popen(cmd, cwd=project_root)
+    try:
+        _wait_for_server(port)
+        wall, peak, results = asyncio.run(_run_load(port, streams))
+    finally:
+        server.terminate()
+        server.wait()
+
+    ttfb = [r[0] for r in results]
+    ideal = CHUNKS * CHUNK_DELAY
+    print(f"[{mode}] workers={workers} streams={streams} (ideal stream duration {ideal:.2f}s)")
+    print(f"  wall time:           {wall:.2f}s")
+    print(f"  peak open streams:   {peak}")
+    print(f"  streams/s:           {streams / wall:.1f}")
+    print(f"  TTFB p50 / p99:      {statistics.median(ttfb):.3f}s / {_percentile(ttfb, 99):.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["sync", "asgi", "both"], default="both")
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=3101)
+    args = parser.parse_args()
+
+    modes = ["sync", "asgi"] if args.mode == "both" else [args.mode]
+    for i, mode in enumerate(modes):
+        run_mode(mode, args.port + i, args.workers, args.streams)
+
+
+if __name__ == "__main__":
+    main()
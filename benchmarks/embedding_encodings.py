@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Embedding response encoding benchmark.
+
+Builds an embeddings response for a batch of random vectors in each
+encoding_format and reports the serialized payload size and the time spent
+encoding and serializing it with Flask's JSON provider, as /v1/embeddings
+does.
+
+    python benchmarks/embedding_encodings.py --batch 256 --dim 1024
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("MASTER_TOKEN", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+
+def build_body(app, vectors, encoding_format):
+    from app.utils.embedding_format import encode_embedding
+    data = []
+    for i, vector in enumerate(vectors):
+        embedding, extra = encode_embedding(vector, encoding_format)
+        data.append({"object": "embedding", "embedding": embedding, "index": i, **extra})
+    return app.json.dumps({"object": "list", "data": data, "model": "Embeddings"}).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=256, help="vectors per response")
+    parser.add_argument("--dim", type=int, default=1024, help="vector dimension")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per format (best is reported)")
+    args = parser.parse_args()
+
+    import numpy as np
+    from app import create_app
+    from app.utils.embedding_format import ENCODING_FORMATS
+
+    app = create_app()
+    rng = np.random.default_rng(0)
+    vectors = [rng.standard_normal(args.dim).astype(np.float32) for _ in range(args.batch)]
+
+    print(f"{args.batch} vectors x {args.dim} dims")
+    print(f"{'format':<16}{'bytes':>12}{'ms':>10}{'size':>8}{'speed':>8}")
+    baseline = None
+    for encoding_format in ENCODING_FORMATS:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            body = build_body(app, vectors, encoding_format)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        if baseline is None:
+            baseline = (len(body), best)
+        print(f"{encoding_format:<16}{len(body):>12}{best * 1000:>10.1f}"
+              f"{baseline[0] / len(body):>7.1f}x{baseline[1] / best:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Load test of the proxy against a local GigaChat stand-in.
+
+Starts benchmarks/mock_gigachat.py and the real application (run.py's
+create_app() under gunicorn) pointed at it, then drives each endpoint at
+several concurrency levels. The same load is also sent straight to the mock,
+so the report shows what the proxy itself adds:
+
+    endpoint     conc target   req/s    p50 ms   p99 ms  ttft p50  errors
+
+Runs fully offline:
+
+    python benchmarks/load_test.py --concurrency 1 8 32 --requests 200
+    python benchmarks/load_test.py --endpoints chat_stream --token-rate 100 --mode sync --workers 4
+
+Mock options (--latency, --token-rate, --error-429, --stall, ...) are those of
+mock_gigachat.py. Caches and request coalescing are disabled in the proxy, so
+every request reaches the mock.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.mock_gigachat import add_arguments  # noqa: E402
+
+ENDPOINTS = ("models", "chat", "chat_stream", "tools", "embeddings")
+TOOL = {
+    "type": "function",
+    "function": {
+        "name": "search",
+        "description": "Search the knowledge base",
+        "parameters": {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]}
+    }
+}
+# A stream frame carrying generated text (the proxy's role-only first frame doesn't count)
+CONTENT_FRAME = re.compile(rb'"content": ?"[^"]')
+# Streams that fail after the 200 status carry an OpenAI-style error object
+ERROR_FRAME = re.compile(rb'"error": ?\{')
+_request_ids = itertools.count()
+
+
+def build_request(endpoint, target, token):
+    """(method, path, json body, headers) of one request; prompts are unique so nothing is cached"""
+    n = next(_request_ids)
+    messages = [{"role": "user", "content": f"Request {n}: tell me something about load testing"}]
+    headers = {"Authorization": f"Bearer {token}"} if target == "direct" else {}
+    if endpoint == "models":
+        return "GET", "/v1/models" if target == "proxy" else "/api/v1/models", None, headers
+    if endpoint == "embeddings":
+        texts = [f"Request {n} text {i}" for i in range(8)]
+        return "POST", "/v1/embeddings" if target == "proxy" else "/api/v1/embeddings", \
+            {"model": "Embeddings", "input": texts}, headers
+
+    path = "/v1/chat/completions" if target == "proxy" else "/api/v1/chat/completions"
+    body = {"model": "GigaChat", "messages": messages}
+    if endpoint == "chat_stream":
+        body["stream"] = True
+    if endpoint == "tools":
+        if target == "proxy":
+            body["tools"] = [TOOL]
+        else:
+            body["functions"] = [TOOL["function"]]
+    return "POST", path, body, headers
+
+
+async def one_request(client, endpoint, target, token, results):
+    method, path, body, headers = build_request(endpoint, target, token)
+    stream = endpoint == "chat_stream"
+    started = time.perf_counter()
+    ttft = None
+    try:
+        async with client.stream(method, path, json=body, headers=headers) as response:
+            ok = response.status_code < 400
+            async for data in response.aiter_bytes():
+                if stream and ttft is None and CONTENT_FRAME.search(data):
+                    ttft = time.perf_counter() - started
+                if stream and ERROR_FRAME.search(data):
+                    ok = False
+    except Exception:
+        ok = False
+    results.append((time.perf_counter() - started, ttft, ok))
+
+
+async def run_level(base_url, endpoint, target, token, concurrency, total):
+    import httpx
+
+    results = []
+    pending = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        async def worker():
+            for _ in pending:
+                await one_request(client, endpoint, target, token, results)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return wall, results
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summarize(wall, results):
+    latencies = [r[0] for r in results if r[2]]
+    ttfts = [r[1] for r in results if r[2] and r[1] is not None]
+    return {
+        "rps": len(results) / wall,
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p99": percentile(latencies, 99) if latencies else float("nan"),
+        "ttft": statistics.median(ttfts) if ttfts else None,
+        "errors": sum(1 for r in results if not r[2])
+    }
+
+
+def print_row(endpoint, concurrency, target, stats):
+    ttft = f"{stats['ttft'] * 1000:9.1f}" if stats["ttft"] is not None else f"{'-':>9}"
+    print(f"{endpoint:<12}{concurrency:>5} {target:<8}{stats['rps']:>8.1f}{stats['p50'] * 1000:>9.1f}"
+          f"{stats['p99'] * 1000:>9.1f}{ttft}{stats['errors']:>8}")
+
+
+def wait_for(url, timeout=30.0):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def mock_command(args):
+    cmd = [sys.executable, os.path.join(project_root, "benchmarks", "mock_gigachat.py"), "--port", str(args.mock_port)]
+    for option in ("latency", "token_rate", "reply_tokens", "embedding_dim", "error_429", "error_5xx",
+                   "stall", "stall_seconds", "seed"):
+        value = getattr(args, option)
+        if value is not None:
+            cmd += [f"--{option.replace('_', '-')}", str(value)]
+    return cmd
+
+
+def proxy_command(args):
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "--bind", f"127.0.0.1:{args.port}",
+        "--workers", str(args.workers),
+        "--log-level", "warning",
+        "--timeout", "600",
+    ]
+    if args.mode == "asgi":
+        return cmd + ["--worker-class", "uvicorn.workers.UvicornWorker", "run:asgi_app"]
+    return cmd + ["--threads", str(max(args.concurrency)), "run:app"]
+
+
+def proxy_env(args):
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    return dict(
+        os.environ,
+        MASTER_TOKEN=os.environ.get("MASTER_TOKEN", "benchmark"),
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "ERROR"),
+        GIGACHAT_BASE_URL=mock_url,
+        GIGACHAT_OAUTH_URL=f"{mock_url}/api/v2/oauth",
+        TOKEN_STORE_PATH="",
+        EMBEDDING_CACHE_MAX_BYTES="0",
+        CHAT_CACHE_TTL="0",
+        CHAT_COALESCE="false",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint, level and target")
+    parser.add_argument("--mode", choices=["asgi", "sync"], default="asgi", help="gunicorn worker type")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=3191)
+    parser.add_argument("--mock-port", type=int, default=3190)
+    parser.add_argument("--no-direct", action="store_true", help="skip the baseline sent straight to the mock")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    import httpx
+
+    mock = subprocess.Popen(mock_command(args), cwd=project_root)
+    proxy = None
+    try:
+        mock_url = f"http://127.0.0.1:{args.mock_port}"
+        wait_for(f"{mock_url}/stats")
+        proxy = subprocess.Popen(proxy_command(args), cwd=project_root, env=proxy_env(args))
+        proxy_url = f"http://127.0.0.1:{args.port}"
+        wait_for(f"{proxy_url}/health")
+        token = httpx.post(f"{mock_url}/api/v2/oauth").json()["access_token"]
+
+        targets = [("proxy", proxy_url)] + ([] if args.no_direct else [("direct", mock_url)])
+        print(f"mode={args.mode} workers={args.workers} requests={args.requests} "
+              f"latency={args.latency}s token_rate={args.token_rate}/s")
+        print(f"{'endpoint':<12}{'conc':>5} {'target':<8}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'ttft p50':>9}{'errors':>8}")
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                stats = {}
+                for target, base_url in targets:
+                    wall, results = asyncio.run(
+                        run_level(base_url, endpoint, target, token, concurrency, args.requests))
+                    stats[target] = summarize(wall, results)
+                    print_row(endpoint, concurrency, target, stats[target])
+                if "direct" in stats:
+                    overhead = {key: stats["proxy"][key] - stats["direct"][key] for key in ("p50", "p99")}
+                    print(f"{'':<12}{'':>5} {'overhead':<8}{'':>8}{overhead['p50'] * 1000:>9.1f}"
+                          f"{overhead['p99'] * 1000:>9.1f}")
+    finally:
+        for process in (proxy, mock):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks of the app/utils/mapping.py conversions that run on every
+request or stream chunk, with regression checking against a stored baseline.
+
+Fixtures are realistic: a 40-turn history with tool calls and tool results
+(the assistant turn is the recorded OpenAI completion in valid.txt), a set of
+20 tools with nested JSON schemas, the recorded GigaChat function-call
+completion in given.txt, and content/function-call stream chunks.
+
+For each case the suite reports the time per call (best of --repeat runs,
+with LOG_LEVEL=INFO as in production; log records are formatted
+synchronously and written to /dev/null, so their cost is counted) and the memory allocated per call
+(peak bytes traced by tracemalloc during one call; CPython has no per-call
+allocation counter). A run fails (exit status 1) if any case is slower or
+allocates more than its baseline by more than --threshold; a case that looks
+slower is measured once more and only fails if it is still slower, so a burst
+of noise on a shared machine does not fail the run:
+
+    python benchmarks/mapping_bench.py                    # compare with mapping_baseline.json
+    python benchmarks/mapping_bench.py --save-baseline    # record a new baseline
+
+Timings depend on the CPU and Python version, so record the baseline where
+the check runs.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+BASELINE_PATH = os.path.join(project_root, "benchmarks", "mapping_baseline.json")
+
+
+def load_fixture(name):
+    with open(os.path.join(project_root, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def long_history(turns=40):
+    """Multi-turn chat with a system prompt, tool calls and tool results"""
+    recorded = load_fixture("valid.txt")["choices"][0]["message"]
+    # convert_to_gigachat_messages currently rejects a null content next to tool_calls
+    # and a `name` on tool results, so the fixture sticks to what it accepts
+    tool_call_turn = {"role": "assistant", "content": "", "tool_calls": recorded["tool_calls"]}
+    messages = [{"role": "system", "content": "You are a careful assistant. Answer in the user's language. " * 4}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Вопрос {i}: что выведет этот код? console.log({i} * 2)"})
+        if i % 4 == 3:
+            messages.append(tool_call_turn)
+            messages.append({"role": "tool", "content": str(i * 2)})
+        messages.append({"role": "assistant", "content": f"Код выведет {i * 2}. " * 8})
+    return messages
+
+
+def large_tools(count=20):
+    """Tools with nested object/array parameter schemas"""
+    tools = []
+    for i in range(count):
+        tools.append({
+            "type": "function",
+            "function": {
+                "name": f"tool_{i}",
+                "description": f"Tool number {i}: looks things up in system {i} and returns structured results.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {"type": "string", "description": "Free-text query"},
+                        "limit": {"type": "integer", "minimum": 1, "maximum": 100},
+                        "filters": {
+                            "type": "object",
+                            "properties": {
+                                "tags": {"type": "array", "items": {"type": "string"}},
+                                "created_after": {"type": "string", "format": "date-time"},
+                                "owner": {"type": "object", "properties": {"id": {"type": "string"},
+                                                                           "team": {"type": "string"}}},
+                            },
+                        },
+                        "sort": {"type": "string", "enum": ["relevance", "date", "popularity"]},
+                    },
+                    "required": ["query"],
+                },
+            },
+        })
+    return tools
+
+
+def build_cases():
+    """name -> zero-argument callable"""
+    from gigachat.models import ChatCompletion, ChatCompletionChunk
+    from app.utils import mapping
+
+    history = long_history()
+    tools = large_tools()
+    request = {"messages": history, "tools": tools, "temperature": 0.2, "max_tokens": 512, "stream": True}
+    given = ChatCompletion.parse_obj(load_fixture("given.txt"))
+    text_completion = ChatCompletion.parse_obj(dict(load_fixture("given.txt"), choices=[{
+        "index": 0, "finish_reason": "stop",
+        "message": {"role": "assistant", "content": "Код выведет 42. " * 40},
+    }]))
+    content_chunk = ChatCompletionChunk.parse_obj({
+        "choices": [{"delta": {"content": "Привет! Чем могу"}, "index": 0}],
+        "created": 1742027895, "model": "GigaChat", "object": "chat.completion",
+    })
+    function_chunk = ChatCompletionChunk.parse_obj({
+        "choices": [{"delta": {"content": "", "role": "assistant",
+                               "function_call": given.choices[0].message.function_call.dict()},
+                     "index": 0, "finish_reason": "function_call"}],
+        "created": 1742027895, "model": "GigaChat", "object": "chat.completion",
+    })
+    tool_calls = mapping.convert_function_call_to_tool_calls(given.choices[0].message.function_call)
+
+    return {
+        "convert_to_gigachat_messages[40 turns]": lambda: mapping.convert_to_gigachat_messages(history),
+        "convert_to_gigachat_functions[20 tools]": lambda: mapping.convert_to_gigachat_functions(tools),
+        "build_chat_params[history+tools]": lambda: mapping.build_chat_params(request, streaming=True),
+        "parse_chunk_fields[content]": lambda: mapping.parse_chunk_fields(content_chunk),
+        "parse_chunk_fields[function_call]": lambda: mapping.parse_chunk_fields(function_chunk),
+        "build_stream_chunk[content]": lambda: mapping.build_stream_chunk(
+            "chatcmpl-1", 1742027895, "Привет! Чем могу", None, None),
+        "build_stream_chunk[tool_calls]": lambda: mapping.build_stream_chunk(
+            "chatcmpl-1", 1742027895, None, "tool_calls", tool_calls),
+        "build_non_stream_json[given.txt]": lambda: mapping.build_non_stream_json(given),
+        "build_non_stream_json[text]": lambda: mapping.build_non_stream_json(text_completion),
+    }
+
+
+def time_per_call(fn, repeat, min_time):
+    """
+    Best CPU time per call in ns over `repeat` runs of at least `min_time`
+    seconds (process time, so time the process was descheduled is not counted)
+    """
+    timer = timeit.Timer(fn, timer=time.process_time)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def bytes_per_call(fn, samples=5):
+    """Smallest peak of memory traced while one call runs (warm caches, so steady state)"""
+    fn()
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return min(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=9, help="timing runs per case (best is kept)")
+    parser.add_argument("--min-time", type=float, default=0.1, help="minimum seconds per timing run")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--log-level", default="INFO", help="LOG_LEVEL the app is configured with")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MASTER_TOKEN", "benchmark")
+    os.environ["LOG_LEVEL"] = args.log_level
+    os.environ.setdefault("LOG_USE_COLOR", "false")
+    os.environ["LOG_QUEUE_SIZE"] = "0"
+
+    from app.config import handler
+    handler.setStream(open(os.devnull, "w"))
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["cases"]
+
+    results = {}
+    regressions = []
+    print(f"{'case':<42}{'ns/call':>11}{'bytes/call':>12}{'vs baseline':>24}")
+    for name, fn in build_cases().items():
+        if args.filter not in name:
+            continue
+        ns = time_per_call(fn, args.repeat, args.min_time)
+        allocated = bytes_per_call(fn)
+        base = baseline.get(name)
+        if base and ns > base["ns"] * (1 + args.threshold):
+            ns = min(ns, time_per_call(fn, args.repeat, args.min_time))
+        results[name] = {"ns": round(ns), "bytes": allocated}
+
+        comparison = ""
+        if base:
+            ns_change = ns / base["ns"] - 1
+            bytes_change = allocated / base["bytes"] - 1 if base["bytes"] else 0.0
+            comparison = f"{ns_change:+7.1%} time {bytes_change:+7.1%} mem"
+            if ns_change > args.threshold or bytes_change > args.threshold:
+                regressions.append(name)
+                comparison += "  REGRESSION"
+        print(f"{name:<42}{ns:>11.0f}{allocated:>12}{comparison:>24}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "recorded": time.strftime("%Y-%m-%d"),
+                       "cases": results}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
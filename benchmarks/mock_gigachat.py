@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the GigaChat API, for load tests and offline development.
+
+Implements the endpoints the proxy uses, in the wire format of the gigachat
+client:
+
+    POST /api/v2/oauth              access token (any credentials are accepted)
+    GET  /api/v1/models             model list
+    POST /api/v1/chat/completions   stream and non-stream; requests carrying
+                                    `functions` are answered with a function_call
+    POST /api/v1/embeddings         deterministic vectors derived from each text
+
+Latency, generation speed and faults are configurable:
+
+    python benchmarks/mock_gigachat.py --port 3190 --latency 0.05 --token-rate 200 \\
+        --error-429 0.01 --error-5xx 0.01 --stall 0.005 --stall-seconds 20
+
+Point the proxy at it with:
+
+    GIGACHAT_BASE_URL=http://127.0.0.1:3190
+    GIGACHAT_OAUTH_URL=http://127.0.0.1:3190/api/v2/oauth
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import struct
+import time
+import uuid
+
+from aiohttp import web
+
+MODELS = ["GigaChat", "GigaChat-Pro", "GigaChat-Max", "Embeddings"]
+
+
+class MockGigaChat:
+    """
+    aiohttp application answering like GigaChat.
+
+    Every API call waits `latency` seconds before answering; replies are
+    `reply_tokens` tokens long and generated at `token_rate` tokens per second
+    (0 sends them at once). A call fails with 429 or 503 with probability
+    `error_429` / `error_5xx`, and stalls for `stall_seconds` before answering
+    with probability `stall`.
+    """
+
+    def __init__(self, latency=0.0, token_rate=0.0, reply_tokens=32, embedding_dim=1024,
+                 error_429=0.0, error_5xx=0.0, stall=0.0, stall_seconds=30.0, token_ttl=1800, seed=None):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.reply_tokens = reply_tokens
+        self.embedding_dim = embedding_dim
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.stall = stall
+        self.stall_seconds = stall_seconds
+        self.token_ttl = token_ttl
+        self.random = random.Random(seed)
+        self.counts = {}
+
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/api/v2/oauth", self.oauth)
+        app.router.add_get("/api/v1/models", self.models)
+        app.router.add_post("/api/v1/chat/completions", self.chat)
+        app.router.add_post("/api/v1/embeddings", self.embeddings)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+    async def _begin(self, name):
+        """Count the call, wait the configured latency and return an injected fault, if any"""
+        self.counts[name] = self.counts.get(name, 0) + 1
+        roll = self.random.random()
+        if roll < self.error_429:
+            return web.json_response({"status": 429, "message": "Too Many Requests"}, status=429,
+                                     headers={"Retry-After": "1"})
+        if roll < self.error_429 + self.error_5xx:
+            return web.json_response({"status": 503, "message": "Service Unavailable"}, status=503)
+        if roll < self.error_429 + self.error_5xx + self.stall:
+            await asyncio.sleep(self.stall_seconds)
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return None
+
+    async def oauth(self, request):
+        fault = await self._begin("oauth")
+        if fault is not None:
+            return fault
+        expires_at = int((time.time() + self.token_ttl) * 1000)
+        return web.json_response({"access_token": f"mock-{uuid.uuid4().hex}", "expires_at": expires_at})
+
+    async def models(self, request):
+        fault = await self._begin("models")
+        if fault is not None:
+            return fault
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": name, "object": "model", "owned_by": "salutedevices"} for name in MODELS]
+        })
+
+    def _reply(self, body):
+        """(content tokens, function_call or None, prompt_tokens) answering a chat request"""
+        prompt_tokens = sum(len(str(m.get("content") or "").split()) for m in body.get("messages", []))
+        functions = body.get("functions")
+        if functions:
+            function_call = {"name": functions[0].get("name", "function"), "arguments": {"query": "mock"}}
+            return [], function_call, prompt_tokens
+        return [f"token{i} " for i in range(self.reply_tokens)], None, prompt_tokens
+
+    async def chat(self, request):
+        fault = await self._begin("chat")
+        if fault is not None:
+            return fault
+        body = await request.json()
+        tokens, function_call, prompt_tokens = self._reply(body)
+        model = body.get("model", "GigaChat")
+        if body.get("stream"):
+            return await self._stream(request, model, tokens, function_call)
+
+        if self.token_rate > 0:
+            await asyncio.sleep(len(tokens) / self.token_rate)
+        message = {"role": "assistant", "content": "".join(tokens)}
+        if function_call is not None:
+            message["function_call"] = function_call
+        return web.json_response({
+            "choices": [{
+                "message": message,
+                "index": 0,
+                "finish_reason": "function_call" if function_call is not None else "stop"
+            }],
+            "created": int(time.time()),
+            "model": model,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens)
+            },
+            "object": "chat.completion"
+        })
+
+    async def _stream(self, request, model, tokens, function_call):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        created = int(time.time())
+
+        def frame(delta, finish_reason=None):
+            chunk = {
+                "choices": [{"delta": delta, "index": 0, "finish_reason": finish_reason}],
+                "created": created,
+                "model": model,
+                "object": "chat.completion"
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        if function_call is not None:
+            await response.write(frame({"role": "assistant", "content": "", "function_call": function_call},
+                                       "function_call"))
+        for i, token in enumerate(tokens):
+            if self.token_rate > 0:
+                await asyncio.sleep(1 / self.token_rate)
+            delta = {"content": token}
+            if i == 0:
+                delta["role"] = "assistant"
+            await response.write(frame(delta, "stop" if i == len(tokens) - 1 else None))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def _vector(self, text):
+        """Unit-ish vector seeded by the text, so equal texts embed equally"""
+        seed = struct.unpack("<Q", hashlib.sha256(text.encode("utf-8")).digest()[:8])[0]
+        rng = random.Random(seed)
+        return [rng.uniform(-1, 1) for _ in range(self.embedding_dim)]
+
+    async def embeddings(self, request):
+        fault = await self._begin("embeddings")
+        if fault is not None:
+            return fault
+        body = await request.json()
+        texts = body.get("input", [])
+        return web.json_response({
+            "object": "list",
+            "model": body.get("model", "Embeddings"),
+            "data": [{
+                "object": "embedding",
+                "embedding": self._vector(text),
+                "index": i,
+                "usage": {"prompt_tokens": len(text.split())}
+            } for i, text in enumerate(texts)]
+        })
+
+    async def stats(self, request):
+        return web.json_response(self.counts)
+
+
+def add_arguments(parser):
+    """Mock options, shared with benchmarks/load_test.py"""
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every upstream call waits before answering")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="generated tokens per second, 0 for instant replies")
+    parser.add_argument("--reply-tokens", type=int, default=32, help="tokens per chat reply")
+    parser.add_argument("--embedding-dim", type=int, default=1024, help="embedding vector dimension")
+    parser.add_argument("--error-429", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--stall", type=float, default=0.0, help="fraction of calls that stall before answering")
+    parser.add_argument("--stall-seconds", type=float, default=30.0, help="how long a stalled call hangs")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the fault injection")
+
+
+def from_arguments(args):
+    return MockGigaChat(latency=args.latency, token_rate=args.token_rate, reply_tokens=args.reply_tokens,
+                        embedding_dim=args.embedding_dim, error_429=args.error_429, error_5xx=args.error_5xx,
+                        stall=args.stall, stall_seconds=args.stall_seconds, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3190)
+    add_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(from_arguments(args).app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Per-chunk CPU cost of SSE frame encoding.
+
+Compares the previous path (mapping.build_stream_chunk followed by
+json.dumps into an f-string) with ChunkEncoder (pre-encoded prefix plus
+orjson), for a typical content delta. Runs with LOG_LEVEL=INFO by default,
+as in production; pass --log-level to compare other levels.
+
+    python benchmarks/sse_encoding.py --chunks 200000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+
+def measure(encode, chunks):
+    started = time.process_time()
+    for _ in range(chunks):
+        encode()
+    return (time.process_time() - started) / chunks * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000, help="frames encoded per variant")
+    parser.add_argument("--log-level", default="INFO", help="LOG_LEVEL the app is configured with")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MASTER_TOKEN", "benchmark")
+    os.environ["LOG_LEVEL"] = args.log_level
+    os.environ.setdefault("LOG_USE_COLOR", "false")
+
+    from app.utils.mapping import build_stream_chunk
+    from app.utils.sse import ChunkEncoder
+
+    completion_id, created_time = "chatcmpl-3f1c9a4e2b7d", 1700000000
+    content = "Привет! Чем могу помочь"
+    encoder = ChunkEncoder(completion_id, created_time)
+
+    def before():
+        chunk = build_stream_chunk(completion_id, created_time, content, None, None)
+        return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+    def after():
+        return encoder.frame(content, None, None)
+
+    old_ns = measure(before, args.chunks)
+    new_ns = measure(after, args.chunks)
+    print(f"LOG_LEVEL={args.log_level}, {args.chunks} chunks")
+    print(f"build_stream_chunk + json.dumps: {old_ns:8.0f} ns/chunk")
+    print(f"ChunkEncoder (orjson):           {new_ns:8.0f} ns/chunk ({old_ns / new_ns:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Gunicorn loads this file from the working directory automatically (./run.sh prod|asgi)
+import os
+import shutil
+import tempfile
+
+# Workers write their Prometheus samples to mmap-backed files in this directory,
+# so /metrics on any worker reports the whole container. It must be set before
+# the workers import the app, hence here rather than in app/config. Unless one
+# is configured, each server gets a fresh private directory, so servers sharing
+# a host never mix (or wipe) each other's samples.
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='gigachat_proxy_metrics_')
+    # Remembered in the environment, as a reload (SIGHUP) runs this file again
+    os.environ['GIGACHAT_PROXY_OWN_METRICS_DIR'] = os.environ['PROMETHEUS_MULTIPROC_DIR']
+
+
+def owns_metrics_dir():
+    """Whether this server created the metrics directory (and may delete it)"""
+    return os.environ.get('GIGACHAT_PROXY_OWN_METRICS_DIR') == os.environ['PROMETHEUS_MULTIPROC_DIR']
+
+
+def on_starting(server):
+    """Make sure the metrics directory exists; a configured one is never emptied"""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(path, exist_ok=True)
+    if not owns_metrics_dir() and os.listdir(path):
+        server.log.warning(f"PROMETHEUS_MULTIPROC_DIR {path} is not empty; samples left by a previous run "
+                           f"are included in /metrics until it is emptied")
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    """Delete the metrics directory this server created"""
+    if owns_metrics_dir():
+        shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
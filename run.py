@@ -1,10 +1,14 @@
 from app import create_app
+from app.asgi import create_asgi_app
 from app.utils.ssl import cleanup_cert_bundle
 from app.config import logger
 
 # Create the Flask application - this is used by Gunicorn
 app = create_app()
 
+# ASGI entry point - used by Gunicorn with uvicorn workers (./run.sh asgi)
+asgi_app = create_asgi_app(app)
+
 if __name__ == '__main__':
     try:
         # When running directly (development only)
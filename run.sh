@@ -12,6 +12,9 @@ cd ..
 if [ "$1" == "prod" ] || [ "$1" == "production" ]; then
     echo "Starting server in production mode with Gunicorn..."
     gunicorn --bind 0.0.0.0:3001 --workers 4 run:app
+elif [ "$1" == "asgi" ]; then
+    echo "Starting server in ASGI mode with Gunicorn and uvicorn workers..."
+    gunicorn --bind 0.0.0.0:3001 --workers 4 --worker-class uvicorn.workers.UvicornWorker run:asgi_app
 else
     echo "Starting server in development mode..."
     python run.py
@@ -0,0 +1,128 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import json
+import unittest
+from flask import Response
+from app import create_app
+from app.asgi import create_asgi_app
+from app.utils.async_bridge import AsyncStreamBody
+
+
+def call_asgi(asgi_app, method, path, body=b""):
+    """Run one HTTP request through the ASGI app and collect the response"""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "http_version": "1.1",
+        "headers": [(b"content-type", b"application/json")],
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Like a server, block until the client disconnects (it never does here)
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    status = sent[0]["status"]
+    headers = dict(sent[0]["headers"])
+    payload = b"".join(m.get("body", b"") for m in sent[1:])
+    return status, headers, payload
+
+
+class TestAsgiApp(unittest.TestCase):
+    def setUp(self):
+        self.flask_app = create_app()
+        self.asgi_app = create_asgi_app(self.flask_app)
+
+    def test_coroutine_view(self):
+        """Test that an async view is awaited and serialized"""
+        status, headers, payload = call_asgi(self.asgi_app, "GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(payload)["status"], "ok")
+
+    def test_sync_view(self):
+        """Test that plain sync views still work under ASGI"""
+        status, _, payload = call_asgi(self.asgi_app, "GET", "/api/version")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(payload)["name"], "GigaChat API Proxy")
+
+    def test_error_response(self):
+        """Test that validation errors keep their status code"""
+        status, _, payload = call_asgi(self.asgi_app, "POST", "/v1/chat/completions", b"{}")
+        self.assertEqual(status, 400)
+        self.assertEqual(json.loads(payload)["error"]["type"], "invalid_request_error")
+
+    def test_async_stream_body(self):
+        """Test that an async body streams under both ASGI and WSGI"""
+        async def generate():
+            for i in range(3):
+                yield f"data: {i}\n\n"
+
+        @self.flask_app.route("/test-stream")
+        async def test_stream():
+            return Response(AsyncStreamBody(generate()), mimetype="text/event-stream")
+
+        status, headers, payload = call_asgi(self.asgi_app, "GET", "/test-stream")
+        self.assertEqual(status, 200)
+        self.assertEqual(payload, b"data: 0\n\ndata: 1\n\ndata: 2\n\n")
+
+        response = self.flask_app.test_client().get("/test-stream")
+        self.assertEqual(response.get_data(), b"data: 0\n\ndata: 1\n\ndata: 2\n\n")
+
+    def test_disconnect_cancels_stream(self):
+        """Test that a client disconnect cancels the generator without waiting for its next chunk"""
+        state = {}
+
+        async def generate():
+            try:
+                yield "data: 0\n\n"
+                await asyncio.sleep(30)
+                yield "data: 1\n\n"
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+
+        @self.flask_app.route("/test-endless")
+        async def test_endless():
+            return Response(AsyncStreamBody(generate()), mimetype="text/event-stream")
+
+        scope = {"type": "http", "method": "GET", "path": "/test-endless", "query_string": b"",
+                 "http_version": "1.1", "headers": []}
+        sent = []
+
+        async def run():
+            first_chunk = asyncio.Event()
+            messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                await first_chunk.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+                if message.get("body"):
+                    first_chunk.set()
+
+            await asyncio.wait_for(self.asgi_app(scope, receive, send), timeout=5)
+
+        asyncio.run(run())
+        self.assertTrue(state.get("cancelled"))
+        self.assertEqual([m.get("body") for m in sent[1:]], [b"data: 0\n\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
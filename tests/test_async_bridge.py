@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import contextvars
+import threading
+import time
+import unittest
+from app.utils.async_bridge import AsyncStreamBody, background_loop, run_sync
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class TestBackgroundLoop(unittest.TestCase):
+    def test_run_sync_reuses_loop(self):
+        """Test that coroutines from different calls share one loop"""
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        self.assertIs(run_sync(current_loop()), run_sync(current_loop()))
+        self.assertIs(run_sync(current_loop()), background_loop.get_loop())
+
+    def test_run_sync_carries_context(self):
+        """Test that the caller's contextvars are visible to the coroutine"""
+        async def read_request_id():
+            return request_id.get()
+
+        request_id.set("req-1")
+        self.assertEqual(run_sync(read_request_id()), "req-1")
+
+    def test_run_sync_raises(self):
+        """Test that exceptions propagate to the calling thread"""
+        async def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            run_sync(fail())
+
+
+class TestAsyncStreamBody(unittest.TestCase):
+    def test_sync_iteration(self):
+        """Test that a WSGI server can iterate an async generator"""
+        async def generate():
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield i
+
+        self.assertEqual(list(AsyncStreamBody(generate())), [0, 1, 2])
+
+    def test_close_cancels_generator(self):
+        """Test that closing the body early stops the generator on the loop"""
+        finished = threading.Event()
+
+        async def generate():
+            try:
+                while True:
+                    yield "chunk"
+                    await asyncio.sleep(0.01)
+            finally:
+                finished.set()
+
+        body = AsyncStreamBody(generate())
+        iterator = iter(body)
+        self.assertEqual(next(iterator), "chunk")
+        body.close()
+        self.assertTrue(finished.wait(timeout=2))
+
+    def test_slow_reader_pauses_generator(self):
+        """Test that the generator runs at most buffer_size chunks ahead of a WSGI reader"""
+        produced = []
+
+        async def generate():
+            for i in range(20):
+                produced.append(i)
+                yield i
+
+        body = AsyncStreamBody(generate(), buffer_size=3)
+        iterator = iter(body)
+        self.assertEqual(next(iterator), 0)
+        # Give the pump time to run ahead if it could
+        time.sleep(0.1)
+        # One chunk taken, three buffered, one held by the pump waiting for room
+        self.assertLessEqual(len(produced), 5)
+        self.assertEqual(list(iterator), list(range(1, 20)))
+
+
+if __name__ == "__main__":
+    unittest.main()
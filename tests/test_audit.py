@@ -0,0 +1,115 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import json
+import logging
+import queue
+import shutil
+import tempfile
+import unittest
+from flask import Flask, jsonify
+from app.config import DroppingQueueHandler
+from app.utils.audit import AuditJournal, register_request_audit, record_usage
+
+
+def read_records(path):
+    with open(path, "rb") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestDroppingQueueHandler(unittest.TestCase):
+    def test_drops_when_full(self):
+        handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+        logger = logging.getLogger("test.dropping")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        try:
+            for i in range(5):
+                logger.warning("record %d", i)
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(handler.queue.get_nowait().getMessage(), "record 0")
+
+
+class TestAuditJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "audit.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_batched_write(self):
+        journal = AuditJournal(self.path, 1 << 20, 2, flush_interval=60)
+        journal.record({"id": "a", "status": 200})
+        journal.record({"id": "b", "status": 500})
+        self.assertFalse(os.path.exists(self.path))
+        journal.flush()
+        self.assertEqual([r["id"] for r in read_records(self.path)], ["a", "b"])
+        self.assertEqual(journal.stats()["batches"], 1)
+
+    def test_rotation(self):
+        journal = AuditJournal(self.path, 100, 2, flush_interval=60)
+        for batch in range(4):
+            journal.record({"id": str(batch), "padding": "x" * 100})
+            journal.flush()
+        self.assertEqual(journal.stats()["rotations"], 4)
+        self.assertEqual(read_records(f"{self.path}.1")[0]["id"], "3")
+        self.assertEqual(read_records(f"{self.path}.2")[0]["id"], "2")
+        self.assertFalse(os.path.exists(f"{self.path}.3"))
+
+    def test_drops_beyond_max_pending(self):
+        journal = AuditJournal(self.path, 1 << 20, 1, flush_interval=60, max_pending=2)
+        for i in range(3):
+            journal.record({"id": str(i)})
+        self.assertEqual(journal.stats()["dropped"], 1)
+
+    def test_disabled(self):
+        journal = AuditJournal("", 1 << 20, 1, flush_interval=60)
+        journal.record({"id": "a"})
+        journal.flush()
+        self.assertEqual(journal.stats()["records"], 0)
+
+
+class TestRequestAudit(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.journal = AuditJournal(os.path.join(self.dir, "audit.jsonl"), 1 << 20, 1, flush_interval=60)
+        app = Flask(__name__)
+
+        @app.route("/v1/chat/completions", methods=["POST"])
+        def chat():
+            record_usage({"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5})
+            return jsonify({"ok": True})
+
+        register_request_audit(app, self.journal)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_records_request(self):
+        response = self.client.post("/v1/chat/completions", json={"model": "GigaChat", "messages": []},
+                                    headers={"X-Request-Id": "req-1"})
+        response.close()
+        self.assertEqual(response.headers["X-Request-Id"], "req-1")
+        self.journal.flush()
+        [entry] = read_records(self.journal.path)
+        self.assertEqual(entry["id"], "req-1")
+        self.assertEqual(entry["model"], "GigaChat")
+        self.assertEqual(entry["status"], 200)
+        self.assertEqual(entry["usage"]["total_tokens"], 5)
+        self.assertGreaterEqual(entry["latency_ms"], 0)
+
+    def test_generates_request_id(self):
+        response = self.client.get("/missing")
+        self.assertEqual(len(response.headers["X-Request-Id"]), 32)
+
+
+if __name__ == "__main__":
+    unittest.main()
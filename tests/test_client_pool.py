@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import unittest
+from app.utils.client_pool import GigaChatClientPool
+
+
+class FakeClient:
+    def __init__(self, token, base_url):
+        self.token = token
+        self.base_url = base_url
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestGigaChatClientPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = GigaChatClientPool(FakeClient, max_size=2)
+
+    def test_reuse_same_token(self):
+        """Test that the same token and base URL reuse one client"""
+        async def scenario():
+            first = self.pool.acquire("token-a", "https://api")
+            await self.pool.release(first)
+            second = self.pool.acquire("token-a", "https://api")
+            await self.pool.release(second)
+            return first.client, second.client
+
+        first, second = asyncio.run(scenario())
+        self.assertIs(first, second)
+        self.assertEqual(self.pool.stats()["hits"], 1)
+        self.assertEqual(self.pool.stats()["misses"], 1)
+
+    def test_rotation_waits_for_leases(self):
+        """Test that a retired client is closed only after its last lease"""
+        async def scenario():
+            old = self.pool.acquire("token-a", "https://api")
+            new = self.pool.acquire("token-b", "https://api")
+            self.assertFalse(old.client.closed)
+            await self.pool.release(old)
+            await self.pool.release(new)
+            return old.client, new.client
+
+        old, new = asyncio.run(scenario())
+        self.assertTrue(old.closed)
+        self.assertFalse(new.closed)
+        self.assertEqual(self.pool.stats()["rotations"], 1)
+        self.assertEqual(self.pool.stats()["size"], 1)
+
+    def test_eviction(self):
+        """Test that the pool stays within max_size"""
+        async def scenario():
+            for base_url in ("https://a", "https://b", "https://c"):
+                entry = self.pool.acquire("token", base_url)
+                await self.pool.release(entry)
+            await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+        self.assertEqual(self.pool.stats()["size"], 2)
+        self.assertEqual(self.pool.stats()["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,236 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from gigachat.models import ChatCompletion
+from app import create_app
+from app.utils.coalescer import RequestCoalescer
+from tests.test_response_cache import sse_content
+from tests.test_timeouts import SlowUpstream
+
+
+def sse_frames(payload):
+    """The JSON chunks of an SSE body"""
+    return [json.loads(line[len("data: "):]) for line in payload.decode("utf-8").splitlines()
+            if line.startswith("data: {")]
+
+
+class TestRequestCoalescer(unittest.TestCase):
+    def test_run_shares_one_call(self):
+        coalescer = RequestCoalescer()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"answer": 42}
+
+        async def main():
+            return await asyncio.gather(*(coalescer.run("k", call) for _ in range(5)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], [{"answer": 42}] * 5)
+        self.assertEqual([shared for _, shared in results], [False, True, True, True, True])
+
+    def test_errors_reach_followers(self):
+        coalescer = RequestCoalescer()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def main():
+            return await asyncio.gather(coalescer.run("k", call), coalescer.run("k", call), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in asyncio.run(main())))
+
+    def test_stream_fan_out_with_replay(self):
+        """Test that a late subscriber gets the chunks already sent, then the live ones"""
+        coalescer = RequestCoalescer()
+        started = []
+
+        async def generate():
+            started.append(1)
+            for i in range(4):
+                await asyncio.sleep(0.01)
+                yield f"chunk{i}"
+
+        async def collect(stream):
+            return [chunk async for chunk in stream]
+
+        async def main():
+            first = asyncio.ensure_future(collect(coalescer.stream("k", generate)))
+            await asyncio.sleep(0.025)
+            second = asyncio.ensure_future(collect(coalescer.stream("k", generate)))
+            return await first, await second
+
+        first, second = asyncio.run(main())
+        self.assertEqual(len(started), 1)
+        self.assertEqual(first, ["chunk0", "chunk1", "chunk2", "chunk3"])
+        self.assertEqual(second, first)
+
+    def test_stream_errors_reach_subscribers(self):
+        """Test that every subscriber gets the chunks before an upstream error, then the error"""
+        coalescer = RequestCoalescer()
+
+        async def generate():
+            yield "chunk"
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def collect(stream):
+            chunks = []
+            try:
+                async for chunk in stream:
+                    chunks.append(chunk)
+            except RuntimeError as e:
+                chunks.append(str(e))
+            return chunks
+
+        async def main():
+            return await asyncio.gather(*(collect(coalescer.stream("k", generate)) for _ in range(2)))
+
+        self.assertEqual(asyncio.run(main()), [["chunk", "upstream down"]] * 2)
+
+    def test_stream_cancelled_when_everyone_leaves(self):
+        coalescer = RequestCoalescer()
+        closed = []
+
+        async def generate():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "chunk"
+            finally:
+                closed.append(1)
+
+        async def main():
+            streams = [coalescer.stream("k", generate) for _ in range(2)]
+            for stream in streams:
+                await stream.__anext__()
+                await stream.aclose()
+            await asyncio.sleep(0.02)
+
+        asyncio.run(main())
+        self.assertEqual(closed, [1])
+        self.assertEqual(coalescer.stats()["cancelled_streams"], 1)
+        self.assertEqual(coalescer.stats()["in_flight"], 0)
+
+    def test_call_cancelled_when_every_caller_gives_up(self):
+        coalescer = RequestCoalescer()
+        cancelled = []
+
+        async def call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        async def main():
+            first = asyncio.ensure_future(asyncio.wait_for(coalescer.run("k", call), 0.02))
+            second = asyncio.ensure_future(asyncio.wait_for(coalescer.run("k", call), 0.05))
+            await asyncio.sleep(0.03)
+            # One caller is still waiting, so the call goes on
+            self.assertEqual(cancelled, [])
+            await asyncio.gather(first, second, return_exceptions=True)
+            await asyncio.sleep(0)
+
+        asyncio.run(main())
+        self.assertEqual(cancelled, [1])
+        self.assertEqual(coalescer.stats()["cancelled_calls"], 1)
+        self.assertEqual(coalescer.stats()["in_flight"], 0)
+
+
+class TestCoalescingEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+        async def call_with_auth_retry(call):
+            self.calls += 1
+            await asyncio.sleep(0.2)
+            return ChatCompletion.parse_obj({
+                "choices": [{"message": {"role": "assistant", "content": "shared"}, "index": 0, "finish_reason": "stop"}],
+                "created": int(time.time()),
+                "model": "GigaChat",
+                "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+                "object": "chat.completion",
+            })
+
+        patches = [
+            patch("app.api.chat.call_with_auth_retry", call_with_auth_retry),
+            patch("app.api.chat.request_coalescer", RequestCoalescer()),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.app = create_app()
+
+    def post_concurrently(self, request_data, count):
+        bodies = []
+
+        def post():
+            response = self.app.test_client().post("/v1/chat/completions", json=request_data)
+            bodies.append(json.loads(response.data))
+
+        threads = [threading.Thread(target=post) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return bodies
+
+    def test_concurrent_identical_requests(self):
+        """Test that concurrent identical requests make one upstream call, each with its own id"""
+        bodies = self.post_concurrently({"messages": [{"role": "user", "content": "hi"}], "temperature": 0}, 5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({body["choices"][0]["message"]["content"] for body in bodies}, {"shared"})
+        self.assertEqual(len({body["id"] for body in bodies}), 5)
+
+    def test_concurrent_identical_streams(self):
+        """Test that concurrent identical streams share one upstream stream, each with its own id"""
+        upstream = SlowUpstream(delay=0.05, words=("shared ", "stream"))
+        bodies = []
+
+        def post(options):
+            response = self.app.test_client().post("/v1/chat/completions", json={
+                "messages": [{"role": "user", "content": "hi"}], "temperature": 0, "stream": True,
+                "stream_options": options,
+            })
+            bodies.append(response.get_data())
+
+        # Frame pacing is per subscriber, so it doesn't keep streams apart
+        options = [{}, {"coalesce_window": 0.5}, {}]
+        with patch("app.api.chat.astream_with_auth_retry", upstream.astream_with_auth_retry):
+            threads = [threading.Thread(target=post, args=(option,)) for option in options]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(upstream.calls, 1)
+        self.assertEqual({sse_content(body) for body in bodies}, {"shared stream"})
+        ids = [{frame["id"] for frame in sse_frames(body)} for body in bodies]
+        self.assertTrue(all(len(frame_ids) == 1 for frame_ids in ids))
+        self.assertEqual(len(set.union(*ids)), 3)
+
+    def test_sampled_requests_are_not_coalesced(self):
+        """Test that concurrent requests at a non-zero temperature each get their own completion"""
+        self.post_concurrently({"messages": [{"role": "user", "content": "hi"}], "temperature": 0.7}, 2)
+        self.assertEqual(self.calls, 2)
+        # GigaChat's default temperature is not 0 either
+        self.post_concurrently({"messages": [{"role": "user", "content": "hi"}]}, 2)
+        self.assertEqual(self.calls, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import unittest
+from app.utils.embedding_batcher import EmbeddingBatcher
+
+
+class FakeSend:
+    """Records the upstream batches and embeds each text as [len(text)]"""
+
+    def __init__(self, fail=False, reject=()):
+        self.batches = []
+        self.fail = fail
+        self.reject = reject
+
+    async def __call__(self, model, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        if any(text in self.reject for text in texts):
+            raise ValueError("input rejected")
+        return [([float(len(text))], 1) for text in texts]
+
+
+class TestEmbeddingBatcher(unittest.TestCase):
+    def test_concurrent_calls_share_one_batch(self):
+        """Test that concurrent callers within the window get one deduplicated upstream call"""
+        send = FakeSend()
+        batcher = EmbeddingBatcher(send, window=0.01, max_batch_size=100, max_concurrency=4)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed("m", ["a", "bb"]),
+                batcher.embed("m", ["bb", "ccc"]),
+            )
+
+        first, second = asyncio.run(main())
+        self.assertEqual(send.batches, [["a", "bb", "ccc"]])
+        self.assertEqual(first, [([1.0], 1), ([2.0], 1)])
+        self.assertEqual(second, [([2.0], 1), ([3.0], 1)])
+        stats = batcher.stats()
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["deduplicated"], 1)
+        self.assertEqual(stats["avg_fill_ratio"], 0.03)
+
+    def test_full_batch_is_sent_early(self):
+        """Test that a batch is flushed at max_batch_size without waiting for the window"""
+        send = FakeSend()
+        batcher = EmbeddingBatcher(send, window=10, max_batch_size=2, max_concurrency=4)
+        results = asyncio.run(asyncio.wait_for(batcher.embed("m", ["a", "b", "c", "d"]), timeout=1))
+        self.assertEqual(send.batches, [["a", "b"], ["c", "d"]])
+        self.assertEqual(len(results), 4)
+
+    def test_models_are_batched_separately(self):
+        """Test that inputs for different models never share a call"""
+        send = FakeSend()
+        batcher = EmbeddingBatcher(send, window=0.01, max_batch_size=100, max_concurrency=4)
+
+        async def main():
+            await asyncio.gather(batcher.embed("m1", ["a"]), batcher.embed("m2", ["a"]))
+
+        asyncio.run(main())
+        self.assertEqual(len(send.batches), 2)
+
+    def test_errors_reach_every_caller(self):
+        """Test that an upstream failure is raised to all callers of the batch"""
+        batcher = EmbeddingBatcher(FakeSend(fail=True), window=0.01, max_batch_size=100, max_concurrency=4)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed("m", ["a"]), batcher.embed("m", ["b"]), return_exceptions=True
+            )
+
+        results = asyncio.run(main())
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    def test_failure_stays_with_the_caller_that_caused_it(self):
+        """Test that a batch failed by one caller's input is retried per caller"""
+        send = FakeSend(reject=("bad",))
+        batcher = EmbeddingBatcher(send, window=0.01, max_batch_size=100, max_concurrency=4)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed("m", ["a", "bad"]), batcher.embed("m", ["a", "ccc"]), return_exceptions=True
+            )
+
+        first, second = asyncio.run(main())
+        self.assertIsInstance(first, ValueError)
+        self.assertEqual(second, [([1.0], 1), ([3.0], 1)])
+        self.assertEqual(send.batches, [["a", "bad", "ccc"], ["a", "bad"], ["a", "ccc"]])
+        self.assertEqual(batcher.stats()["split_batches"], 1)
+
+
+class SlowSend:
+    """Tracks how many upstream calls are in flight at once"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def __call__(self, model, texts):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return [([float(text)], 1) for text in texts]
+
+
+class TestOversizedInputs(unittest.TestCase):
+    def check_split(self, window):
+        send = SlowSend()
+        batcher = EmbeddingBatcher(send, window=window, max_batch_size=10, max_concurrency=3)
+        texts = [str(i) for i in range(95)]
+        results = asyncio.run(batcher.embed("m", texts))
+        self.assertEqual([vector[0] for vector, _ in results], [float(i) for i in range(95)])
+        self.assertEqual(send.calls, 10)
+        self.assertEqual(send.peak, 3)
+
+    def test_split_without_window(self):
+        """Test that a large input is sent as bounded concurrent sub-batches, results in order"""
+        self.check_split(window=0)
+
+    def test_split_with_window(self):
+        """Test that batched mode honours the same sub-batch size and concurrency limit"""
+        self.check_split(window=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
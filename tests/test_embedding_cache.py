@@ -0,0 +1,180 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import base64
+import json
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+from gigachat.models import Embeddings
+from app import create_app
+from app.utils.embedding_cache import EmbeddingCache, ENTRY_OVERHEAD_BYTES
+
+
+def fake_vector(text):
+    return [float(len(text)), 0.5, -0.25]
+
+
+class FakeEmbeddingsUpstream:
+    """Stands in for call_with_auth_retry and records the texts sent upstream"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def __call__(self, call):
+        return await call(self)
+
+    async def aembeddings(self, texts, model):
+        self.requests.append(list(texts))
+        return Embeddings.parse_obj({
+            "object": "list",
+            "model": model,
+            "data": [
+                {"object": "embedding", "embedding": fake_vector(text), "index": i, "usage": {"prompt_tokens": 2}}
+                for i, text in enumerate(texts)
+            ],
+        })
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def test_lru_respects_byte_budget(self):
+        """Test that the least recently used vectors are evicted past the byte budget"""
+        entry_size = 4 * 4 + ENTRY_OVERHEAD_BYTES
+        cache = EmbeddingCache(max_bytes=2 * entry_size)
+        cache.put_many("m", ["a", "b"], [[1, 2, 3, 4], [5, 6, 7, 8]], [1, 1])
+        cache.get_many("m", ["a"])
+        cache.put_many("m", ["c"], [[9, 9, 9, 9]], [1])
+
+        hits = cache.get_many("m", ["a", "b", "c"])
+        self.assertIsNotNone(hits[0])
+        self.assertIsNone(hits[1])
+        self.assertEqual(hits[2][0].dtype, np.float32)
+        self.assertLessEqual(cache.stats()["bytes"], 2 * entry_size)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_keyed_by_model(self):
+        """Test that the same text embedded by another model is a miss"""
+        cache = EmbeddingCache(max_bytes=1 << 20)
+        cache.put_many("m1", ["text"], [[1.0]], [1])
+        self.assertIsNone(cache.get_many("m2", ["text"])[0])
+
+    def test_disk_tier(self):
+        """Test that a fresh cache finds vectors persisted by another one"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "embeddings.sqlite")
+            EmbeddingCache(max_bytes=1 << 20, disk_path=path).put_many("m", ["text"], [[0.5, 1.5]], [3])
+
+            cache = EmbeddingCache(max_bytes=1 << 20, disk_path=path)
+            vector, tokens = cache.get_many("m", ["text"])[0]
+            self.assertEqual(vector.tolist(), [0.5, 1.5])
+            self.assertEqual(tokens, 3)
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+            # Promoted to memory
+            cache.get_many("m", ["text"])
+            self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_disk_connection_per_process(self):
+        """Test that the sqlite connection is opened on first use and again in a forked worker"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = EmbeddingCache(max_bytes=1 << 20, disk_path=os.path.join(tmpdir, "embeddings.sqlite"))
+            self.assertIsNone(cache._db)
+            cache.put_many("m", ["text"], [[0.5]], [1])
+            parent_db = cache._db
+            self.assertIsNotNone(parent_db)
+
+            with patch("app.utils.embedding_cache.os.getpid", return_value=os.getpid() + 1):
+                self.assertIsNone(cache.get_many("m", ["other"])[0])
+            self.assertIsNot(cache._db, parent_db)
+
+    def test_disk_lock_does_not_block_the_loop(self):
+        """Test that a write waiting on another worker's lock leaves other coroutines running"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "embeddings.sqlite")
+            cache = EmbeddingCache(max_bytes=1 << 20, disk_path=path)
+            cache.put_many("m", ["warm-up"], [[0.5]], [1])
+            other_worker = sqlite3.connect(path, isolation_level=None)
+            other_worker.execute("BEGIN IMMEDIATE")
+
+            async def main():
+                ticks = []
+
+                async def ticker():
+                    for _ in range(10):
+                        ticks.append(time.perf_counter())
+                        await asyncio.sleep(0.01)
+
+                putting = asyncio.ensure_future(cache.aput_many("m", ["text"], [[1.5]], [2]))
+                await ticker()
+                self.assertFalse(putting.done())
+                other_worker.execute("COMMIT")
+                await putting
+                return ticks
+
+            ticks = asyncio.run(main())
+            other_worker.close()
+            self.assertEqual(len(ticks), 10)
+            self.assertLess(ticks[-1] - ticks[0], 1.0)
+            self.assertEqual(EmbeddingCache(max_bytes=1 << 20, disk_path=path).get_many("m", ["text"])[0][1], 2)
+
+
+class TestEmbeddingsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeEmbeddingsUpstream()
+        patches = [
+            patch("app.utils.embedding_batcher.call_with_auth_retry", self.upstream),
+            patch("app.utils.embedding_batcher.embedding_cache", EmbeddingCache(max_bytes=1 << 20)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def post(self, texts):
+        return self.client.post("/v1/embeddings", json={"model": "Embeddings", "input": texts})
+
+    def test_only_misses_go_upstream(self):
+        """Test that cached inputs are not re-sent and the response keeps input order"""
+        self.post(["a", "bb"])
+        response = self.post(["ccc", "a", "bb", "ccc"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.upstream.requests, [["a", "bb"], ["ccc"]])
+        # "ccc" missed at two positions, though it went upstream once
+        self.assertEqual(response.headers["X-Embedding-Cache-Hit-Ratio"], "0.5000")
+
+        body = json.loads(response.data)
+        self.assertEqual([item["index"] for item in body["data"]], [0, 1, 2, 3])
+        self.assertEqual([item["embedding"] for item in body["data"]],
+                         [fake_vector(text) for text in ["ccc", "a", "bb", "ccc"]])
+        self.assertEqual(body["usage"], {"prompt_tokens": 8, "total_tokens": 8})
+
+    def test_rejects_non_text_input(self):
+        """Test that token arrays and non-string items are a 400, not an upstream error"""
+        for texts in ([1, 2, 3], [[1, 2], [3]], ["a", None], {"text": "a"}, 42):
+            with self.subTest(input=texts):
+                response = self.post(texts)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(json.loads(response.data)["error"]["param"], "input")
+        self.assertEqual(self.upstream.requests, [])
+
+    def test_base64_encoding(self):
+        """Test that encoding_format=base64 returns float32 vectors"""
+        response = self.client.post("/v1/embeddings", json={"input": ["ab"], "encoding_format": "base64"})
+        embedding = json.loads(response.data)["data"][0]["embedding"]
+        self.assertEqual(np.frombuffer(base64.b64decode(embedding), dtype="<f4").tolist(), fake_vector("ab"))
+
+    def test_full_hit_skips_upstream(self):
+        """Test that a fully cached request makes no upstream call"""
+        self.post("hello")
+        response = self.post("hello")
+        self.assertEqual(len(self.upstream.requests), 1)
+        self.assertEqual(response.headers["X-Embedding-Cache-Hit-Ratio"], "1.0000")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import base64
+import json
+import unittest
+import numpy as np
+from app import create_app
+from app.utils.embedding_format import encode_embedding
+
+VECTOR = np.array([0.5, -1.25, 0.0, 3.0], dtype=np.float32)
+
+
+def decode(value, dtype):
+    return np.frombuffer(base64.b64decode(value), dtype=dtype)
+
+
+class TestEncodeEmbedding(unittest.TestCase):
+    def test_float(self):
+        self.assertEqual(encode_embedding(VECTOR), ([0.5, -1.25, 0.0, 3.0], {}))
+
+    def test_base64_matches_openai_float32(self):
+        """Test that base64 is little-endian float32, as the OpenAI clients decode it"""
+        value, extra = encode_embedding(VECTOR, "base64")
+        np.testing.assert_array_equal(decode(value, "<f4"), VECTOR)
+        self.assertEqual(extra, {})
+
+    def test_float16(self):
+        value, _ = encode_embedding(VECTOR, "base64_float16")
+        np.testing.assert_allclose(decode(value, "<f2"), VECTOR, rtol=1e-3)
+
+    def test_int8_with_scale(self):
+        value, extra = encode_embedding(VECTOR, "base64_int8")
+        restored = decode(value, np.int8) * extra["scale"] / 127
+        np.testing.assert_allclose(restored, VECTOR, atol=extra["scale"] / 127)
+
+    def test_int8_zero_vector(self):
+        value, extra = encode_embedding(np.zeros(3, dtype=np.float32), "base64_int8")
+        self.assertEqual(extra, {"scale": 0.0})
+        self.assertEqual(decode(value, np.int8).tolist(), [0, 0, 0])
+
+
+class TestEncodingFormatParam(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    def test_unknown_format_rejected(self):
+        response = self.client.post("/v1/embeddings", json={"input": "hi", "encoding_format": "float64"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)["error"]["param"], "encoding_format")
+
+
+if __name__ == "__main__":
+    unittest.main()
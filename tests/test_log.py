@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import logging
+import unittest
+from app.utils.log import LazyJSON, PayloadSampler, log_payload
+
+
+class ExplodingJSON:
+    """Fails the test if a disabled log call serializes its payload"""
+
+    def __init__(self, test):
+        self.test = test
+
+    def __iter__(self):
+        self.test.fail("payload was serialized for a disabled log level")
+
+
+class TestLazyLogging(unittest.TestCase):
+    def test_lazy_json_not_serialized_when_disabled(self):
+        logger = logging.getLogger("test.lazy")
+        logger.setLevel(logging.INFO)
+        logger.debug("payload: %s", LazyJSON({"items": ExplodingJSON(self)}))
+
+    def test_lazy_json_serialized_when_enabled(self):
+        logger = logging.getLogger("test.lazy")
+        with self.assertLogs(logger, level="DEBUG") as logs:
+            logger.debug("payload: %s", LazyJSON({"text": "привет"}))
+        self.assertEqual(logs.records[0].getMessage(), 'payload: {"text": "привет"}')
+
+
+class TestPayloadSampler(unittest.TestCase):
+    def test_one_in_n(self):
+        sampler = PayloadSampler(rate=4)
+        self.assertEqual([sampler.sample() for _ in range(8)], [True, False, False, False] * 2)
+
+    def test_disabled(self):
+        sampler = PayloadSampler(rate=0)
+        self.assertFalse(any(sampler.sample() for _ in range(10)))
+
+    def test_log_payload(self):
+        with self.assertLogs("app.payloads", level="INFO") as logs:
+            log_payload(True, "Chat completion request", '{"messages": []}')
+            log_payload(False, "Chat completion request", '{"messages": ["skipped"]}')
+        self.assertEqual([record.getMessage() for record in logs.records],
+                         ['Chat completion request: {"messages": []}'])
+
+    def test_log_payload_reads_lazily(self):
+        """Test that the payload of a request that was not sampled is never produced"""
+        log_payload(False, "Chat completion request", lambda: self.fail("payload read for an unsampled request"))
+        with self.assertLogs("app.payloads", level="INFO") as logs:
+            log_payload(True, "Chat completion request", lambda: '{"messages": []}')
+        self.assertEqual(logs.records[0].getMessage(), 'Chat completion request: {"messages": []}')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import unittest
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from app import create_app
+from tests.test_response_cache import FakeChatUpstream
+
+REQUEST = {"messages": [{"role": "user", "content": "Say hi"}], "temperature": 0.5}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeChatUpstream(words=("h", "i", "!"))
+        patches = [
+            patch("app.api.chat.call_with_auth_retry", self.upstream.call_with_auth_retry),
+            patch("app.api.chat.astream_with_auth_retry", self.upstream.astream_with_auth_retry),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def test_exposition(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn(b"gigachat_proxy_http_requests_total", response.data)
+
+    def test_request_and_token_counters(self):
+        route = "/v1/chat/completions"
+        requests_before = sample("gigachat_proxy_http_requests_total", route=route, method="POST", status="200")
+        tokens_before = sample("gigachat_proxy_tokens_total", route=route, kind="prompt_tokens")
+        upstream_before = sample("gigachat_proxy_upstream_request_duration_seconds_count", operation="chat")
+
+        self.client.post(route, json=REQUEST).close()
+
+        self.assertEqual(sample("gigachat_proxy_http_requests_total", route=route, method="POST", status="200"),
+                         requests_before + 1)
+        self.assertEqual(sample("gigachat_proxy_tokens_total", route=route, kind="prompt_tokens"), tokens_before + 5)
+        self.assertEqual(sample("gigachat_proxy_upstream_request_duration_seconds_count", operation="chat"),
+                         upstream_before + 1)
+
+    def test_stream_timings(self):
+        ttft_before = sample("gigachat_proxy_stream_time_to_first_token_seconds_count")
+        gaps_before = sample("gigachat_proxy_stream_inter_chunk_seconds_count")
+
+        response = self.client.post("/v1/chat/completions", json=dict(REQUEST, stream=True))
+        response.get_data()
+        response.close()
+
+        self.assertEqual(sample("gigachat_proxy_stream_time_to_first_token_seconds_count"), ttft_before + 1)
+        self.assertEqual(sample("gigachat_proxy_stream_inter_chunk_seconds_count"), gaps_before + 2)
+        self.assertEqual(sample("gigachat_proxy_streams_in_flight"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import json
+import time
+import unittest
+from unittest.mock import patch
+import httpx
+from app import create_app
+from app.utils import models_cache as models_cache_module
+from app.utils.models_cache import ModelsCache
+
+MODELS = {"object": "list", "data": [{"id": "GigaChat", "object": "model", "owned_by": "salutedevices"}]}
+
+
+class FakeUpstream:
+    """Serves /models through httpx.MockTransport and counts the calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def handler(self, request):
+        self.calls += 1
+        if self.fail:
+            return httpx.Response(503)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=MODELS, headers={"ETag": '"v1"'})
+
+    def client(self):
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+class TestModelsCache(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeUpstream()
+        self.cache = ModelsCache(ttl=60)
+        patches = [
+            patch.object(models_cache_module, "create_async_http_client", self.upstream.client),
+            patch.object(models_cache_module.token_manager, "aget_valid_token", self.fake_token),
+            patch("app.api.models.models_cache", self.cache),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    async def fake_token(self):
+        return "token"
+
+    def test_served_from_memory(self):
+        """Test that repeated calls hit upstream once"""
+        for _ in range(3):
+            response = self.client.get("/v1/models")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data), MODELS)
+        self.assertEqual(self.upstream.calls, 1)
+        self.assertIn("max-age=", response.headers["Cache-Control"])
+
+    def test_conditional_get(self):
+        """Test that clients can revalidate with If-None-Match"""
+        etag = self.client.get("/v1/models").headers["ETag"]
+        response = self.client.get("/v1/models", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+    def test_stale_served_when_upstream_fails(self):
+        """Test that the last known list is served when revalidation fails"""
+        self.client.get("/v1/models")
+        self.cache._entry.fetched_at = time.monotonic() - 120
+        self.upstream.fail = True
+
+        response = self.client.get("/v1/models")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), MODELS)
+        self.assertEqual(response.headers["Cache-Control"], "max-age=0")
+
+    def test_upstream_not_modified(self):
+        """Test that revalidation sends the upstream ETag and keeps the entry on 304"""
+        self.client.get("/v1/models")
+        entry = self.cache._entry
+        entry.fetched_at = time.monotonic() - 120
+        self.client.get("/v1/models")
+        deadline = time.time() + 2
+        while self.upstream.calls < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        self.assertIs(self.cache._entry, entry)
+        self.assertLess(entry.age(), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.utils.rate_limit import (
+    Limits,
+    MemoryBucketStore,
+    RateLimiter,
+    SqliteBucketStore,
+    estimate_chat_tokens,
+    reserve
+)
+from tests.test_response_cache import FakeChatUpstream
+
+REQUEST = {"messages": [{"role": "user", "content": "Hello"}], "temperature": 0.5}
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_rate(self):
+        buckets = Limits(rps=2, burst=2).buckets(1)
+        state = {}
+        waits = []
+        for _ in range(4):
+            wait, _, taken = reserve(state, buckets, 100.0, max_wait=10)
+            state = taken[0]
+            waits.append(wait)
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0])
+
+    def test_rejection_takes_nothing(self):
+        buckets = Limits(tpm=600).buckets(100)
+        # 600 tokens/min refill 10/s: from -50 a second ago to the 100 needed takes 14s
+        state = {"tokens": (-50.0, 0.0)}
+        wait, limiting, taken = reserve(state, buckets, 1.0, max_wait=5)
+        self.assertEqual((wait, limiting, taken), (14.0, "tokens", None))
+
+    def test_estimate_chat_tokens(self):
+        request = dict(REQUEST, messages=[{"role": "user", "content": "x" * 400}], max_tokens=50)
+        self.assertEqual(estimate_chat_tokens(request), 150)
+        self.assertEqual(estimate_chat_tokens({"messages": "bad"}), 1)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_waits_then_rejects_with_retry_after(self):
+        limiter = RateLimiter(Limits(rps=10, burst=1), max_wait=0.15, queue_size=4)
+
+        async def main():
+            started = time.perf_counter()
+            self.assertIsNone(await limiter.acquire("sk-a", 1))
+            self.assertIsNone(await limiter.acquire("sk-a", 1))
+            waited = time.perf_counter() - started
+            rejection = await limiter.acquire("sk-a", 1, max_wait=0)
+            # Another key has its own bucket
+            self.assertIsNone(await limiter.acquire("sk-b", 1))
+            return waited, rejection
+
+        waited, (retry_after, limiting) = asyncio.run(main())
+        self.assertGreaterEqual(waited, 0.09)
+        self.assertEqual(limiting, "requests")
+        self.assertAlmostEqual(retry_after, 0.1, delta=0.02)
+        self.assertEqual(limiter.stats()["delayed"], 1)
+        self.assertEqual(limiter.stats()["rejected"], 1)
+
+    def test_queue_size(self):
+        limiter = RateLimiter(Limits(rps=10, burst=1), max_wait=5, queue_size=1)
+
+        async def main():
+            await limiter.acquire("sk-a", 1)
+            waiter = asyncio.ensure_future(limiter.acquire("sk-a", 1))
+            await asyncio.sleep(0.01)
+            rejection = await limiter.acquire("sk-a", 1)
+            await waiter
+            return rejection
+
+        self.assertIsNotNone(asyncio.run(main()))
+
+    def test_per_key_limits(self):
+        limiter = RateLimiter(Limits(), limits_by_key={"sk-bulk": Limits(rps=1)}, max_wait=0)
+
+        async def main():
+            results = [await limiter.acquire("sk-other", 1) for _ in range(3)]
+            results += [await limiter.acquire("sk-bulk", 1) for _ in range(2)]
+            return results
+
+        results = asyncio.run(main())
+        self.assertEqual(results[:4], [None] * 4)
+        self.assertIsNotNone(results[4])
+
+    def test_sqlite_store_shared(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "buckets.sqlite")
+            buckets = Limits(rps=1, burst=2).buckets(1)
+            first, second = SqliteBucketStore(path), SqliteBucketStore(path)
+            self.assertEqual(first.reserve("k", buckets, 100.0, 0)[0], 0.0)
+            self.assertEqual(second.reserve("k", buckets, 100.0, 0)[0], 0.0)
+            self.assertEqual(first.reserve("k", buckets, 100.0, 0), (1.0, "requests"))
+            self.assertEqual(MemoryBucketStore().reserve("k", buckets, 100.0, 0)[0], 0.0)
+
+    def test_sqlite_lock_does_not_block_the_loop(self):
+        """Test that a reservation waiting on another worker's write lock leaves other coroutines running"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "buckets.sqlite")
+            store = SqliteBucketStore(path)
+            store.reserve("warm-up", Limits(rps=1).buckets(1), 0.0, 0)
+            limiter = RateLimiter(Limits(rps=10), store=store)
+            other_worker = sqlite3.connect(path, isolation_level=None)
+            other_worker.execute("BEGIN IMMEDIATE")
+
+            async def main():
+                ticks = []
+
+                async def ticker():
+                    for _ in range(10):
+                        ticks.append(time.perf_counter())
+                        await asyncio.sleep(0.01)
+
+                acquiring = asyncio.ensure_future(limiter.acquire("sk-a", 1))
+                await ticker()
+                self.assertFalse(acquiring.done())
+                other_worker.execute("COMMIT")
+                self.assertIsNone(await acquiring)
+                return ticks
+
+            ticks = asyncio.run(main())
+            other_worker.close()
+            self.assertEqual(len(ticks), 10)
+            self.assertLess(ticks[-1] - ticks[0], 1.0)
+
+
+class TestRateLimitedEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeChatUpstream()
+        patches = [
+            patch("app.api.chat.call_with_auth_retry", self.upstream.call_with_auth_retry),
+            patch("app.utils.rate_limit.rate_limiter", RateLimiter(Limits(rps=0.5, burst=1), max_wait=0)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def test_429_with_retry_after(self):
+        headers = {"Authorization": "Bearer sk-noisy"}
+        self.assertEqual(self.client.post("/v1/chat/completions", json=REQUEST, headers=headers).status_code, 200)
+        response = self.client.post("/v1/chat/completions", json=REQUEST, headers=headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "2")
+        self.assertGreater(int(response.headers["Retry-After-Ms"]), 1900)
+        self.assertEqual(response.get_json()["error"]["code"], "rate_limit_exceeded")
+        self.assertEqual(self.upstream.calls, 1)
+
+        other = {"Authorization": "Bearer sk-quiet"}
+        self.assertEqual(self.client.post("/v1/chat/completions", json=REQUEST, headers=other).status_code, 200)
+        self.assertEqual(self.client.get("/health").status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import json
+import time
+import unittest
+from unittest.mock import patch
+from gigachat.models import ChatCompletion, ChatCompletionChunk
+from app import create_app
+from app.utils.response_cache import ChatResponseCache
+
+REQUEST = {"messages": [{"role": "user", "content": "Classify: hello"}], "temperature": 0}
+
+
+class FakeChatUpstream:
+    """Stands in for the GigaChat chat calls and counts them"""
+
+    def __init__(self, words=("greeting",)):
+        self.words = words
+        self.calls = 0
+
+    async def call_with_auth_retry(self, call):
+        return await call(self)
+
+    async def achat(self, chat):
+        self.calls += 1
+        return ChatCompletion.parse_obj({
+            "choices": [{
+                "message": {"role": "assistant", "content": "".join(self.words)},
+                "index": 0,
+                "finish_reason": "stop",
+            }],
+            "created": int(time.time()),
+            "model": "GigaChat",
+            "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+            "object": "chat.completion",
+        })
+
+    async def astream_with_auth_retry(self, chat):
+        self.calls += 1
+        for i, word in enumerate(self.words):
+            yield ChatCompletionChunk.parse_obj({
+                "choices": [{
+                    "delta": {"content": word},
+                    "index": 0,
+                    "finish_reason": "stop" if i == len(self.words) - 1 else None,
+                }],
+                "created": int(time.time()),
+                "model": "GigaChat",
+                "object": "chat.completion",
+            })
+
+
+def sse_content(payload):
+    """Concatenate the content deltas of an SSE body"""
+    content = ""
+    for line in payload.decode("utf-8").splitlines():
+        if line.startswith("data: {"):
+            delta = json.loads(line[len("data: "):])["choices"][0]["delta"]
+            content += delta.get("content") or ""
+    return content
+
+
+class TestChatResponseCache(unittest.TestCase):
+    def test_key_uses_chat_params_only(self):
+        """Test that the key ignores unused fields and normalizes numbers"""
+        cache = ChatResponseCache(ttl=60, max_entries=10)
+        key = cache.key_for(REQUEST)
+        self.assertEqual(key, cache.key_for(dict(REQUEST, temperature=0.0, stream=True, user="x")))
+        self.assertNotEqual(key, cache.key_for(dict(REQUEST, max_tokens=10)))
+
+    def test_only_deterministic_requests(self):
+        cache = ChatResponseCache(ttl=60, max_entries=10)
+        self.assertIsNone(cache.key_for(dict(REQUEST, temperature=0.7)))
+        self.assertIsNone(cache.key_for({"messages": REQUEST["messages"]}))
+        self.assertIsNone(ChatResponseCache(ttl=0, max_entries=10).key_for(REQUEST))
+
+    def test_ttl_and_lru(self):
+        cache = ChatResponseCache(ttl=60, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, {"key": key})
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), {"key": "c"})
+
+        cache.ttl = -1
+        cache.put("d", {"key": "d"})
+        self.assertIsNone(cache.get("d"))
+
+
+class TestChatCacheEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeChatUpstream(words=("gree", "ting"))
+        patches = [
+            patch("app.api.chat.call_with_auth_retry", self.upstream.call_with_auth_retry),
+            patch("app.api.chat.astream_with_auth_retry", self.upstream.astream_with_auth_retry),
+            patch("app.api.chat.chat_cache", ChatResponseCache(ttl=60, max_entries=10)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def test_non_stream_hit(self):
+        """Test that a repeated request is answered from the cache under a new id"""
+        first = self.client.post("/v1/chat/completions", json=REQUEST)
+        second = self.client.post("/v1/chat/completions", json=REQUEST)
+        self.assertEqual(first.headers["X-Cache"], "MISS")
+        self.assertEqual(second.headers["X-Cache"], "HIT")
+        self.assertEqual(self.upstream.calls, 1)
+        first_body, second_body = json.loads(first.data), json.loads(second.data)
+        self.assertEqual(first_body["choices"], second_body["choices"])
+        self.assertNotEqual(first_body["id"], second_body["id"])
+
+    def test_stream_replay(self):
+        """Test that a completed stream is cached and replayed as SSE, for both forms"""
+        first = self.client.post("/v1/chat/completions", json=dict(REQUEST, stream=True))
+        self.assertEqual(sse_content(first.get_data()), "greeting")
+
+        replay = self.client.post("/v1/chat/completions", json=dict(REQUEST, stream=True))
+        self.assertEqual(replay.headers["X-Cache"], "HIT")
+        self.assertEqual(replay.mimetype, "text/event-stream")
+        payload = replay.get_data()
+        self.assertEqual(sse_content(payload), "greeting")
+        self.assertTrue(payload.endswith(b"data: [DONE]\n\n"))
+
+        non_stream = self.client.post("/v1/chat/completions", json=REQUEST)
+        self.assertEqual(json.loads(non_stream.data)["choices"][0]["message"]["content"], "greeting")
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_no_cache_bypass(self):
+        """Test that Cache-Control: no-cache skips the lookup but refreshes the entry"""
+        self.client.post("/v1/chat/completions", json=REQUEST)
+        bypass = self.client.post("/v1/chat/completions", json=REQUEST, headers={"Cache-Control": "no-cache"})
+        self.assertEqual(bypass.headers["X-Cache"], "BYPASS")
+        self.assertEqual(self.upstream.calls, 2)
+        self.assertEqual(self.client.post("/v1/chat/completions", json=REQUEST).headers["X-Cache"], "HIT")
+
+    def test_non_deterministic_not_cached(self):
+        response = self.client.post("/v1/chat/completions", json=dict(REQUEST, temperature=0.5))
+        self.assertNotIn("X-Cache", response.headers)
+        self.client.post("/v1/chat/completions", json=dict(REQUEST, temperature=0.5))
+        self.assertEqual(self.upstream.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+from gigachat.models import ChatCompletion
+from app import create_app
+from app.utils.semantic_cache import SemanticChatCache
+
+# Hand-picked prompt embeddings: the first two are near-duplicates
+VECTORS = {
+    "What is the capital of France?": [1.0, 0.0, 0.0],
+    "what's the capital of france": [0.99, 0.1, 0.0],
+    "How do I bake bread?": [0.0, 1.0, 0.0],
+    "Paris": [0.0, 0.0, 1.0],
+    "Lyon": [0.0, 1.0, 0.0],
+}
+
+
+async def fake_embed_texts(model, texts):
+    return [(np.array(VECTORS[text], dtype=np.float32), 1) for text in texts], 0
+
+
+def request(prompt, system=None, model="GigaChat"):
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": prompt})
+    return {"model": model, "messages": messages}
+
+
+def result(content):
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]}
+
+
+class TestSemanticChatCache(unittest.TestCase):
+    def setUp(self):
+        p = patch("app.utils.semantic_cache.embed_texts", fake_embed_texts)
+        p.start()
+        self.addCleanup(p.stop)
+        self.cache = SemanticChatCache(threshold=0.95, max_entries=10, embedding_model="Embeddings")
+
+    def lookup(self, request_data):
+        return asyncio.run(self.cache.lookup(request_data))
+
+    def test_near_duplicate_hits(self):
+        probe = self.lookup(request("What is the capital of France?"))
+        self.assertIsNone(probe.result)
+        self.cache.store(probe, result("Paris"))
+
+        hit = self.lookup(request("what's the capital of france"))
+        self.assertEqual(hit.result, result("Paris"))
+        self.assertGreater(hit.similarity, 0.95)
+        self.assertIsNone(self.lookup(request("How do I bake bread?")).result)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_namespaces(self):
+        """Test that prompts only match within the same model and context"""
+        self.cache.store(self.lookup(request("What is the capital of France?")), result("Paris"))
+        self.assertIsNone(self.lookup(request("What is the capital of France?", model="GigaChat-Pro")).result)
+        self.assertIsNone(self.lookup(request("What is the capital of France?", system="Answer in German")).result)
+
+    def test_not_eligible(self):
+        self.assertIsNone(self.lookup(dict(request("Paris"), tools=[])))
+        self.assertIsNone(self.lookup({"messages": [{"role": "assistant", "content": "Paris"}]}))
+
+    def test_size_bound(self):
+        """Test that least recently used prompts are evicted past max_entries"""
+        self.cache.max_entries = 2
+        for prompt in ("What is the capital of France?", "How do I bake bread?", "Paris"):
+            self.cache.store(self.lookup(request(prompt)), result(prompt))
+            time.sleep(0.001)
+        self.assertEqual(self.cache.stats()["entries"], 2)
+        self.assertIsNone(self.lookup(request("What is the capital of France?")).result)
+        self.assertIsNotNone(self.lookup(request("Paris")).result)
+
+    def test_false_hit_verification(self):
+        """Test that a sampled hit whose fresh answer disagrees is counted as a false hit"""
+        self.cache.verify_rate = 1.0
+        self.cache.store(self.lookup(request("What is the capital of France?")), result("Paris"))
+
+        async def main():
+            hit = await self.cache.lookup(request("what's the capital of france"))
+
+            async def fetch():
+                return result("Lyon")
+
+            self.cache.maybe_verify(hit, fetch)
+            await asyncio.gather(*self.cache._tasks)
+
+        asyncio.run(main())
+        stats = self.cache.stats()
+        self.assertEqual(stats["verified"], 1)
+        self.assertEqual(stats["false_hits"], 1)
+        self.assertEqual(stats["false_hit_histogram"], {"0.99": 1})
+
+
+class TestSemanticCacheEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+        async def call_with_auth_retry(call):
+            self.calls += 1
+            return ChatCompletion.parse_obj({
+                "choices": [{"message": {"role": "assistant", "content": "Paris"}, "index": 0, "finish_reason": "stop"}],
+                "created": int(time.time()),
+                "model": "GigaChat",
+                "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+                "object": "chat.completion",
+            })
+
+        patches = [
+            patch("app.utils.semantic_cache.embed_texts", fake_embed_texts),
+            patch("app.api.chat.call_with_auth_retry", call_with_auth_retry),
+            patch("app.api.chat.semantic_cache",
+                  SemanticChatCache(threshold=0.95, max_entries=10, embedding_model="Embeddings")),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def test_semantic_hit(self):
+        first = self.client.post("/v1/chat/completions", json=request("What is the capital of France?"))
+        self.assertEqual(first.headers["X-Cache"], "MISS")
+        second = self.client.post("/v1/chat/completions", json=request("what's the capital of france"))
+        self.assertEqual(second.headers["X-Cache"], "SEMANTIC")
+        self.assertEqual(json.loads(second.data)["choices"][0]["message"]["content"], "Paris")
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import json
+import unittest
+from app.utils.mapping import build_stream_chunk, error_stream_chunk
+from app.utils.sse import ChunkEncoder, FrameCoalescer, DONE_FRAME, error_frame
+
+TOOL_CALLS = [{"id": "call_1", "type": "function", "function": {"name": "f", "arguments": "{}"}}]
+
+
+def parse_frame(frame):
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    return json.loads(frame[len(b"data: "):-2])
+
+
+class TestChunkEncoder(unittest.TestCase):
+    def setUp(self):
+        self.encoder = ChunkEncoder("chatcmpl-1", 1700000000)
+
+    def test_matches_build_stream_chunk(self):
+        cases = [
+            ("Привет", None, None),
+            ("", None, None),
+            (None, "stop", None),
+            ("ignored", "tool_calls", TOOL_CALLS),
+            ("x", "blacklist", None),
+        ]
+        for content, finish_reason, tool_calls in cases:
+            with self.subTest(content=content, finish_reason=finish_reason):
+                expected = build_stream_chunk("chatcmpl-1", 1700000000, content, finish_reason, tool_calls)
+                self.assertEqual(parse_frame(self.encoder.frame(content, finish_reason, tool_calls)), expected)
+
+    def test_role_frame(self):
+        chunk = parse_frame(self.encoder.role_frame)
+        self.assertEqual(chunk["id"], "chatcmpl-1")
+        self.assertEqual(chunk["choices"], [{"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}])
+
+    def test_error_frame(self):
+        frame = error_frame("boom")
+        self.assertTrue(frame.endswith(DONE_FRAME))
+        expected = error_stream_chunk("boom").encode("utf-8")
+        self.assertEqual(parse_frame(frame[:-len(DONE_FRAME)]), parse_frame(expected[:-len(DONE_FRAME)]))
+
+
+class TestFrameCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.encoder = ChunkEncoder("chatcmpl-1", 1700000000)
+
+    def content(self, frame):
+        return parse_frame(frame)["choices"][0]["delta"].get("content")
+
+    def test_disabled_frames_every_delta(self):
+        coalescer = FrameCoalescer(self.encoder)
+        self.assertEqual(coalescer.frame("a", None, None, 0.0), self.encoder.frame("a", None, None))
+        self.assertEqual(coalescer.frame("b", None, None, 0.0), self.encoder.frame("b", None, None))
+
+    def test_first_content_is_not_held(self):
+        coalescer = FrameCoalescer(self.encoder, window=1.0)
+        self.assertIsNone(coalescer.frame("", None, None, 0.0))
+        self.assertEqual(self.content(coalescer.frame("Hel", None, None, 0.0)), "Hel")
+        self.assertIsNone(coalescer.frame("lo", None, None, 0.1))
+        self.assertEqual(coalescer.deadline, 1.1)
+
+    def test_window_and_finish(self):
+        coalescer = FrameCoalescer(self.encoder, window=1.0)
+        coalescer.frame("a", None, None, 0.0)
+        self.assertIsNone(coalescer.frame("b", None, None, 0.1))
+        self.assertEqual(self.content(coalescer.frame("c", None, None, 1.2)), "bc")
+        self.assertIsNone(coalescer.frame("d", None, None, 1.3))
+        last = parse_frame(coalescer.frame("e", "stop", None, 1.4))
+        self.assertEqual(last["choices"][0], {"index": 0, "delta": {"content": "de"}, "finish_reason": "stop"})
+        self.assertIsNone(coalescer.flush())
+
+    def test_max_bytes(self):
+        coalescer = FrameCoalescer(self.encoder, max_bytes=4)
+        coalescer.frame("a", None, None, 0.0)
+        self.assertIsNone(coalescer.frame("б", None, None, 0.0))
+        self.assertEqual(self.content(coalescer.frame("вг", None, None, 0.0)), "бвг")
+        self.assertIsNone(coalescer.deadline)
+
+    def test_tool_calls_flush_held_content(self):
+        coalescer = FrameCoalescer(self.encoder, window=1.0)
+        coalescer.frame("a", None, None, 0.0)
+        coalescer.frame("b", None, None, 0.1)
+        frames = coalescer.frame("", "tool_calls", TOOL_CALLS, 0.2).split(b"\n\n")[:-1]
+        self.assertEqual(self.content(frames[0] + b"\n\n"), "b")
+        self.assertEqual(parse_frame(frames[1] + b"\n\n")["choices"][0]["delta"]["tool_calls"], TOOL_CALLS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import builtins
+import unittest
+from unittest.mock import patch
+from app.utils.ssl import create_combined_cert_bundle, get_ssl_context
+
+
+class TestCertBundle(unittest.TestCase):
+    def test_bundle_is_content_addressed(self):
+        """Test that the bundle file is named after a hash of its contents"""
+        path = create_combined_cert_bundle()
+        self.assertRegex(os.path.basename(path), r"^combined_certs-[0-9a-f]{16}\.pem$")
+        self.assertTrue(os.path.exists(path))
+
+    def test_no_filesystem_access_after_first_build(self):
+        """Test that later calls reuse the cached path and SSL context"""
+        context = get_ssl_context()
+        path = create_combined_cert_bundle()
+        with patch.object(builtins, "open", side_effect=AssertionError("filesystem touched")):
+            self.assertEqual(create_combined_cert_bundle(), path)
+            self.assertIs(get_ssl_context(), context)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.utils.stream_settings import StreamSettings, parse_key_settings, resolve_stream_settings
+from tests.test_response_cache import FakeChatUpstream, sse_content
+
+REQUEST = {"messages": [{"role": "user", "content": "Count to five"}], "stream": True}
+WORDS = ("one ", "two ", "three ", "four ", "five")
+
+
+def data_frames(payload):
+    return [line for line in payload.decode("utf-8").splitlines() if line.startswith("data: {")]
+
+
+class TestResolveStreamSettings(unittest.TestCase):
+    def test_precedence(self):
+        key_settings = parse_key_settings('{"sk-bulk": {"update_interval": 1, "coalesce_window": 0.5}}')
+        with patch("app.utils.stream_settings._key_settings", key_settings):
+            self.assertEqual(resolve_stream_settings(REQUEST, "sk-other").key(), StreamSettings().key())
+            self.assertEqual(resolve_stream_settings(REQUEST, "sk-bulk").key(), (1.0, 0.5, 0))
+            request = dict(REQUEST, stream_options={"include_usage": False, "coalesce_window": 0})
+            self.assertEqual(resolve_stream_settings(request, "sk-bulk").key(), (1.0, 0.0, 0))
+
+    def test_invalid_options(self):
+        for options in ("fast", {"update_interval": "soon"}, {"coalesce_max_bytes": -1},
+                        {"update_interval": "nan"}, {"coalesce_window": 3600}, {"coalesce_max_bytes": 2 ** 31}):
+            with self.subTest(options=options):
+                with self.assertRaises(ValueError):
+                    resolve_stream_settings(dict(REQUEST, stream_options=options))
+
+    def test_update_interval_below_idle_timeout(self):
+        """Test that no stream is paced slower than the idle timeout lets it be"""
+        with patch.dict("app.utils.stream_settings.SETTING_MAXIMUMS", {"update_interval": 60}), \
+                patch("app.utils.stream_settings.STREAM_IDLE_TIMEOUT_MIN", 10):
+            self.assertEqual(StreamSettings().updated({"update_interval": 9.5}, "options").update_interval, 9.5)
+            with self.assertRaises(ValueError):
+                StreamSettings().updated({"update_interval": 10}, "options")
+
+    def test_invalid_key_settings(self):
+        with self.assertRaises(ValueError):
+            parse_key_settings('["sk-bulk"]')
+
+
+class RecordingUpstream(FakeChatUpstream):
+    """Remembers the Chat each stream was asked for"""
+
+    async def astream_with_auth_retry(self, chat):
+        self.chat = chat
+        async for chunk in super().astream_with_auth_retry(chat):
+            yield chunk
+
+
+class TestStreamPacing(unittest.TestCase):
+    def setUp(self):
+        self.upstream = RecordingUpstream(words=WORDS)
+        p = patch("app.api.chat.astream_with_auth_retry", self.upstream.astream_with_auth_retry)
+        p.start()
+        self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def test_default_frames_every_delta(self):
+        payload = self.client.post("/v1/chat/completions", json=REQUEST).get_data()
+        self.assertEqual(len(data_frames(payload)), 1 + len(WORDS))
+        self.assertEqual(self.upstream.chat.update_interval, StreamSettings().update_interval)
+
+    def test_request_options(self):
+        request = dict(REQUEST, stream_options={"update_interval": 0.5, "coalesce_max_bytes": 1024})
+        payload = self.client.post("/v1/chat/completions", json=request).get_data()
+        # Role frame, the first content delta on its own, then the rest with the finish reason
+        self.assertEqual(len(data_frames(payload)), 3)
+        self.assertEqual(sse_content(payload), "".join(WORDS))
+        self.assertEqual(self.upstream.chat.update_interval, 0.5)
+
+    def test_window_flushes_while_upstream_is_idle(self):
+        """Test that held content is sent once the window passes, not with the next chunk"""
+        async def slow_stream(chat):
+            async for chunk in FakeChatUpstream(words=("a", "b", "c")).astream_with_auth_retry(chat):
+                if chunk.choices[0].finish_reason:
+                    await asyncio.sleep(0.3)
+                yield chunk
+
+        request = dict(REQUEST, stream_options={"coalesce_window": 0.05})
+        with patch("app.api.chat.astream_with_auth_retry", slow_stream):
+            payload = self.client.post("/v1/chat/completions", json=request).get_data()
+        contents = [sse_content(frame.encode("utf-8")) for frame in data_frames(payload)]
+        self.assertEqual(contents, ["", "a", "b", "c"])
+
+    def test_invalid_options(self):
+        for options in ({"update_interval": -1}, {"update_interval": 3600}):
+            with self.subTest(options=options):
+                response = self.client.post("/v1/chat/completions", json=dict(REQUEST, stream_options=options))
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json()["error"]["param"], "stream_options")
+
+
+if __name__ == "__main__":
+    unittest.main()
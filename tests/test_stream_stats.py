@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.asgi import create_asgi_app
+from app.utils.response_cache import StreamTranscript
+from app.utils.stream_stats import StreamStats
+from tests.test_response_cache import FakeChatUpstream
+
+REQUEST = b'{"messages": [{"role": "user", "content": "Tell a long story"}], "stream": true}'
+
+
+def transcript_of(text):
+    transcript = StreamTranscript()
+    transcript.add(text, None, None)
+    return transcript
+
+
+class TestStreamStats(unittest.TestCase):
+    def test_saved_tokens_from_max_tokens(self):
+        stats = StreamStats()
+        self.assertEqual(stats.record_cancelled(transcript_of("x" * 40), max_tokens=100), 90)
+        self.assertEqual(stats.stats(), {"completed": 0, "cancelled": 1, "tokens_saved_estimate": 90})
+
+    def test_saved_tokens_from_completed_mean(self):
+        stats = StreamStats()
+        self.assertEqual(stats.record_cancelled(transcript_of("x" * 40)), 0)
+        stats.record_completed(transcript_of("x" * 400))
+        stats.record_completed(transcript_of("x" * 200))
+        self.assertEqual(stats.record_cancelled(transcript_of("x" * 40)), 65)
+
+
+class StallingUpstream(FakeChatUpstream):
+    """Sends its first words, then hangs like a slow generation"""
+
+    def __init__(self):
+        super().__init__(words=("Once ", "upon ", "a time"))
+        self.closed = False
+
+    async def astream_with_auth_retry(self, chat):
+        try:
+            async for chunk in super().astream_with_auth_retry(chat):
+                if chunk.choices[0].finish_reason:
+                    break
+                yield chunk
+            await asyncio.sleep(30)
+        finally:
+            self.closed = True
+
+
+class TestClientDisconnect(unittest.TestCase):
+    def setUp(self):
+        self.upstream = StallingUpstream()
+        self.stats = StreamStats()
+        patches = [
+            patch("app.api.chat.astream_with_auth_retry", self.upstream.astream_with_auth_retry),
+            patch("app.api.chat.stream_stats", self.stats),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.asgi_app = create_asgi_app(create_app())
+
+    def test_disconnect_closes_upstream(self):
+        """Test that a client going away mid-stream closes the upstream stream and is counted"""
+        scope = {"type": "http", "method": "POST", "path": "/v1/chat/completions", "query_string": b"",
+                 "http_version": "1.1", "headers": [(b"content-type", b"application/json")]}
+
+        async def run():
+            content_sent = asyncio.Event()
+            messages = [{"type": "http.request", "body": REQUEST, "more_body": False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                await content_sent.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if b"upon" in message.get("body", b""):
+                    content_sent.set()
+
+            await asyncio.wait_for(self.asgi_app(scope, receive, send), timeout=5)
+
+        asyncio.run(run())
+        self.assertTrue(self.upstream.closed)
+        self.assertEqual(self.stats.stats()["cancelled"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.utils.coalescer import RequestCoalescer
+from app.utils.sse import DONE_FRAME, KEEPALIVE_FRAME
+from app.utils.timeouts import IdleTimeouts, request_timeout
+from tests.test_response_cache import FakeChatUpstream, sse_content
+
+REQUEST = {"messages": [{"role": "user", "content": "Write a long essay"}]}
+
+
+def last_data_chunk(payload):
+    frames = [line for line in payload.decode("utf-8").splitlines() if line.startswith("data: {")]
+    return json.loads(frames[-1][len("data: "):])
+
+
+class SlowUpstream(FakeChatUpstream):
+    """Waits `delay` seconds before every answer and stream chunk"""
+
+    def __init__(self, delay, words=("Once ", "upon ", "a ", "time")):
+        super().__init__(words=words)
+        self.delay = delay
+
+    async def achat(self, chat):
+        await asyncio.sleep(self.delay)
+        return await super().achat(chat)
+
+    async def astream_with_auth_retry(self, chat):
+        async for chunk in super().astream_with_auth_retry(chat):
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+
+class TestRequestTimeout(unittest.TestCase):
+    def test_shortest_limit_wins(self):
+        with patch("app.utils.timeouts.REQUEST_TIMEOUT", 60.0), \
+                patch("app.utils.timeouts._timeouts_by_key", {"sk-fast": 5.0}):
+            self.assertEqual(request_timeout({}), 60.0)
+            self.assertEqual(request_timeout({"Authorization": "Bearer sk-fast"}), 5.0)
+            self.assertEqual(request_timeout({"X-Request-Timeout": "2.5"}), 2.5)
+            self.assertEqual(request_timeout({"X-Request-Timeout": "600"}), 60.0)
+        self.assertIsNone(request_timeout({}))
+
+    def test_invalid_header(self):
+        for value in ("soon", "0", "-1", "nan"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    request_timeout({"X-Request-Timeout": value})
+
+
+class TestIdleTimeouts(unittest.TestCase):
+    def test_adapts_to_p99(self):
+        timeouts = IdleTimeouts(minimum=1, maximum=60, multiplier=4, min_samples=20, refresh=10)
+        self.assertEqual(timeouts.timeout("gap"), 60)
+        for _ in range(40):
+            timeouts.observe("gap", 0.5)
+        self.assertEqual(timeouts.timeout("gap"), 2.0)
+        self.assertEqual(timeouts.timeout("first"), 60)
+        for _ in range(40):
+            timeouts.observe("first", 0.01)
+        self.assertEqual(timeouts.timeout("first"), 1)
+
+    def test_slow_pacing_floor(self):
+        timeouts = IdleTimeouts(minimum=1, maximum=60, multiplier=4, min_samples=20, refresh=10)
+        for _ in range(40):
+            timeouts.observe("gap", 0.1)
+        self.assertEqual(timeouts.timeout("gap"), 1)
+        self.assertEqual(timeouts.timeout("gap", update_interval=5.0), 6.0)
+
+
+class TestDeadlines(unittest.TestCase):
+    def setUp(self):
+        self.upstream = SlowUpstream(delay=0.2)
+        patches = [
+            patch("app.api.chat.call_with_auth_retry", self.upstream.call_with_auth_retry),
+            patch("app.api.chat.astream_with_auth_retry", self.upstream.astream_with_auth_retry),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def post(self, request, timeout):
+        return self.client.post("/v1/chat/completions", json=request, headers={"X-Request-Timeout": timeout})
+
+    def test_stream_cut_short_with_length(self):
+        payload = self.post(dict(REQUEST, stream=True), "0.5").get_data()
+        self.assertTrue(payload.endswith(DONE_FRAME))
+        self.assertEqual(last_data_chunk(payload)["choices"][0]["finish_reason"], "length")
+        self.assertEqual(sse_content(payload), "Once upon ")
+
+    def test_stream_within_deadline(self):
+        payload = self.post(dict(REQUEST, stream=True), "5").get_data()
+        self.assertEqual(last_data_chunk(payload)["choices"][0]["finish_reason"], "stop")
+        self.assertEqual(sse_content(payload), "Once upon a time")
+
+    def test_coalesced_streams_keep_their_own_deadlines(self):
+        """Test that a stream joining a shorter-lived identical one outlives its deadline"""
+        request = dict(REQUEST, stream=True, temperature=0)
+        payloads = {}
+
+        def post(timeout):
+            payloads[timeout] = self.post(request, timeout).get_data()
+
+        with patch("app.api.chat.request_coalescer", RequestCoalescer()) as coalescer:
+            leader = threading.Thread(target=post, args=("0.5",))
+            leader.start()
+            time.sleep(0.05)
+            post("5")
+            leader.join()
+
+        self.assertEqual(self.upstream.calls, 1)
+        self.assertEqual(coalescer.stats()["stream_followers"], 1)
+        self.assertEqual(last_data_chunk(payloads["0.5"])["choices"][0]["finish_reason"], "length")
+        self.assertEqual(last_data_chunk(payloads["5"])["choices"][0]["finish_reason"], "stop")
+        self.assertEqual(sse_content(payloads["5"]), "Once upon a time")
+
+    def test_non_stream_deadline(self):
+        response = self.post(REQUEST, "0.1")
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response.get_json()["error"]["code"], "timeout")
+        self.assertEqual(self.post(REQUEST, "5").status_code, 200)
+
+    def test_invalid_header(self):
+        response = self.post(REQUEST, "soon")
+        self.assertEqual(response.status_code, 400)
+
+    def test_keepalive_while_idle(self):
+        with patch("app.api.chat.STREAM_KEEPALIVE_INTERVAL", 0.05):
+            payload = self.post(dict(REQUEST, stream=True), "5").get_data()
+        self.assertIn(KEEPALIVE_FRAME, payload)
+        self.assertEqual(sse_content(payload), "Once upon a time")
+
+
+if __name__ == "__main__":
+    unittest.main()
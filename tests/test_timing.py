@@ -0,0 +1,102 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.utils.coalescer import RequestCoalescer
+from app.utils.sse import DONE_FRAME
+from app.utils.timing import ServerTiming
+from tests.test_response_cache import FakeChatUpstream
+from tests.test_timeouts import SlowUpstream
+
+REQUEST = {"messages": [{"role": "user", "content": "Say hi"}], "temperature": 0.5}
+
+
+def stages(value):
+    """Stage names of a Server-Timing value"""
+    return [part.split(";")[0] for part in value.split(", ")]
+
+
+def timing_comment(body):
+    """Server-Timing value of the SSE comment before the [DONE] frame"""
+    comment = body[:-len(DONE_FRAME)].rstrip(b"\n").rsplit(b"\n\n", 1)[-1].decode("utf-8")
+    assert comment.startswith(": server-timing ")
+    return comment[len(": server-timing "):]
+
+
+def duration(value, stage):
+    """Milliseconds of `stage` in a Server-Timing value"""
+    return next(float(part.split("dur=")[1]) for part in value.split(", ") if part.startswith(stage + ";"))
+
+
+class TestServerTiming(unittest.TestCase):
+    def test_stages_accumulate(self):
+        timing = ServerTiming()
+        timing.add("serialize", 0.001)
+        timing.add("serialize", 0.002)
+        timing.add("upstream", 0.5)
+        value = timing.header_value()
+        self.assertTrue(value.startswith("serialize;dur=3.0, upstream;dur=500.0, total;dur="))
+
+
+class TestServerTimingEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeChatUpstream(words=("h", "i"))
+        patches = [
+            patch("app.api.chat.call_with_auth_retry", self.upstream.call_with_auth_retry),
+            patch("app.api.chat.astream_with_auth_retry", self.upstream.astream_with_auth_retry),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def test_non_stream_header(self):
+        response = self.client.post("/v1/chat/completions", json=REQUEST)
+        self.assertEqual(stages(response.headers["Server-Timing"]), ["convert", "serialize", "total"])
+
+    def test_stream_trailing_comment(self):
+        response = self.client.post("/v1/chat/completions", json=dict(REQUEST, stream=True))
+        body = response.get_data()
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertTrue(body.endswith(DONE_FRAME))
+        self.assertEqual(stages(timing_comment(body)), ["convert", "serialize", "total"])
+
+    def test_coalesced_streams_report_their_own_timing(self):
+        """Test that a stream joining another's upstream call reports its own breakdown"""
+        upstream = SlowUpstream(delay=0.1)
+        request = dict(REQUEST, stream=True, temperature=0)
+        bodies = {}
+
+        def post(name):
+            bodies[name] = self.client.post("/v1/chat/completions", json=request).get_data()
+
+        with patch("app.api.chat.astream_with_auth_retry", upstream.astream_with_auth_retry), \
+                patch("app.api.chat.request_coalescer", RequestCoalescer()):
+            leader = threading.Thread(target=post, args=("leader",))
+            leader.start()
+            time.sleep(0.2)
+            post("follower")
+            leader.join()
+
+        self.assertEqual(upstream.calls, 1)
+        leader_timing, follower_timing = timing_comment(bodies["leader"]), timing_comment(bodies["follower"])
+        # Only the leader converted the request and waited for upstream from the start
+        self.assertEqual(stages(leader_timing), ["convert", "serialize", "total"])
+        self.assertEqual(stages(follower_timing), ["serialize", "total"])
+        self.assertLess(duration(follower_timing, "total"), duration(leader_timing, "total") - 100)
+
+    def test_slow_request_log(self):
+        with patch("app.utils.timing.SLOW_REQUEST_THRESHOLD", 1e-9):
+            with self.assertLogs("app.config", level="WARNING") as logs:
+                self.client.post("/v1/chat/completions", json=REQUEST)
+        self.assertTrue(any("Slow request /v1/chat/completions: convert;dur=" in message for message in logs.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
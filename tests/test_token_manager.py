@@ -0,0 +1,202 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MASTER_TOKEN", "test")
+
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from gigachat.exceptions import AuthenticationError
+from app.auth.token_manager import TokenManager
+
+
+class FakeOAuth:
+    """Counts OAuth calls and hands out tokens valid for `ttl` seconds"""
+
+    def __init__(self, ttl=1800, delay=0.0):
+        self.ttl = ttl
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, headers=None, data=None):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        response = MagicMock()
+        response.json.return_value = {
+            "access_token": f"token-{calls}",
+            "expires_at": int((time.time() + self.ttl) * 1000),
+        }
+        return response
+
+
+class TestTokenManager(unittest.TestCase):
+    def make_manager(self, oauth, margin=60):
+        manager = TokenManager(master_token="master", refresh_margin=margin, token_store_path=None)
+        manager.http_client = oauth
+        return manager
+
+    def test_single_flight(self):
+        """Test that concurrent callers at expiry trigger one OAuth call"""
+        oauth = FakeOAuth(delay=0.05)
+        manager = self.make_manager(oauth)
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(manager.get_valid_token())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(oauth.calls, 1)
+        self.assertEqual(set(tokens), {"token-1"})
+
+    def test_refresh_within_margin_is_background(self):
+        """Test that a token close to expiry is served while renewing in the background"""
+        oauth = FakeOAuth(ttl=1800)
+        manager = self.make_manager(oauth, margin=60)
+        self.assertEqual(manager.get_valid_token(), "token-1")
+        manager.expires_at = int((time.time() + 30) * 1000)
+        # Still valid but inside the margin: served as is, renewed off the request path
+        self.assertEqual(manager.get_valid_token(), "token-1")
+        deadline = time.time() + 2
+        while manager.access_token == "token-1" and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(manager.access_token, "token-2")
+
+    def test_margin_longer_than_lifetime(self):
+        """Test that a margin as long as the token's lifetime doesn't renew it back to back"""
+        oauth = FakeOAuth(ttl=30)
+        manager = self.make_manager(oauth, margin=60)
+        with self.assertLogs("app.config", level="WARNING") as logs:
+            self.assertEqual(manager.get_valid_token(), "token-1")
+        self.assertTrue(any("TOKEN_REFRESH_MARGIN" in message for message in logs.output))
+        self.assertEqual(manager.get_valid_token(), "token-1")
+        time.sleep(0.1)
+        self.assertEqual(oauth.calls, 1)
+        self.assertGreaterEqual(manager._timer.interval, 15)
+        manager._timer.cancel()
+
+    def test_invalidate(self):
+        """Test that invalidating the current token forces a refresh"""
+        oauth = FakeOAuth()
+        manager = self.make_manager(oauth)
+        token = manager.get_valid_token()
+        manager.invalidate("some-older-token")
+        self.assertEqual(manager.get_valid_token(), token)
+        manager.invalidate(token)
+        self.assertEqual(manager.get_valid_token(), "token-2")
+
+    def test_async_variant(self):
+        """Test that aget_valid_token refreshes off the event loop"""
+        oauth = FakeOAuth()
+        manager = self.make_manager(oauth)
+        self.assertEqual(asyncio.run(manager.aget_valid_token()), "token-1")
+        self.assertEqual(asyncio.run(manager.aget_valid_token()), "token-1")
+        self.assertEqual(oauth.calls, 1)
+
+
+class TestSharedTokenStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "token.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_manager(self, oauth):
+        manager = TokenManager(master_token="master", token_store_path=self.path)
+        manager.http_client = oauth
+        return manager
+
+    def test_new_worker_reuses_stored_token(self):
+        """Test that a second worker serves its first request without OAuth"""
+        oauth = FakeOAuth()
+        first = self.make_manager(oauth)
+        self.assertEqual(first.get_valid_token(), "token-1")
+
+        second = self.make_manager(oauth)
+        self.assertEqual(second.get_valid_token(), "token-1")
+        self.assertEqual(oauth.calls, 1)
+
+    def test_rejected_token_is_not_adopted(self):
+        """Test that a worker refreshes instead of adopting a token GigaChat rejected"""
+        oauth = FakeOAuth()
+        manager = self.make_manager(oauth)
+        token = manager.get_valid_token()
+        manager.invalidate(token)
+        self.assertEqual(manager.get_valid_token(), "token-2")
+        self.assertEqual(self.make_manager(oauth).get_valid_token(), "token-2")
+
+    def test_other_credentials_are_ignored(self):
+        """Test that tokens are keyed by master token"""
+        oauth = FakeOAuth()
+        self.make_manager(oauth).get_valid_token()
+        other = TokenManager(master_token="other", token_store_path=self.path)
+        other.http_client = oauth
+        self.assertEqual(other.get_valid_token(), "token-2")
+
+    def test_held_lock_falls_back_to_local_refresh(self):
+        """Test that a worker stuck behind the lock fetches its own token after the timeout"""
+        import fcntl
+
+        oauth = FakeOAuth()
+        manager = self.make_manager(oauth)
+        manager.store.lock_timeout = 0.1
+        fd = os.open(manager.store.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            started = time.monotonic()
+            self.assertEqual(manager.get_valid_token(), "token-1")
+            self.assertLess(time.monotonic() - started, 2)
+        finally:
+            os.close(fd)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_symlinked_lock_is_not_followed(self):
+        """Test that a lock path planted as a symlink is neither written through nor trusted"""
+        target = os.path.join(self.tmpdir.name, "target")
+        with open(target, "w") as f:
+            f.write("keep")
+        oauth = FakeOAuth()
+        manager = self.make_manager(oauth)
+        os.symlink(target, manager.store.lock_path)
+
+        self.assertEqual(manager.get_valid_token(), "token-1")
+        with open(target) as f:
+            self.assertEqual(f.read(), "keep")
+
+    def test_save_leaves_no_temp_files(self):
+        """Test that the store is written through a fresh temp file that is renamed away"""
+        self.make_manager(FakeOAuth()).get_valid_token()
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ["token.json", "token.json.lock"])
+
+
+class TestAuthRetry(unittest.TestCase):
+    def test_retry_once_on_401(self):
+        """Test that a 401 invalidates the token and retries with a new one"""
+        from app.utils import openai_client
+
+        oauth = FakeOAuth()
+        manager = TokenManager(master_token="master", token_store_path=None)
+        manager.http_client = oauth
+        seen = []
+
+        async def call(client):
+            seen.append(client.token)
+            if len(seen) == 1:
+                raise AuthenticationError("url", 401, b"", {})
+            return "ok"
+
+        with patch.object(openai_client, "token_manager", manager):
+            result = asyncio.run(openai_client.call_with_auth_retry(call))
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(seen, ["token-1", "token-2"])
+
+
+if __name__ == "__main__":
+    unittest.main()